@@ -1,75 +1,286 @@
 """
 Algorithm registry for K2SHBWI compression algorithms.
+
+The global ``registry`` fills itself on first use (``init_registry``), so
+importing this module does not import the compression backends.
+
+Third-party compression algorithms are discovered through the
+``k2shbwi.algorithms`` entry point group. Each entry point names an
+algorithm and points at an ``AlgorithmPlugin`` (or any object with
+``compress``/``decompress`` attributes)::
+
+    [project.entry-points."k2shbwi.algorithms"]
+    inhouse = "inhouse_codecs.plugin:PLUGIN [streaming, thread_safe, mbps_300]"
+
+Discovery only reads package metadata. Capabilities are declared statically
+in the entry point's extras (``lossy``, ``streaming``, ``thread_safe`` and
+``mbps_<N>`` for the typical throughput), so capability queries never import
+a plugin. The plugin module is imported the first time its algorithm is
+requested, so keep the plugin object in a light module and import heavy
+backends inside ``compress``/``decompress``.
 """
-from typing import Callable, Dict, List, Optional, Tuple, Any
-import importlib
-from PIL import Image
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Any
 from ..core.format import CompressionType
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 # Type hints for compression functions
 # Raw compression functions work directly with bytes
 RawCompressFunc = Callable[[bytes], bytes]
 RawDecompressFunc = Callable[[bytes], bytes]
 # Algorithm-specific functions may have additional parameters
-ImageAlgoFunc = Callable[[Image.Image], Tuple[bytes, dict]]
+ImageAlgoFunc = Callable[['Image.Image'], Tuple[bytes, dict]]
+
+ENTRY_POINT_GROUP = "k2shbwi.algorithms"
+
+
+@dataclass(frozen=True)
+class AlgorithmCapabilities:
+    """What selection logic may assume about a compression algorithm.
+
+    ``typical_mbps`` is a rough compression throughput (MB/s on one core);
+    ``None`` means unknown. ``streaming`` means the data can be compressed
+    and decompressed in chunks (see ``codecs.iter_decompress``).
+    """
+    lossless: bool = True
+    streaming: bool = False
+    thread_safe: bool = False
+    typical_mbps: Optional[float] = None
+
+
+@dataclass
+class AlgorithmPlugin:
+    """A compression algorithm as published through an entry point.
+
+    Its capabilities are declared with the entry point, not here, so they
+    can be read without importing the plugin.
+    """
+    compress: RawCompressFunc
+    decompress: RawDecompressFunc
+
+
+# Rough single-core throughput at the default level of each built-in codec
+_BUILTIN_CAPABILITIES = {
+    CompressionType.ZLIB: AlgorithmCapabilities(streaming=True, thread_safe=True, typical_mbps=40),
+    CompressionType.LZMA: AlgorithmCapabilities(streaming=True, thread_safe=True, typical_mbps=5),
+    CompressionType.BROTLI: AlgorithmCapabilities(streaming=True, thread_safe=True, typical_mbps=10),
+    CompressionType.ZSTD: AlgorithmCapabilities(streaming=True, thread_safe=True, typical_mbps=300),
+}
+
+
+def entry_point_capabilities(entry_point: Any) -> AlgorithmCapabilities:
+    """Capabilities declared in an entry point's extras, without loading it.
+
+    ``lossy``, ``streaming`` and ``thread_safe`` set the matching flags and
+    ``mbps_<N>`` the typical throughput; other extras are ignored.
+    """
+    flags = {'lossless': True, 'streaming': False, 'thread_safe': False, 'typical_mbps': None}
+    for extra in getattr(entry_point, 'extras', None) or ():
+        if extra == 'lossy':
+            flags['lossless'] = False
+        elif extra in ('streaming', 'thread_safe'):
+            flags[extra] = True
+        elif extra.startswith('mbps_'):
+            try:
+                flags['typical_mbps'] = float(extra[len('mbps_'):])
+            except ValueError:
+                pass
+    return AlgorithmCapabilities(**flags)
+
 
 class AlgorithmRegistry:
-    """Central registry for compression algorithms."""
+    """Central registry for compression algorithms.
+
+    With ``discover=True`` the registry fills itself on first use with the
+    built-in algorithms and the installed entry-point plugins, as the global
+    ``registry`` does. Other registries start empty.
+    """
     
-    def __init__(self):
+    def __init__(self, discover: bool = False):
         self._compression_algos: Dict[str, Tuple[RawCompressFunc, RawDecompressFunc]] = {}
         self._image_algos: Dict[str, Tuple[Any, Any]] = {}  # Store original functions
+        self._codecs: Dict[str, CompressionType] = {}  # Level-aware built-in codecs
+        self._default_levels: Dict[str, Optional[int]] = {}
+        self._capabilities: Dict[str, AlgorithmCapabilities] = {}
+        self._plugins: Dict[str, Any] = {}  # Discovered, not yet loaded entry points
         self._default_compression = "smart"  # Use smart_compression by default
         self._default_image = "adaptive"     # Use adaptive image compression by default
+        self.discover = discover
+        self._initialized = False
+
+    def _ensure_initialized(self) -> None:
+        if self.discover and not self._initialized:
+            self._initialized = True
+            _register_builtins(self)
+            self.load_entry_points()
     
     def register_compression(self, name: str, compress_func: RawCompressFunc, 
-                           decompress_func: RawDecompressFunc) -> None:
+                           decompress_func: RawDecompressFunc,
+                           capabilities: Optional[AlgorithmCapabilities] = None) -> None:
         """Register a pair of compression/decompression functions."""
         self._compression_algos[name] = (compress_func, decompress_func)
+        self._capabilities[name] = capabilities or AlgorithmCapabilities()
+        self._plugins.pop(name, None)
     
+    def register_codec(self, name: str, comp_type: CompressionType,
+                       level: Optional[int] = None) -> None:
+        """Register a built-in codec whose compression level can be chosen.
+
+        ``level`` is the default used when ``get_compression`` is not given one.
+        """
+        from ..core.codecs import get_compressor, get_decompressor
+        self._codecs[name] = comp_type
+        self._default_levels[name] = level
+        self.register_compression(name, get_compressor(comp_type, level), get_decompressor(comp_type),
+                                  _BUILTIN_CAPABILITIES.get(comp_type))
+
+    def register_plugin(self, name: str, entry_point: Any,
+                        capabilities: Optional[AlgorithmCapabilities] = None) -> None:
+        """Register an algorithm that is loaded on first use.
+
+        ``entry_point`` is anything with a ``load()`` method returning an
+        ``AlgorithmPlugin`` (normally an ``importlib.metadata.EntryPoint``).
+        ``capabilities`` default to those declared in the entry point's
+        extras (see ``entry_point_capabilities``); they are what capability
+        queries see, before and after the plugin is loaded.
+        """
+        self._plugins[name] = entry_point
+        self._capabilities[name] = capabilities or entry_point_capabilities(entry_point)
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP) -> List[str]:
+        """Discover plugins in the installed packages' entry points.
+
+        Plugin modules are not imported. Names that are already registered
+        keep their current algorithm. Returns the names that were added.
+        """
+        from importlib.metadata import entry_points
+        added = []
+        for ep in entry_points(group=group):
+            if ep.name not in self._compression_algos and ep.name not in self._plugins:
+                self.register_plugin(ep.name, ep)
+                added.append(ep.name)
+        return added
+
+    def _resolve(self, name: str) -> None:
+        """Import a discovered plugin and register its functions."""
+        entry_point = self._plugins.get(name)
+        if entry_point is None:
+            return
+        try:
+            plugin = entry_point.load()
+        except Exception as e:
+            raise ValueError(f"Compression plugin {name} failed to load: {e}") from e
+        if not (hasattr(plugin, "compress") and hasattr(plugin, "decompress")):
+            raise ValueError(f"Compression plugin {name} has no compress/decompress functions")
+        # The statically declared capabilities stay authoritative
+        self.register_compression(name, plugin.compress, plugin.decompress, self._capabilities[name])
+
     def register_image_algo(self, name: str, process_func: ImageAlgoFunc) -> None:
         """Register an image processing algorithm."""
         self._image_algos[name] = process_func
     
-    def get_compression(self, name: Optional[str] = None) -> Tuple[RawCompressFunc, RawDecompressFunc]:
-        """Get compression functions by name, or default if None."""
+    def get_compression(self, name: Optional[str] = None,
+                        level: Optional[int] = None) -> Tuple[RawCompressFunc, RawDecompressFunc]:
+        """Get compression functions by name, or default if None.
+
+        ``level`` is only supported by codecs registered with ``register_codec``.
+        """
+        self._ensure_initialized()
         name = name or self._default_compression
+        self._resolve(name)
         if name not in self._compression_algos:
             raise ValueError(f"Unknown compression algorithm: {name}")
-        return self._compression_algos[name]
+        if level is None or level == self._default_levels.get(name):
+            return self._compression_algos[name]
+        if name not in self._codecs:
+            raise ValueError(f"Compression algorithm {name} does not support levels")
+        from ..core.codecs import get_compressor, get_decompressor
+        comp_type = self._codecs[name]
+        return get_compressor(comp_type, level), get_decompressor(comp_type)
+
+    def set_default_level(self, name: str, level: Optional[int]) -> None:
+        """Set the default compression level of a registered codec."""
+        self._ensure_initialized()
+        if name not in self._codecs:
+            raise ValueError(f"Compression algorithm {name} does not support levels")
+        self.register_codec(name, self._codecs[name], level)
     
+    def get_capabilities(self, name: str) -> AlgorithmCapabilities:
+        """Capability metadata of a compression algorithm (plugins are not loaded)."""
+        self._ensure_initialized()
+        if name not in self._capabilities:
+            raise ValueError(f"Unknown compression algorithm: {name}")
+        return self._capabilities[name]
+
+    def find_compression_algos(self, lossless: Optional[bool] = None,
+                               streaming: Optional[bool] = None,
+                               thread_safe: Optional[bool] = None,
+                               min_mbps: Optional[float] = None) -> List[str]:
+        """Names of the algorithms matching the given capabilities, fastest first.
+
+        ``None`` leaves a capability unconstrained. Algorithms with unknown
+        throughput sort last and never satisfy ``min_mbps``. Plugins are
+        matched on their declared capabilities and are not loaded.
+        """
+        matches = []
+        for name in self.list_compression_algos():
+            caps = self.get_capabilities(name)
+            if lossless is not None and caps.lossless != lossless:
+                continue
+            if streaming is not None and caps.streaming != streaming:
+                continue
+            if thread_safe is not None and caps.thread_safe != thread_safe:
+                continue
+            if min_mbps is not None and (caps.typical_mbps is None or caps.typical_mbps < min_mbps):
+                continue
+            matches.append(name)
+        return sorted(matches, key=lambda n: -(self._capabilities[n].typical_mbps or 0))
+
     def get_image_algo(self, name: Optional[str] = None) -> ImageAlgoFunc:
         """Get image algorithm by name, or default if None."""
+        self._ensure_initialized()
         name = name or self._default_image
         if name not in self._image_algos:
             raise ValueError(f"Unknown image algorithm: {name}")
         return self._image_algos[name]
     
     def list_compression_algos(self) -> List[str]:
-        """List available compression algorithms."""
-        return sorted(self._compression_algos.keys())
+        """List available compression algorithms (including plugins not yet loaded)."""
+        self._ensure_initialized()
+        return sorted(set(self._compression_algos) | set(self._plugins))
     
     def list_image_algos(self) -> List[str]:
         """List available image algorithms."""
+        self._ensure_initialized()
         return sorted(self._image_algos.keys())
     
     def set_default_compression(self, name: str) -> None:
         """Set the default compression algorithm."""
+        self._ensure_initialized()
+        self._resolve(name)
         if name not in self._compression_algos:
             raise ValueError(f"Unknown compression algorithm: {name}")
         self._default_compression = name
     
     def set_default_image(self, name: str) -> None:
         """Set the default image algorithm."""
+        self._ensure_initialized()
         if name not in self._image_algos:
             raise ValueError(f"Unknown image algorithm: {name}")
         self._default_image = name
 
 # Global registry instance
-registry = AlgorithmRegistry()
+registry = AlgorithmRegistry(discover=True)
 
 def init_registry():
-    """Initialize the registry with all available algorithms."""
+    """Initialize the registry with all available algorithms (idempotent)."""
+    registry._ensure_initialized()
+
+
+def _register_builtins(reg: AlgorithmRegistry) -> None:
+    """Register smart compression and the built-in codecs whose backend is installed."""
     from .smart_compression import adaptive_compress, adaptive_decompress
     
     # Create wrappers for smart compression to match the simple bytes->bytes API
@@ -83,25 +294,11 @@ def init_registry():
         comp_type = CompressionType(data[0])
         return adaptive_decompress(data[1:], comp_type)
     
-    registry.register_compression("smart", smart_compress_wrapper, smart_decompress_wrapper)
-    
-    # Import and register all other algorithms
-    algo_modules = [
-        "basic_compression", "enhanced_compression", "lossy_compression",
-        "lossless_compression", "predictive_compression", "dictionary_compression",
-        "arithmetic_compression", "huffman_compression", "lzw_compression",
-        "rle_compression", "delta_compression", "probability_compression",
-        "transform_compression", "wavelet_compression", "fractal_compression"
-    ]
-    
-    for module_name in algo_modules:
-        try:
-            module = importlib.import_module(f".{module_name}", package="k2shbwi.algorithms")
-            if hasattr(module, "compress") and hasattr(module, "decompress"):
-                registry.register_compression(
-                    module_name.replace("_compression", ""),
-                    module.compress,
-                    module.decompress
-                )
-        except ImportError:
-            continue  # Skip unavailable algorithms
\ No newline at end of file
+    reg.register_compression("smart", smart_compress_wrapper, smart_decompress_wrapper,
+                             AlgorithmCapabilities(thread_safe=True))
+
+    # Built-in codecs with selectable levels (only those whose backend is installed)
+    from .smart_compression import available_backends
+    for comp_type, available in available_backends().items():
+        if available and comp_type != CompressionType.NONE and comp_type.name.lower() not in reg._codecs:
+            reg.register_codec(comp_type.name.lower(), comp_type)
@@ -6,14 +6,34 @@ algorithm using simple heuristics and compresses data using the
 bytes and the chosen `CompressionType` enum instance. This keeps the
 encoder/decoder compatible with the format's compression-type byte.
 """
-from typing import Tuple
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple
+import math
+import time
 import zlib
 
 from ..core.format import CompressionType
 from ..core.errors import CompressionError
 
+# Upper bound on the number of bytes inspected by ``classify_data``
+CLASSIFY_SAMPLE_SIZE = 64 * 1024
+# Number of evenly spaced chunks the sample is drawn from
+_CLASSIFY_SAMPLE_CHUNKS = 4
+# Features ``classify_data`` can compute (repetitiveness is the costly one)
+CLASSIFY_FEATURES = ('printable_ratio', 'entropy', 'repetitiveness')
+# Rules mode stores data above this order-0 entropy (bits per byte) as-is:
+# a general-purpose codec gains next to nothing on it
+INCOMPRESSIBLE_ENTROPY = 7.5
+# Rules mode uses a stronger level above this repetitiveness, where long
+# matches make the extra effort cheap and worthwhile
+REPETITIVE_THRESHOLD = 0.9
+# Levels used for repetitive data; other backends keep their default
+_REPETITIVE_LEVELS = {CompressionType.ZSTD: 9, CompressionType.ZLIB: 9}
 
+
+@lru_cache(maxsize=None)
 def _try_import(module_name: str):
+    """Import an optional backend once per process; None if unavailable."""
     try:
         import importlib
 
@@ -22,51 +42,251 @@ def _try_import(module_name: str):
         return None
 
 
-def adaptive_compress(data: bytes, data_type: str = 'binary') -> Tuple[bytes, CompressionType]:
-    """Select a compression algorithm heuristically and compress.
+def available_backends() -> Dict[CompressionType, bool]:
+    """Availability of each compression backend (probed once per process)."""
+    return {
+        CompressionType.NONE: True,
+        CompressionType.ZLIB: True,
+        CompressionType.BROTLI: _try_import('brotli') is not None,
+        CompressionType.LZMA: _try_import('lzma') is not None,
+        CompressionType.ZSTD: _try_import('zstandard') is not None,
+    }
+
+
+def _sample(data: bytes, sample_size: int) -> bytes:
+    """Bounded sample of ``data``: the whole buffer or evenly spaced chunks."""
+    if len(data) <= sample_size:
+        return bytes(data)
+    chunk = sample_size // _CLASSIFY_SAMPLE_CHUNKS
+    step = (len(data) - chunk) // (_CLASSIFY_SAMPLE_CHUNKS - 1)
+    return b''.join(bytes(data[i * step:i * step + chunk]) for i in range(_CLASSIFY_SAMPLE_CHUNKS))
+
+
+def classify_data(data: bytes, sample_size: int = CLASSIFY_SAMPLE_SIZE,
+                  features: Sequence[str] = CLASSIFY_FEATURES) -> Dict[str, float]:
+    """Cheap content features of ``data`` computed on a bounded sample.
+
+    Returns a dict with:
+      - size: total length of ``data``
+      - sample_size: number of bytes inspected
+      - printable_ratio: fraction of printable ASCII bytes
+      - entropy: order-0 byte entropy in bits per byte (0..8)
+      - repetitiveness: fraction of 4-byte windows that repeat an earlier one
+
+    Only the names listed in ``features`` are computed and returned.
+    """
+    unknown = set(features) - set(CLASSIFY_FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features: {sorted(unknown)}")
+    wanted = set(features)
+    sample = _sample(data, sample_size)
+    n = len(sample)
+    result = {'size': len(data), 'sample_size': n}
+    result.update((name, 0.0) for name in CLASSIFY_FEATURES if name in wanted)
+    if n == 0:
+        return result
+
+    try:
+        import numpy as _np
+        arr = _np.frombuffer(sample, dtype=_np.uint8)
+        if wanted & {'printable_ratio', 'entropy'}:
+            hist = _np.bincount(arr, minlength=256)
+            if 'printable_ratio' in wanted:
+                result['printable_ratio'] = float(hist[32:127].sum()) / n
+            if 'entropy' in wanted:
+                p = hist[hist > 0] / n
+                result['entropy'] = float(-(p * _np.log2(p)).sum())
+        if 'repetitiveness' in wanted and n >= 4:
+            a = arr.astype(_np.uint32)
+            grams = a[:-3] | (a[1:-2] << 8) | (a[2:-1] << 16) | (a[3:] << 24)
+            result['repetitiveness'] = 1.0 - _np.unique(grams).size / grams.size
+        return result
+    except ImportError:
+        pass
+
+    # Pure-Python fallback (bounded by the sample size)
+    if wanted & {'printable_ratio', 'entropy'}:
+        hist = [0] * 256
+        for b in sample:
+            hist[b] += 1
+        if 'printable_ratio' in wanted:
+            result['printable_ratio'] = sum(hist[32:127]) / n
+        if 'entropy' in wanted:
+            result['entropy'] = -sum((c / n) * math.log2(c / n) for c in hist if c)
+    if 'repetitiveness' in wanted and n >= 4:
+        grams = {sample[i:i + 4] for i in range(n - 3)}
+        result['repetitiveness'] = 1.0 - len(grams) / (n - 3)
+    return result
+
+
+# Signatures of entropy-coded image formats; a general-purpose compressor
+# gains next to nothing on these payloads.
+_ENTROPY_CODED_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n',  # PNG (deflate-compressed IDAT)
+    b'\xff\xd8\xff',         # JPEG
+)
+
+
+def is_incompressible(data: bytes, sample_size: int = 64 * 1024, min_saving: float = 0.03) -> bool:
+    """Return True if compressing ``data`` again is not worth the CPU.
+
+    PNG, JPEG and WEBP payloads are recognised by their signature. Anything
+    else gets a quick trial: a sample from the start and the middle of the
+    data is compressed with zlib level 1 and the payload is considered
+    incompressible when that saves less than ``min_saving`` (a fraction).
+    """
+    if not data:
+        return True
+    head = bytes(data[:12])
+    if head.startswith(_ENTROPY_CODED_SIGNATURES) or (head[:4] == b'RIFF' and head[8:12] == b'WEBP'):
+        return True
+
+    half = sample_size // 2
+    if len(data) > sample_size:
+        mid = len(data) // 2
+        sample = bytes(data[:half]) + bytes(data[mid:mid + half])
+    else:
+        sample = bytes(data)
+    saved = 1.0 - len(zlib.compress(sample, 1)) / len(sample)
+    return saved < min_saving
+
+
+# Levels tried per backend by ``select_codec`` (None = backend default)
+TRIAL_LEVELS: Dict[CompressionType, Tuple[Optional[int], ...]] = {
+    CompressionType.ZLIB: (1, 6, 9),
+    CompressionType.BROTLI: (5, 9),
+    CompressionType.LZMA: (1, 6),
+    CompressionType.ZSTD: (3, 9, 19),
+}
+
+
+def select_codec(data: bytes, objective: str = 'size',
+                 sample_size: int = CLASSIFY_SAMPLE_SIZE) -> Dict[str, Any]:
+    """Trial-compress a sample of ``data`` and pick a codec and level.
+
+    Every available backend in ``TRIAL_LEVELS`` is tried on the same bounded
+    sample. ``objective`` is 'size' (smallest output) or 'speed' (most bytes
+    saved per millisecond). Returns a dict with the chosen ``comp_type`` and
+    ``level`` plus the ``trials`` measurements. If no codec shrinks the
+    sample, NONE is chosen.
+    """
+    if objective not in ('size', 'speed'):
+        raise ValueError(f"Unknown compression objective: {objective}")
+
+    sample = _sample(data, sample_size)
+    backends = available_backends()
+    trials = []
+    for comp_type, levels in TRIAL_LEVELS.items():
+        if not backends[comp_type]:
+            continue
+        for level in levels:
+            try:
+                compressor = CompressionType.get_compressor(comp_type, level)
+                start = time.perf_counter()
+                size = len(compressor(sample))
+                elapsed = (time.perf_counter() - start) * 1000.0
+            except Exception:
+                continue
+            trials.append({'comp_type': comp_type.name, 'level': level,
+                           'sample_bytes': len(sample), 'compressed_bytes': size,
+                           'ms': elapsed})
+
+    def saved_per_ms(t):
+        return (t['sample_bytes'] - t['compressed_bytes']) / max(t['ms'], 1e-3)
+
+    useful = [t for t in trials if t['compressed_bytes'] < t['sample_bytes']]
+    if not useful:
+        best = None
+    elif objective == 'size':
+        best = min(useful, key=lambda t: (t['compressed_bytes'], t['ms']))
+    else:
+        best = max(useful, key=saved_per_ms)
+
+    return {
+        'objective': objective,
+        'comp_type': CompressionType[best['comp_type']] if best else CompressionType.NONE,
+        'level': best['level'] if best else None,
+        'trials': trials,
+    }
+
+
+def adaptive_compress(data: bytes, data_type: str = 'binary', mode: str = 'rules',
+                      objective: str = 'size',
+                      stats: Optional[Dict[str, Any]] = None) -> Tuple[bytes, CompressionType]:
+    """Select a compression algorithm and compress.
 
     Returns (compressed_bytes, CompressionType).
-    Heuristics (simple):
-      - If data looks textual (lots of printable ASCII), prefer Brotli if available.
+    With ``mode='rules'`` (default) the choice is heuristic, driven by the
+    ``classify_data`` features of a bounded sample:
+      - If the byte entropy exceeds ``INCOMPRESSIBLE_ENTROPY``, store as-is (NONE).
       - If zstandard is available and data is large, prefer ZSTD.
-      - Fall back to LZMA, then ZLIB.
+      - If data looks textual (lots of printable ASCII), prefer Brotli if available.
+      - Fall back to LZMA for structured data, then ZLIB.
+      - Data more repetitive than ``REPETITIVE_THRESHOLD`` gets a stronger
+        ZSTD/ZLIB level (repetitiveness is only computed in that case).
+    With ``mode='trial'`` the codec and level come from ``select_codec``
+    under ``objective``. ``stats`` (if given) is filled with the choice and
+    its measurements.
     """
-    # Heuristic: fraction of printable ASCII
-    printable = sum(1 for b in data if 32 <= b <= 126)
-    ratio = printable / max(1, len(data))
+    if mode == 'trial':
+        start = time.perf_counter()
+        selection = select_codec(data, objective=objective)
+        chosen, level = selection['comp_type'], selection['level']
+        try:
+            compressed = CompressionType.get_compressor(chosen, level)(data)
+        except Exception as e:
+            raise CompressionError(f'Adaptive compression failed: {e}')
+        if stats is not None:
+            stats.update(selection, mode=mode, comp_type=chosen.name,
+                         raw_bytes=len(data), stored_bytes=len(compressed),
+                         total_ms=(time.perf_counter() - start) * 1000.0)
+        return compressed, chosen
+    if mode != 'rules':
+        raise ValueError(f"Unknown compression selection mode: {mode}")
 
-    # Check available backends
-    brotli_mod = _try_import('brotli')
-    zstd_mod = _try_import('zstandard')
-    lzma_mod = _try_import('lzma')
+    # Check available backends (probed once per process)
+    backends = available_backends()
 
     chosen: CompressionType = CompressionType.ZLIB
+    level: Optional[int] = None
+    # One histogram of the sample gives both features
+    features = classify_data(data, features=('printable_ratio', 'entropy'))
 
+    # Random-looking data (already compressed or encrypted) is stored as-is
+    if features['entropy'] > INCOMPRESSIBLE_ENTROPY:
+        chosen = CompressionType.NONE
     # Prefer zstd for large data if available
-    if zstd_mod and len(data) > 8_000:
+    elif backends[CompressionType.ZSTD] and len(data) > 8_000:
         chosen = CompressionType.ZSTD
     # Prefer brotli for mostly-text data
-    elif brotli_mod and ratio > 0.6:
+    elif backends[CompressionType.BROTLI] and features['printable_ratio'] > 0.6:
         chosen = CompressionType.BROTLI
     # Prefer lzma for structured/binary JSON-like data if available
-    elif lzma_mod and data_type in ('json', 'structured'):
+    elif backends[CompressionType.LZMA] and data_type in ('json', 'structured'):
         chosen = CompressionType.LZMA
     else:
         chosen = CompressionType.ZLIB
 
+    if chosen in _REPETITIVE_LEVELS and \
+            classify_data(data, features=('repetitiveness',))['repetitiveness'] > REPETITIVE_THRESHOLD:
+        level = _REPETITIVE_LEVELS[chosen]
+
     # Use CompressionType helpers to get a compressor (will raise CompressionError if backend missing)
     try:
-        compressor = CompressionType.get_compressor(chosen)
+        compressor = CompressionType.get_compressor(chosen, level)
         compressed = compressor(data)
     except Exception as e:
         # On any failure, fallback to zlib
         try:
             compressor = CompressionType.get_compressor(CompressionType.ZLIB)
             compressed = compressor(data)
-            chosen = CompressionType.ZLIB
+            chosen, level = CompressionType.ZLIB, None
         except Exception as e2:
             raise CompressionError(f'Adaptive compression failed: {e}; fallback also failed: {e2}')
 
+    if stats is not None:
+        stats.update(mode=mode, comp_type=chosen.name, level=level,
+                     raw_bytes=len(data), stored_bytes=len(compressed))
     return compressed, chosen
 
 
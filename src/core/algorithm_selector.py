@@ -4,4 +4,16 @@ from ..algorithms.registry import registry
 
 def get_compression_pair(algorithm_name=None):
     """Get compression/decompression functions for the named algorithm."""
-    return registry.get_compression(algorithm_name)
\ No newline at end of file
+    return registry.get_compression(algorithm_name)
+
+def select_compression(**requirements):
+    """Name of the fastest algorithm with the required capabilities.
+
+    ``requirements`` are the keyword arguments of
+    ``AlgorithmRegistry.find_compression_algos`` (``lossless``,
+    ``streaming``, ``thread_safe``, ``min_mbps``).
+    """
+    matches = registry.find_compression_algos(**requirements)
+    if not matches:
+        raise ValueError(f"No compression algorithm matches {requirements}")
+    return matches[0]
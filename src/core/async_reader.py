@@ -0,0 +1,140 @@
+"""
+Asyncio reader for K2SHBWI files
+
+``AsyncK2SHBWIReader`` wraps a lazy ``K2SHBWIDecoder`` for use in event-loop
+servers. File reads, decompression and image decoding all run on an
+executor (the loop's default executor unless one is given), so awaiting a
+section never blocks the loop.
+
+Concurrent requests for the same piece of work (the header, a section, one
+pyramid level) share a single executor job. A request cancelled by its
+caller does not cancel the shared job for the other waiters. Decoded
+sections stay cached in the decoder, so later calls return without touching
+the executor. Decoded level images are not cached.
+
+Usage:
+    async with AsyncK2SHBWIReader('map.k2sh', executor=pool) as reader:
+        header = await reader.read_header()
+        thumb = await reader.read_level(-1)
+        image = thumb['image']
+"""
+import asyncio
+import io
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Optional, Union
+
+from .decoder import K2SHBWIDecoder, _UNLOADED
+from .format_spec import K2SHBWIHeader
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class AsyncK2SHBWIReader:
+    """Awaitable access to the header, sections and pyramid levels of a file."""
+
+    def __init__(self, path: Union[str, Path], executor: Optional[Executor] = None,
+                 use_mmap: bool = False, dictionary_store: Any = None, base_offset: int = 0):
+        self.path = Path(path)
+        self.executor = executor
+        self.base_offset = base_offset
+        self._decoder = K2SHBWIDecoder(lazy=True, use_mmap=use_mmap, dictionary_store=dictionary_store)
+        self._opened = False
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def __aenter__(self) -> 'AsyncK2SHBWIReader':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Wait for in-flight work and release the decoder (and its mapping)."""
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        self._decoder.close()
+
+    @property
+    def decoder(self) -> K2SHBWIDecoder:
+        """The underlying lazy decoder (blocking; use from executor threads only)."""
+        return self._decoder
+
+    async def _shared(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Run ``func`` on the executor, sharing the job with concurrent callers."""
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, func)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield(): one caller being cancelled must not cancel the shared job
+        return await asyncio.shield(future)
+
+    # ------------------------------------------------------------------
+    # Header and sections
+    # ------------------------------------------------------------------
+    def _open(self) -> K2SHBWIHeader:
+        self._decoder.decode(str(self.path), base_offset=self.base_offset)
+        self._opened = True
+        return self._decoder.header
+
+    async def read_header(self) -> K2SHBWIHeader:
+        if self._opened:
+            return self._decoder.header
+        return await self._shared('header', self._open)
+
+    async def _read_section(self, name: str) -> Any:
+        await self.read_header()
+        if getattr(self._decoder, f'_{name}') is not _UNLOADED:
+            return getattr(self._decoder, name)
+        return await self._shared(name, lambda: getattr(self._decoder, name))
+
+    async def read_metadata(self) -> Dict[str, Any]:
+        return await self._read_section('metadata') or {}
+
+    async def read_hotspots(self) -> List[Dict[str, Any]]:
+        return await self._read_section('hotspots')
+
+    async def read_data_layers(self) -> Dict[str, Any]:
+        return await self._read_section('data_layers')
+
+    async def read_data_layer(self, layer_id: str) -> Dict[str, Any]:
+        await self.read_header()
+        return await self._shared(('data_layer', layer_id), lambda: self._decoder.get_data_layer(layer_id))
+
+    # ------------------------------------------------------------------
+    # Image
+    # ------------------------------------------------------------------
+    def _decode_level(self, idx: int) -> Dict[str, Any]:
+        from PIL import Image
+        entry = self._decoder.read_level(idx)
+        img = Image.open(io.BytesIO(entry['data']))
+        img.load()
+        level = {k: v for k, v in entry.items() if k != 'data'}
+        level['image'] = img
+        return level
+
+    async def read_level(self, idx: int) -> Dict[str, Any]:
+        """Decode pyramid level ``idx`` (0 = full resolution, -1 = thumbnail).
+
+        Returns the level entry (width, height, ...) with the decoded PIL
+        ``image`` in place of the compressed ``data``.
+        """
+        await self.read_header()
+        pyramid = self._decoder._image_pyramid
+        if pyramid is _UNLOADED:
+            pyramid = await self._shared('pyramid', lambda: self._decoder.image_pyramid)
+        # Key on the absolute index so that -1 and n - 1 share work
+        if idx < 0:
+            idx += len(pyramid)
+        return await self._shared(('level', idx), lambda: self._decode_level(idx))
+
+    async def read_region(self, level: int, x: int, y: int, w: int, h: int) -> 'Image.Image':
+        """Decode a region of a pyramid level (see ``K2SHBWIDecoder.read_region``)."""
+        await self.read_header()
+        return await self._shared(('region', level, x, y, w, h),
+                                  lambda: self._decoder.read_region(level, x, y, w, h))
+
+
+__all__ = ['AsyncK2SHBWIReader']
@@ -0,0 +1,186 @@
+"""
+Parallel batch decoding of K2SHBWI files
+
+``decode_many`` decodes many files over a process pool. Each worker uses a
+lazy ``K2SHBWIDecoder`` and reads only the requested sections. Results are
+plain dicts (lists, dicts, bytes), so they pickle cheaply and contain no PIL
+objects.
+
+At most ``max_pending`` files are in flight at a time. New files are only
+submitted as results are consumed, so memory stays bounded however long
+``paths`` is (it may be a lazy iterable). A file that fails to decode
+produces a result with ``ok=False`` and an ``error`` message. It does not
+stop the batch. Neither does a worker process dying (out of memory, a
+crash in a native library): every file in flight in the broken pool is
+reported as failed with a ``BrokenProcessPool`` error and the remaining
+files go to a new pool.
+
+Usage:
+    for result in decode_many(Path('maps').glob('*.k2sh'), sections=('metadata', 'hotspots'),
+                              workers=8, ordered=False):
+        if result['ok']:
+            index(result['path'], result['hotspots'])
+"""
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+from .decoder import K2SHBWIDecoder
+
+# Sections decode_many can return:
+#   header      - version, flags, section offsets and dictionary id
+#   metadata    - metadata dict
+#   hotspots    - hotspot list
+#   data_layers - data layers dict
+#   levels      - pyramid level entries (width, height, format, ...) without data
+#   image       - encoded bytes of the full-resolution image (PNG/JPEG/...)
+SECTIONS = ('header', 'metadata', 'hotspots', 'data_layers', 'levels', 'image')
+DEFAULT_SECTIONS = ('header', 'metadata', 'hotspots')
+
+
+def _header_dict(header) -> Dict[str, Any]:
+    return {
+        'version': f'{header.version_major}.{header.version_minor}',
+        'flags': header.flags,
+        'metadata_offset': header.metadata_offset,
+        'image_pyramid_offset': header.image_pyramid_offset,
+        'hotspot_map_offset': header.hotspot_map_offset,
+        'data_layers_offset': header.data_layers_offset,
+        'dictionary_id': header.dictionary_id,
+    }
+
+
+def decode_file(path: Union[str, Path], sections: Sequence[str] = DEFAULT_SECTIONS,
+                dictionary_root: Optional[str] = None) -> Dict[str, Any]:
+    """Decode the requested ``sections`` of one file into a picklable dict.
+
+    This is the worker function of ``decode_many``. Errors are reported in
+    the result (``ok=False``, ``error``) instead of being raised.
+    """
+    result: Dict[str, Any] = {'path': str(path), 'ok': True, 'error': None}
+    store = None
+    if dictionary_root is not None:
+        from .dictionaries import DictionaryStore
+        store = DictionaryStore(dictionary_root)
+    try:
+        with K2SHBWIDecoder(lazy=True, dictionary_store=store) as dec:
+            dec.decode(str(path))
+            if 'header' in sections:
+                result['header'] = _header_dict(dec.header)
+            if 'metadata' in sections:
+                result['metadata'] = dec.get_metadata()
+            if 'hotspots' in sections:
+                result['hotspots'] = dec.get_hotspots()
+            if 'data_layers' in sections:
+                result['data_layers'] = dec.data_layers
+            if 'levels' in sections:
+                result['levels'] = dec.level_entries()
+            if 'image' in sections:
+                data = dec.image_data
+                result['image'] = bytes(data) if data is not None else None
+    except Exception as e:
+        result['ok'] = False
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+def decode_many(paths: Iterable[Union[str, Path]], sections: Sequence[str] = DEFAULT_SECTIONS,
+                workers: Optional[int] = None, ordered: bool = True,
+                max_pending: Optional[int] = None,
+                dictionary_store: Any = None) -> Iterator[Dict[str, Any]]:
+    """Decode many files in parallel, yielding one result dict per path.
+
+    Args:
+        paths: Files to decode (any iterable; consumed incrementally)
+        sections: Subset of ``SECTIONS`` to return for each file
+        workers: Worker processes (default ``os.cpu_count()``); ``0`` or
+            ``1`` decodes in the calling process
+        ordered: Yield results in input order (default) or as they complete
+        max_pending: Files in flight at once (default ``4 * workers``)
+        dictionary_store: ``DictionaryStore`` for files that use trained
+            zstd dictionaries (workers open the same store directory)
+
+    Every result has ``path``, ``index`` (position in ``paths``), ``ok`` and
+    ``error`` keys plus one key per requested section.
+    """
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown sections: {sorted(unknown)}")
+    sections = tuple(sections)
+    dictionary_root = str(dictionary_store.root) if dictionary_store is not None else None
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for index, path in enumerate(paths):
+            result = decode_file(path, sections, dictionary_root)
+            result['index'] = index
+            yield result
+        return
+
+    if max_pending is None:
+        max_pending = 4 * workers
+    if max_pending < 1:
+        raise ValueError("max_pending must be at least 1")
+
+    source = enumerate(paths)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending: deque = deque()
+        # Futures submitted to the current pool
+        in_pool = set()
+
+        def replace_pool() -> None:
+            # A worker died: files still pending in the old pool fail with
+            # BrokenProcessPool as they are consumed
+            nonlocal pool
+            pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers)
+            in_pool.clear()
+
+        def submit() -> bool:
+            for index, path in source:
+                try:
+                    future = pool.submit(decode_file, path, sections, dictionary_root)
+                except BrokenProcessPool:
+                    replace_pool()
+                    future = pool.submit(decode_file, path, sections, dictionary_root)
+                in_pool.add(future)
+                pending.append((index, path, future))
+                return True
+            return False
+
+        def finish(index: int, path: Any, future: Future) -> Dict[str, Any]:
+            current = future in in_pool
+            in_pool.discard(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker died or the result could not be pickled
+                result = {'path': str(path), 'ok': False, 'error': f'{type(e).__name__}: {e}'}
+                if isinstance(e, BrokenProcessPool) and current:
+                    # The pool may not refuse new work yet; stop using it now
+                    replace_pool()
+            result['index'] = index
+            return result
+
+        while len(pending) < max_pending and submit():
+            pass
+        while pending:
+            if ordered:
+                item = pending.popleft()
+            else:
+                done, _ = wait([future for _, _, future in pending], return_when=FIRST_COMPLETED)
+                item = next(entry for entry in pending if entry[2] in done)
+                pending.remove(item)
+            result = finish(*item)
+            submit()
+            yield result
+    finally:
+        pool.shutdown()
+
+
+__all__ = ['decode_many', 'decode_file', 'SECTIONS', 'DEFAULT_SECTIONS']
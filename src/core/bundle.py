@@ -0,0 +1,287 @@
+"""
+Bundle container for many K2SHBWI files
+
+Batch jobs produce thousands of small .k2sh files. A bundle stores them
+back to back in one file, followed by a central directory (entry name ->
+offset, length and a summary of the entry's header) and a fixed-size
+trailer. Opening a bundle reads the trailer and the directory and nothing
+else. Entries are complete K2SHBWI files, so ``K2SHBWIBundle.open()``
+returns an ordinary ``K2SHBWIDecoder`` that reads the entry in place
+(``decode(path, base_offset=...)``).
+
+Layout (see the ``BUNDLE_*`` constants in ``format_spec``):
+    - Header: magic ``K2SB``, version
+    - Entries: complete K2SHBWI files
+    - Central directory
+    - Trailer: directory offset, entry count, directory length, magic ``K2SE``
+
+Appending works like zip: new entries, then a new directory and trailer
+are written after the old trailer, which is left in place as dead space.
+Existing bytes are never overwritten, and the new trailer is written
+(and synced) last. If an append is interrupted, the file ends in bytes
+that are not a trailer. Readers then search backwards for the last
+complete trailer, so the bundle opens with its entries as they were
+before the append.
+
+Usage:
+    with K2SHBWIBundleWriter('maps.k2sb') as writer:
+        for path in Path('out').glob('*.k2sh'):
+            writer.add_file(path.stem, path)
+
+    bundle = K2SHBWIBundle('maps.k2sb')
+    with bundle.open('berlin') as dec:
+        hotspots = dec.get_hotspots()
+"""
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Union
+
+from .decoder import K2SHBWIDecoder
+from .fileio import COPY_CHUNK, copy_bytes
+from .format_spec import (
+    BUNDLE_ENTRY,
+    BUNDLE_HEADER,
+    BUNDLE_MAGIC,
+    BUNDLE_NAME_LENGTH,
+    BUNDLE_TRAILER,
+    BUNDLE_TRAILER_MAGIC,
+    BUNDLE_VERSION,
+    FeatureFlags,
+    FormatError,
+    HEADER_SIZE,
+    K2SHBWIHeader,
+)
+
+
+@dataclass
+class BundleEntry:
+    """Central directory record of one bundled K2SHBWI file."""
+    name: str
+    offset: int
+    length: int
+    version_major: int
+    version_minor: int
+    flags: int
+    dictionary_id: int
+
+    def has_feature(self, flag: FeatureFlags) -> bool:
+        return bool(self.flags & flag.value)
+
+    def pack(self) -> bytes:
+        name = self.name.encode('utf-8')
+        return b''.join((BUNDLE_NAME_LENGTH.pack(len(name)), name, BUNDLE_ENTRY.pack(
+            self.offset, self.length, self.version_major, self.version_minor,
+            self.flags, self.dictionary_id)))
+
+
+def _parse_directory(f, end: int) -> Dict[str, Any]:
+    """Parse the trailer ending at ``end`` and its directory (FormatError if invalid)."""
+    f.seek(end - BUNDLE_TRAILER.size)
+    dir_offset, count, dir_length, trailer_magic = BUNDLE_TRAILER.unpack(f.read(BUNDLE_TRAILER.size))
+    if trailer_magic != BUNDLE_TRAILER_MAGIC:
+        raise FormatError("Bundle trailer not found (truncated or unfinished bundle)")
+    if dir_offset < BUNDLE_HEADER.size or dir_offset + dir_length + BUNDLE_TRAILER.size != end:
+        raise FormatError("Bundle directory does not match the trailer position")
+
+    f.seek(dir_offset)
+    directory = f.read(dir_length)
+    entries: Dict[str, BundleEntry] = {}
+    pos = 0
+    try:
+        for _ in range(count):
+            (name_len,) = BUNDLE_NAME_LENGTH.unpack_from(directory, pos)
+            pos += BUNDLE_NAME_LENGTH.size
+            name = directory[pos:pos + name_len].decode('utf-8')
+            pos += name_len
+            entries[name] = BundleEntry(name, *BUNDLE_ENTRY.unpack_from(directory, pos))
+            pos += BUNDLE_ENTRY.size
+    except Exception as e:
+        raise FormatError(f"Corrupt bundle directory: {e}")
+    for entry in entries.values():
+        if entry.offset < BUNDLE_HEADER.size or entry.offset + entry.length > dir_offset:
+            raise FormatError(f"Bundle entry {entry.name!r} exceeds the entry area")
+    return {'directory_offset': dir_offset, 'end': end, 'entries': entries}
+
+
+def _trailer_candidates(f, size: int) -> Iterator[int]:
+    """End positions of possible trailers, searching backwards from ``size``."""
+    magic = BUNDLE_TRAILER_MAGIC
+    pos = size
+    while pos > BUNDLE_HEADER.size:
+        start = max(BUNDLE_HEADER.size, pos - COPY_CHUNK)
+        f.seek(start)
+        # Overlap so a magic split across chunk boundaries is still found
+        chunk = f.read(min(size, pos + len(magic) - 1) - start)
+        hit = chunk.rfind(magic)
+        while hit != -1:
+            if start + hit < pos:
+                yield start + hit + len(magic)
+            hit = chunk.rfind(magic, 0, hit)
+        pos = start
+
+
+def _read_directory(f, size: int) -> Dict[str, Any]:
+    """Read the trailer and central directory of an open bundle file.
+
+    The trailer normally ends the file. After an interrupted append it is
+    followed by bytes of the unfinished append, and the last complete
+    trailer before them is used.
+    """
+    if size < BUNDLE_HEADER.size + BUNDLE_TRAILER.size:
+        raise FormatError("File is too small to be a K2SHBWI bundle")
+    f.seek(0)
+    magic, version = BUNDLE_HEADER.unpack(f.read(BUNDLE_HEADER.size))
+    if magic != BUNDLE_MAGIC:
+        raise FormatError(f"Invalid bundle magic: {magic!r}")
+    if version > BUNDLE_VERSION:
+        raise FormatError(f"Unsupported bundle version: {version}")
+
+    try:
+        return _parse_directory(f, size)
+    except FormatError as e:
+        error = e
+    for end in _trailer_candidates(f, size):
+        if end < BUNDLE_HEADER.size + BUNDLE_TRAILER.size:
+            break
+        if end == size:
+            continue
+        try:
+            return _parse_directory(f, end)
+        except FormatError:
+            continue
+    raise error
+
+
+class K2SHBWIBundle:
+    """Read-only view of a bundle: lists entries and opens them with random access."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            info = _read_directory(f, os.fstat(f.fileno()).st_size)
+        self.directory_offset = info['directory_offset']
+        # End of the trailer in use; bytes after it belong to an interrupted append
+        self.end = info['end']
+        self.entries: Dict[str, BundleEntry] = info['entries']
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def names(self) -> List[str]:
+        return list(self.entries)
+
+    def entry(self, name: str) -> BundleEntry:
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise KeyError(f"No entry {name!r} in bundle {self.path}")
+
+    def open(self, name: str, lazy: bool = True, use_mmap: bool = False,
+             dictionary_store: Any = None) -> K2SHBWIDecoder:
+        """Decode entry ``name`` in place (lazy by default: only its header is read)."""
+        entry = self.entry(name)
+        decoder = K2SHBWIDecoder(lazy=lazy, use_mmap=use_mmap, dictionary_store=dictionary_store)
+        decoder.decode(str(self.path), base_offset=entry.offset)
+        return decoder
+
+    def read_bytes(self, name: str) -> bytes:
+        """Raw bytes of entry ``name`` (a complete .k2sh file)."""
+        entry = self.entry(name)
+        with open(self.path, 'rb') as f:
+            f.seek(entry.offset)
+            return f.read(entry.length)
+
+    def extract(self, name: str, output_path: Union[str, Path]) -> None:
+        """Write entry ``name`` out as a standalone .k2sh file."""
+        entry = self.entry(name)
+        with open(self.path, 'rb') as src, open(output_path, 'wb') as dst:
+            src.seek(entry.offset)
+            copy_bytes(src, dst, entry.length, 'bundle entry')
+
+
+class K2SHBWIBundleWriter:
+    """Create a bundle, or append entries to an existing one (``append=True``).
+
+    The directory and trailer are written by ``close()``. Until then, a new
+    bundle has no directory and cannot be read. An existing bundle being
+    appended to keeps its old directory and trailer, so until ``close()``
+    (or if the append never finishes) readers see the entries it had before.
+    """
+
+    def __init__(self, path: Union[str, Path], append: bool = False):
+        self.path = Path(path)
+        self.entries: Dict[str, BundleEntry] = {}
+        if append and self.path.exists():
+            self._f = open(self.path, 'r+b')
+            try:
+                info = _read_directory(self._f, os.fstat(self._f.fileno()).st_size)
+            except Exception:
+                self._f.close()
+                raise
+            self.entries = info['entries']
+            # After the old trailer (and over any interrupted append)
+            self._f.seek(info['end'])
+        else:
+            self._f = open(self.path, 'wb')
+            self._f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION))
+
+    def __enter__(self) -> 'K2SHBWIBundleWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _add(self, name: str, head: bytes, write) -> BundleEntry:
+        if self._f is None:
+            raise ValueError("Bundle writer is closed")
+        if name in self.entries:
+            raise ValueError(f"Bundle already has an entry named {name!r}")
+        if len(name.encode('utf-8')) > 0xFFFF:
+            raise ValueError("Bundle entry names are limited to 65535 bytes")
+        header = K2SHBWIHeader.unpack(head)
+        offset = self._f.tell()
+        write(self._f)
+        entry = BundleEntry(name, offset, self._f.tell() - offset, header.version_major,
+                            header.version_minor, header.flags, header.dictionary_id)
+        self.entries[name] = entry
+        return entry
+
+    def add_bytes(self, name: str, data: bytes) -> BundleEntry:
+        """Add a K2SHBWI file given as bytes."""
+        return self._add(name, data[:HEADER_SIZE], lambda f: f.write(data))
+
+    def add_file(self, name: str, path: Union[str, Path]) -> BundleEntry:
+        """Add a .k2sh file from disk (copied in chunks)."""
+        size = os.path.getsize(path)
+        with open(path, 'rb') as src:
+            head = src.read(HEADER_SIZE)
+            src.seek(0)
+            return self._add(name, head, lambda f: copy_bytes(src, f, size, 'bundle entry'))
+
+    def close(self) -> None:
+        """Write the central directory, then (once that is on disk) the trailer."""
+        if self._f is None:
+            return
+        f, self._f = self._f, None
+        try:
+            dir_offset = f.tell()
+            directory = b''.join(entry.pack() for entry in self.entries.values())
+            f.write(directory)
+            f.flush()
+            os.fsync(f.fileno())
+            f.write(BUNDLE_TRAILER.pack(dir_offset, len(self.entries), len(directory), BUNDLE_TRAILER_MAGIC))
+            f.truncate(f.tell())
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+
+__all__ = ['K2SHBWIBundle', 'K2SHBWIBundleWriter', 'BundleEntry']
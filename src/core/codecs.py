@@ -0,0 +1,338 @@
+"""
+Codec registry for K2SHBWI
+
+Builds compress/decompress callables for each `CompressionType` and caches
+the expensive backend contexts (zstandard compressor/decompressor objects)
+per thread, keyed by ``(type, level, dictionary)``. Contexts are not
+thread-safe, so every thread gets its own; within a thread they are reused
+across sections and files instead of being recreated on every call.
+
+Level semantics follow the backend: zlib level (0-9), brotli quality
+(0-11), lzma preset (0-9) and zstd level (1-22). ``None`` uses the backend
+default.
+
+``iter_decompress`` is the streaming counterpart of ``get_decompressor``.
+It yields output in bounded chunks through each backend's incremental API
+and stops as soon as the output exceeds ``max_size``, so a small
+compressed payload cannot inflate without limit.
+"""
+import io
+import threading
+import zlib
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from .errors import CompressionError
+from .format import CompressionType
+
+_local = threading.local()
+
+
+def _contexts() -> Dict[Hashable, Any]:
+    """Per-thread context cache."""
+    cache = getattr(_local, 'contexts', None)
+    if cache is None:
+        cache = _local.contexts = {}
+    return cache
+
+
+def _cached(key: Tuple, factory: Callable[[], Any]) -> Any:
+    cache = _contexts()
+    ctx = cache.get(key)
+    if ctx is None:
+        ctx = cache[key] = factory()
+    return ctx
+
+
+def _dict_key(dict_data: Any) -> Optional[int]:
+    return None if dict_data is None else dict_data.dict_id()
+
+
+def _import_zstd():
+    try:
+        import zstandard as zstd
+        return zstd
+    except ImportError:
+        raise CompressionError(
+            "zstandard library is not installed. Install with: pip install zstandard"
+        )
+
+
+def _import_brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        raise CompressionError(
+            "brotli library is not installed. Install with: pip install brotli"
+        )
+
+
+def _import_lzma():
+    try:
+        import lzma
+        return lzma
+    except ImportError:
+        raise CompressionError(
+            "lzma library is not available in this Python installation"
+        )
+
+
+def _check_dictionary(comp_type: CompressionType, dict_data: Any) -> None:
+    if comp_type == CompressionType.ZSTD_DICT and dict_data is None:
+        raise CompressionError("ZSTD_DICT requires a zstd dictionary")
+    if dict_data is not None and comp_type not in (CompressionType.ZSTD, CompressionType.ZSTD_DICT):
+        raise CompressionError(f"{comp_type.name} does not support dictionaries")
+
+
+def get_compressor(comp_type: CompressionType, level: Optional[int] = None,
+                   dict_data: Any = None) -> Callable[[bytes], bytes]:
+    """Return a compressor callable for ``comp_type`` at ``level``.
+
+    ``dict_data`` (a ``zstandard.ZstdCompressionDict``) is required by
+    ZSTD_DICT and optional for ZSTD. The backend module is resolved on every
+    call so a missing optional library always raises CompressionError;
+    contexts are resolved per call from the calling thread's cache.
+    """
+    if not isinstance(comp_type, CompressionType):
+        raise ValueError(f"Unsupported compression type: {comp_type}")
+    _check_dictionary(comp_type, dict_data)
+
+    if comp_type == CompressionType.NONE:
+        return lambda x: x
+
+    elif comp_type == CompressionType.ZLIB:
+        if level is not None:
+            return lambda x: zlib.compress(x, level)
+        return zlib.compress
+
+    elif comp_type == CompressionType.BROTLI:
+        brotli = _import_brotli()
+        if level is not None:
+            return lambda x: brotli.compress(x, quality=level)
+        return brotli.compress
+
+    elif comp_type == CompressionType.LZMA:
+        lzma = _import_lzma()
+        if level is not None:
+            return lambda x: lzma.compress(x, preset=level)
+        return lzma.compress
+
+    elif comp_type in (CompressionType.ZSTD, CompressionType.ZSTD_DICT):
+        zstd = _import_zstd()
+        key = ('c', comp_type, level, _dict_key(dict_data))
+        kwargs: Dict[str, Any] = {}
+        if level is not None:
+            kwargs['level'] = level
+        if dict_data is not None:
+            kwargs['dict_data'] = dict_data
+
+        def zstd_compress(b: bytes) -> bytes:
+            return _cached(key, lambda: zstd.ZstdCompressor(**kwargs)).compress(b)
+        return zstd_compress
+
+    # Default handler for unknown types
+    return lambda x: x
+
+
+def get_decompressor(comp_type: CompressionType, dict_data: Any = None) -> Callable[[bytes], bytes]:
+    """Return a decompressor callable for ``comp_type``."""
+    if not isinstance(comp_type, CompressionType):
+        raise ValueError(f"Unsupported compression type: {comp_type}")
+    _check_dictionary(comp_type, dict_data)
+
+    if comp_type == CompressionType.NONE:
+        return lambda x: x
+
+    elif comp_type == CompressionType.ZLIB:
+        return zlib.decompress
+
+    elif comp_type == CompressionType.BROTLI:
+        return _import_brotli().decompress
+
+    elif comp_type == CompressionType.LZMA:
+        return _import_lzma().decompress
+
+    elif comp_type in (CompressionType.ZSTD, CompressionType.ZSTD_DICT):
+        zstd = _import_zstd()
+        key = ('d', comp_type, _dict_key(dict_data))
+
+        def zstd_decompress(b: bytes) -> bytes:
+            dctx = _cached(key, lambda: zstd.ZstdDecompressor(dict_data=dict_data))
+            return dctx.decompress(b)
+        return zstd_decompress
+
+    # Default handler for unknown types
+    return lambda x: x
+
+
+# Output chunk size of iter_decompress
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+def _limit_error(max_size: int):
+    from .format_spec import DecompressionLimitError
+    return DecompressionLimitError(f"Decompressed data exceeds the limit of {max_size} bytes")
+
+
+def _zstd_frames_complete(data: bytes) -> bool:
+    """Walk the zstd frame and block headers and check every frame is whole.
+
+    ``stream_reader`` stops quietly at the end of a truncated frame, so the
+    framing is checked up front. Only headers are read; block contents are
+    skipped by their declared sizes.
+    """
+    view = memoryview(data)
+    pos, end = 0, len(view)
+    if not end:
+        return False
+    while pos < end:
+        if end - pos < 4:
+            return False
+        magic = int.from_bytes(view[pos:pos + 4], 'little')
+        pos += 4
+        if magic & 0xFFFFFFF0 == 0x184D2A50:
+            # Skippable frame: 4-byte size followed by user data
+            if end - pos < 4:
+                return False
+            pos += 4 + int.from_bytes(view[pos:pos + 4], 'little')
+            if pos > end:
+                return False
+            continue
+        if magic != 0xFD2FB528 or pos >= end:
+            return False
+        fhd = view[pos]
+        single_segment = (fhd >> 5) & 1
+        pos += 1 + (0 if single_segment else 1)
+        pos += (0, 1, 2, 4)[fhd & 3]
+        pos += (single_segment, 2, 4, 8)[fhd >> 6]
+        while True:
+            if end - pos < 3:
+                return False
+            header = int.from_bytes(view[pos:pos + 3], 'little')
+            block_type = (header >> 1) & 3
+            if block_type == 3:
+                return False
+            pos += 3 + (1 if block_type == 1 else header >> 3)
+            if pos > end:
+                return False
+            if header & 1:
+                break
+        if (fhd >> 2) & 1:
+            pos += 4
+            if pos > end:
+                return False
+    return True
+
+
+def _iter_backend(comp_type: CompressionType, data: bytes, chunk_size: int,
+                  dict_data: Any) -> Iterator[bytes]:
+    """Yield decompressed chunks of at most ``chunk_size`` bytes."""
+    if comp_type == CompressionType.NONE:
+        view = memoryview(data)
+        for pos in range(0, len(view), chunk_size):
+            yield view[pos:pos + chunk_size]
+
+    elif comp_type == CompressionType.ZLIB:
+        dobj = zlib.decompressobj()
+        pending = data
+        while not dobj.eof:
+            chunk = dobj.decompress(pending, chunk_size)
+            pending = dobj.unconsumed_tail
+            if chunk:
+                yield chunk
+            elif not pending:
+                break
+        if not dobj.eof:
+            raise CompressionError("Incomplete or truncated zlib stream")
+
+    elif comp_type == CompressionType.LZMA:
+        dobj = _import_lzma().LZMADecompressor()
+        chunk = dobj.decompress(data, max_length=chunk_size)
+        while True:
+            if chunk:
+                yield chunk
+            if dobj.eof or dobj.needs_input:
+                break
+            chunk = dobj.decompress(b'', max_length=chunk_size)
+        if not dobj.eof:
+            raise CompressionError("Incomplete or truncated lzma stream")
+
+    elif comp_type == CompressionType.BROTLI:
+        dobj = _import_brotli().Decompressor()
+        try:
+            chunk = dobj.process(data, output_buffer_limit=chunk_size)
+        except TypeError:
+            # brotli < 1.1 cannot cap the output of a call; feed the input in
+            # small pieces so each call's output stays proportionate
+            step = max(1, chunk_size // 64)
+            for pos in range(0, len(data), step):
+                chunk = dobj.process(bytes(data[pos:pos + step]))
+                if chunk:
+                    yield chunk
+        else:
+            while chunk:
+                # The limit caps buffer growth, not the exact output size
+                for pos in range(0, len(chunk), chunk_size):
+                    yield chunk[pos:pos + chunk_size]
+                if dobj.is_finished():
+                    break
+                chunk = dobj.process(b'', output_buffer_limit=chunk_size)
+        if not dobj.is_finished():
+            raise CompressionError("Incomplete or truncated brotli stream")
+
+    elif comp_type in (CompressionType.ZSTD, CompressionType.ZSTD_DICT):
+        zstd = _import_zstd()
+        key = ('d', comp_type, _dict_key(dict_data))
+        dctx = _cached(key, lambda: zstd.ZstdDecompressor(dict_data=dict_data))
+        if not _zstd_frames_complete(data):
+            raise CompressionError("Incomplete or truncated zstd stream")
+        with dctx.stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    else:
+        yield data
+
+
+def iter_decompress(comp_type: CompressionType, data: bytes, max_size: Optional[int] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, dict_data: Any = None) -> Iterator[bytes]:
+    """Decompress ``data`` incrementally, yielding chunks of at most ``chunk_size`` bytes.
+
+    Raises ``format_spec.DecompressionLimitError`` once the total output
+    exceeds ``max_size`` (no limit when ``None``). At most one chunk beyond
+    the limit is ever produced.
+    """
+    if not isinstance(comp_type, CompressionType):
+        raise ValueError(f"Unsupported compression type: {comp_type}")
+    _check_dictionary(comp_type, dict_data)
+    total = 0
+    for chunk in _iter_backend(comp_type, data, chunk_size, dict_data):
+        total += len(chunk)
+        if max_size is not None and total > max_size:
+            raise _limit_error(max_size)
+        yield chunk
+
+
+def decompress_bounded(comp_type: CompressionType, data: bytes, max_size: int,
+                       dict_data: Any = None) -> bytes:
+    """Decompress ``data`` into one buffer, failing once it exceeds ``max_size`` bytes."""
+    if comp_type == CompressionType.NONE:
+        # Stored payloads are returned as-is (zero-copy in mmap mode)
+        if len(data) > max_size:
+            raise _limit_error(max_size)
+        return data
+    out = bytearray()
+    for chunk in iter_decompress(comp_type, data, max_size, dict_data=dict_data):
+        out += chunk
+    return bytes(out)
+
+
+def clear_cache() -> None:
+    """Drop the calling thread's cached contexts."""
+    _contexts().clear()
+
+
+__all__ = ['get_compressor', 'get_decompressor', 'iter_decompress', 'decompress_bounded', 'clear_cache']
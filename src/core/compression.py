@@ -8,9 +8,9 @@ It mirrors the behavior implemented on the `CompressionType` enum but
 centralizes a small stable API that other modules (or documentation)
 can import from `src.core.compression`.
 """
-from typing import Callable, Union
+from typing import Callable, Optional, Union
 
-from .format_spec import CompressionType, CompressionError
+from .format_spec import CompressionType, CompressionError, DecompressionLimitError
 
 
 def _resolve(comp: Union[CompressionType, int, str]) -> CompressionType:
@@ -31,10 +31,11 @@ def _resolve(comp: Union[CompressionType, int, str]) -> CompressionType:
     raise CompressionError(f"Invalid compression type: {comp}")
 
 
-def get_compressor(comp: Union[CompressionType, int, str]) -> Callable[[bytes], bytes]:
-    """Return a compressor callable for the given compression type."""
+def get_compressor(comp: Union[CompressionType, int, str],
+                   level: Optional[int] = None) -> Callable[[bytes], bytes]:
+    """Return a compressor callable for the given compression type and level."""
     ct = _resolve(comp)
-    return CompressionType.get_compressor(ct)
+    return CompressionType.get_compressor(ct, level)
 
 
 def get_decompressor(comp: Union[CompressionType, int, str]) -> Callable[[bytes], bytes]:
@@ -43,20 +44,31 @@ def get_decompressor(comp: Union[CompressionType, int, str]) -> Callable[[bytes]
     return CompressionType.get_decompressor(ct)
 
 
-def compress_bytes(comp: Union[CompressionType, int, str], data: bytes) -> bytes:
-    """Compress `data` with the specified compression type."""
-    compressor = get_compressor(comp)
+def compress_bytes(comp: Union[CompressionType, int, str], data: bytes,
+                   level: Optional[int] = None) -> bytes:
+    """Compress `data` with the specified compression type (and optional level)."""
+    compressor = get_compressor(comp, level)
     try:
         return compressor(data)
     except Exception as e:
         raise CompressionError(f"Compression failed: {e}") from e
 
 
-def decompress_bytes(comp: Union[CompressionType, int, str], data: bytes) -> bytes:
-    """Decompress `data` with the specified compression type."""
-    decompressor = get_decompressor(comp)
+def decompress_bytes(comp: Union[CompressionType, int, str], data: bytes,
+                     max_size: Optional[int] = None) -> bytes:
+    """Decompress `data` with the specified compression type.
+
+    With `max_size` the data is inflated incrementally and
+    `DecompressionLimitError` is raised once the output exceeds it.
+    """
+    ct = _resolve(comp)
     try:
-        return decompressor(data)
+        if max_size is not None:
+            from .codecs import decompress_bounded
+            return decompress_bounded(ct, data, max_size)
+        return get_decompressor(ct)(data)
+    except DecompressionLimitError:
+        raise
     except Exception as e:
         raise CompressionError(f"Decompression failed: {e}") from e
 
@@ -4,142 +4,790 @@ Handles extraction of images and data from K2SHBWI format
 """
 
 import json
+import mmap
+import os
 import zlib
 import struct
-from typing import Dict, Any, Tuple, Optional
-from PIL import Image
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Any, NamedTuple, Tuple, Optional, List, Union
 import io
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 from .format_spec import (
     K2SHBWIHeader,
     K2SHBWIMetadata,
     CompressionType,
-    FeatureFlags
+    FeatureFlags,
+    HEADER_SIZE,
+    PYRAMID_MARKER_INDEXED,
+    PYRAMID_MARKER_LINEAR,
+    PYRAMID_DIRECTORY_ENTRY,
+    PYRAMID_LEVEL_TILED,
+    PYRAMID_TILE_HEADER,
+    PYRAMID_TILE_ENTRY,
+    DATA_LAYERS_INDEXED_MAGIC,
+    DATA_LAYER_INDEX_HEADER,
+    DATA_LAYER_ID_LENGTH,
+    DATA_LAYER_ENTRY,
 )
 from .format_spec import FormatError
+from .codecs import decompress_bounded, iter_decompress
+from .hotspot_codec import (
+    HotspotArrays,
+    decode_hotspot_arrays,
+    encode_hotspots,
+    is_binary_hotspots,
+)
+
+# Sentinel marking a section that has not been read from disk yet
+_UNLOADED = object()
+
+# Raw section bytes: ``bytes`` for file reads, ``memoryview`` in mmap mode
+Buffer = Union[bytes, memoryview]
+
+# Size of a legacy pyramid level record header:
+# level_id, width, height, format, quality, comp_type, comp_len
+_LEVEL_RECORD = struct.Struct('<BIIBBBI')
+
+# Largest possible marker + level count + directory (255 levels)
+_MAX_DIRECTORY_READ = 2 + 255 * PYRAMID_DIRECTORY_ENTRY.size
+
+
+class LevelLocation(NamedTuple):
+    """Where a pyramid level payload is stored (offset is absolute)."""
+    comp_type: int
+    offset: int
+    length: int
+    flags: int
+
+
+def parse_pyramid_directory(head: Buffer, base: int,
+                            size: int) -> Tuple[List[Dict[str, Any]], List[LevelLocation]]:
+    """Level entries and locations from the directory of an indexed pyramid container.
+
+    ``head`` starts at the container marker and must hold the whole
+    directory; ``base`` is the container's offset and ``size`` its length.
+    """
+    num_levels = head[1]
+    entry_size = PYRAMID_DIRECTORY_ENTRY.size
+    if len(head) < 2 + num_levels * entry_size:
+        raise FormatError("Failed to parse image pyramid: truncated level directory")
+    entries = []
+    locations = []
+    for i in range(num_levels):
+        level_id, w, h, fmt, quality, comp_type_val, flags, level_off, level_len = \
+            PYRAMID_DIRECTORY_ENTRY.unpack_from(head, 2 + i * entry_size)
+        if level_off + level_len > size:
+            raise FormatError(f"Failed to parse image pyramid: level {level_id} exceeds container")
+        entries.append({'level_id': level_id, 'width': w, 'height': h, 'format': fmt, 'quality': quality,
+                        'tiled': bool(flags & PYRAMID_LEVEL_TILED)})
+        locations.append(LevelLocation(comp_type_val, base + level_off, level_len, flags))
+    return entries, locations
+
+
+def walk_linear_pyramid(read: Callable[[int, int], Buffer], num_levels: int,
+                        base: int) -> Tuple[List[Dict[str, Any]], List[LevelLocation]]:
+    """Level entries and locations of a legacy linear pyramid container.
+
+    Walks the (header, payload) records with one small ``read(offset, size)``
+    per level; payloads are skipped.
+    """
+    off = 2
+    entries = []
+    locations = []
+    for _ in range(num_levels):
+        rec = read(base + off, _LEVEL_RECORD.size)
+        if len(rec) < _LEVEL_RECORD.size:
+            raise FormatError("Failed to parse image pyramid: truncated level record")
+        level_id, w, h, fmt, quality, comp_type_val, comp_len = _LEVEL_RECORD.unpack(rec)
+        off += _LEVEL_RECORD.size
+        entries.append({'level_id': level_id, 'width': w, 'height': h, 'format': fmt, 'quality': quality,
+                        'tiled': False})
+        locations.append(LevelLocation(comp_type_val, base + off, comp_len, 0))
+        off += comp_len
+    return entries, locations
+
+
+class _LazyPyramid:
+    """List-like view over pyramid levels that decodes each level on first access.
+
+    Level entries are plain dicts (same shape as the eager decoder produces);
+    the ``data`` key is filled in when the level is first indexed.
+    """
+
+    def __init__(self, decoder: 'K2SHBWIDecoder', entries: List[Dict[str, Any]],
+                 locations: List[LevelLocation]):
+        self._decoder = decoder
+        self._entries = entries
+        self._locations = locations
+        # Decoded payloads by location: deduplicated levels share one payload
+        self._loaded = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self._entries)))]
+        entry = self._entries[idx]
+        if 'data' not in entry:
+            location = self._locations[idx]
+            if location not in self._loaded:
+                self._loaded[location] = self._decoder._load_level_data(entry, location)
+            entry['data'] = self._loaded[location]
+        return entry
+
+    def __iter__(self):
+        for i in range(len(self._entries)):
+            yield self[i]
+
+    def __eq__(self, other):
+        return list(self) == other
+
 
 class K2SHBWIDecoder:
-    """Decodes K2SHBWI format back into images and data"""
-    
-    def __init__(self):
+    """Decodes K2SHBWI format back into images and data
+
+    By default ``decode()`` reads every section. With ``lazy=True`` only the
+    56-byte header is parsed up front and each section (``metadata``,
+    ``hotspots``, ``data_layers``, ``image_pyramid[i]``) is read and
+    decompressed the first time it is accessed.
+
+    With ``use_mmap=True`` the file is memory-mapped and section payloads are
+    ``memoryview`` slices of the mapping instead of ``f.read()`` copies.
+    Payloads stored with ``CompressionType.NONE`` (and raw payloads returned
+    by ``get_section_payload``) are never copied. Call ``close()`` (or use
+    the decoder as a context manager) to release the mapping.
+
+    Sections compressed with ``CompressionType.ZSTD_DICT`` need the trained
+    dictionary named by the header's ``dictionary_id``; it is resolved from
+    ``dictionary_store`` (a ``core.dictionaries.DictionaryStore``).
+
+    ``max_section_size`` bounds the decompressed size of every section,
+    data layer record, pyramid level and tile. Payloads are then inflated
+    incrementally and a ``DecompressionLimitError`` is raised as soon as
+    one grows past the limit, so untrusted files cannot exhaust memory.
+    ``read_level_image`` streams a level straight into PIL without holding
+    the decompressed image bytes.
+
+    A lazy decoder may be shared between threads (``AsyncK2SHBWIReader``
+    does): first loads of sections and indexes are serialized by a lock.
+    """
+
+    def __init__(self, lazy: bool = False, use_mmap: bool = False,
+                 dictionary_store: Any = None, max_section_size: Optional[int] = None):
+        self.lazy = lazy
+        self.use_mmap = use_mmap
+        self.dictionary_store = dictionary_store
+        self.max_section_size = max_section_size
         self.header = None
-        self.metadata = None
-        self.image_data = None
-        self.image_pyramid = []
-        self.hotspots = []
-        self.data_layers = {}
-        
-    def decode(self, file_path: str):
-        """Decode a K2SHBWI file"""
+        self._path = None
+        self._base_offset = 0
+        self._fh = None
+        self._mmap = None
+        self._view = None
+        # Guards first loads of sections, the data-layer index, the pyramid
+        # directory and tile grids; reentrant because loaders nest
+        self._lock = threading.RLock()
+        self._reset()
+
+    def __enter__(self) -> 'K2SHBWIDecoder':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Release the memory mapping held in mmap mode.
+
+        The mapping stays alive (and is reclaimed by the garbage collector)
+        while callers still hold ``memoryview`` slices of it.
+        """
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Exported slices are still referenced by the caller
+                pass
+            self._mmap = None
+
+    def _reset(self):
+        """Clear all decoded sections."""
+        self._metadata = None
+        self._image_data = None
+        self._image_pyramid = []
+        self._hotspots = []
+        self._hotspot_arrays = None
+        self._data_layers = {}
+        self._data_layer_index = None
+        self._layer_cache = {}
+        self._tile_grids = {}
+        self._level_locations = []
+
+    def _mark_unloaded(self):
+        """Mark the sections present in ``self.header`` as not yet read."""
+        if self.header.flags & FeatureFlags.HAS_METADATA.value:
+            self._metadata = _UNLOADED
+        if self.header.flags & FeatureFlags.HAS_IMAGE_PYRAMID.value:
+            self._image_data = _UNLOADED
+            self._image_pyramid = _UNLOADED
+        if self.header.flags & FeatureFlags.HAS_HOTSPOTS.value:
+            self._hotspots = _UNLOADED
+        if self.header.flags & FeatureFlags.HAS_DATA_LAYERS.value:
+            self._data_layers = _UNLOADED
+
+    # ------------------------------------------------------------------
+    # Section properties (loaded on first access in lazy mode)
+    # ------------------------------------------------------------------
+    @property
+    def metadata(self):
+        if self._metadata is _UNLOADED:
+            with self._lock:
+                if self._metadata is _UNLOADED:
+                    self._metadata = self._load_metadata()
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value):
+        self._metadata = value
+
+    @property
+    def image_pyramid(self):
+        if self._image_pyramid is _UNLOADED:
+            with self._lock:
+                if self._image_pyramid is _UNLOADED:
+                    self._load_image_section()
+        return self._image_pyramid
+
+    @image_pyramid.setter
+    def image_pyramid(self, value):
+        self._image_pyramid = value
+        self._level_locations = []
+
+    @property
+    def image_data(self):
+        if self._image_data is _UNLOADED:
+            self.image_pyramid
+        if self._image_data is _UNLOADED:
+            # Pyramid container: the base image is the highest resolution level
+            pyramid = self._image_pyramid
+            self._image_data = pyramid[0]['data'] if pyramid else None
+        return self._image_data
+
+    @image_data.setter
+    def image_data(self, value):
+        self._image_data = value
+
+    @property
+    def hotspots(self):
+        if self._hotspots is _UNLOADED:
+            with self._lock:
+                if self._hotspots is _UNLOADED:
+                    self._hotspots = self._load_hotspots()
+        return self._hotspots
+
+    @hotspots.setter
+    def hotspots(self, value):
+        self._hotspots = value
+
+    @property
+    def data_layers(self):
+        if self._data_layers is _UNLOADED:
+            with self._lock:
+                if self._data_layers is _UNLOADED:
+                    self._data_layers = self._load_data_layers()
+        return self._data_layers
+
+    @data_layers.setter
+    def data_layers(self, value):
+        self._data_layers = value
+
+    # ------------------------------------------------------------------
+    # Decoding
+    # ------------------------------------------------------------------
+    def decode(self, file_path: str, base_offset: int = 0):
+        """Decode a K2SHBWI file
+
+        In lazy mode only the header is read here; sections are decoded on
+        first access. ``base_offset`` is the position of the K2SHBWI data
+        within ``file_path`` (non-zero for entries of a bundle, see
+        ``core.bundle``); section offsets are relative to it.
+        """
+        self.close()
+        self._reset()
+        self._path = file_path
+        self._base_offset = base_offset
         with open(file_path, 'rb') as f:
-            # Read and validate header
-            header_data = f.read(56)
-            self.header = K2SHBWIHeader.unpack(header_data)
-            
-            # Read metadata if present
-            if self.header.flags & FeatureFlags.HAS_METADATA.value:
-                # Read packed metadata (length + comp_type + payload) and use helper to unpack
-                f.seek(self.header.metadata_offset)
-                # Read length (4) + comp type (1)
-                header5 = f.read(5)
-                if len(header5) < 5:
-                    raise FormatError("Truncated metadata header")
-                length, = struct.unpack('<I', header5[:4])
-                # read remaining payload
-                payload = f.read(length)
-                meta_blob = header5 + payload
-                # Use K2SHBWIMetadata.unpack to handle different compression types
-                meta_obj = K2SHBWIMetadata.unpack(meta_blob)
-                self.metadata = meta_obj.data
-            
-            # Read image data if present
-            if self.header.flags & FeatureFlags.HAS_IMAGE_PYRAMID.value:
-                f.seek(self.header.image_pyramid_offset)
-                size = struct.unpack('<I', f.read(4))[0]
-                payload = f.read(size)
-
-                # Detect pyramid container marker (0x7F). If present, parse levels;
-                # otherwise treat payload as a single-image blob (PNG/JPEG bytes).
-                if payload and payload[0] == 0x7F:
-                    # parse pyramid container
-                    try:
-                        from struct import unpack
-                        off = 1
-                        num_levels = payload[off]
-                        off += 1
-                        levels = []
-                        for _ in range(num_levels):
-                            level_id = payload[off]
-                            off += 1
-                            w = unpack('<I', payload[off:off+4])[0]; off += 4
-                            h = unpack('<I', payload[off:off+4])[0]; off += 4
-                            fmt = payload[off]; off += 1
-                            quality = payload[off]; off += 1
-                            comp_type_val = unpack('<B', payload[off:off+1])[0]; off += 1
-                            comp_len = unpack('<I', payload[off:off+4])[0]; off += 4
-                            comp_payload = payload[off:off+comp_len]; off += comp_len
-                            try:
-                                comp_type = CompressionType(comp_type_val)
-                                decompressor = CompressionType.get_decompressor(comp_type)
-                                img_bytes = decompressor(comp_payload)
-                            except Exception as e:
-                                raise FormatError(f"Failed to decompress pyramid level: {e}")
-                            levels.append({'level_id': level_id, 'width': w, 'height': h, 'format': fmt, 'quality': quality, 'data': img_bytes})
-                        # store pyramid
-                        self.image_pyramid = levels
-                        # set image_data to highest resolution available
-                        if levels:
-                            self.image_data = levels[0]['data']
-                        else:
-                            self.image_data = None
-                    except Exception as e:
-                        raise FormatError(f"Failed to parse image pyramid: {e}")
-                else:
-                    # legacy single image blob
-                    self.image_data = payload
-            
-            # Read hotspots if present
-            if self.header.flags & FeatureFlags.HAS_HOTSPOTS.value:
-                f.seek(self.header.hotspot_map_offset)
-                # Read length and compression type
-                length, comp_val = struct.unpack('<IB', f.read(5))
-                compressed = f.read(length)
-                try:
-                    comp_type = CompressionType(comp_val)
-                    decompressor = CompressionType.get_decompressor(comp_type)
-                    raw = decompressor(compressed)
-                except Exception as e:
-                    raise FormatError(f"Failed to decompress hotspots: {e}")
-                self.hotspots = json.loads(raw)
-            
-            # Read data layers if present
-            if self.header.flags & FeatureFlags.HAS_DATA_LAYERS.value:
-                f.seek(self.header.data_layers_offset)
-                # Read length and compression type
-                length, comp_val = struct.unpack('<IB', f.read(5))
-                compressed = f.read(length)
-                try:
-                    comp_type = CompressionType(comp_val)
-                    decompressor = CompressionType.get_decompressor(comp_type)
-                    raw = decompressor(compressed)
-                except Exception as e:
-                    raise FormatError(f"Failed to decompress data layers: {e}")
-                self.data_layers = json.loads(raw)
-    
-    def get_image(self) -> Optional[Image.Image]:
+            if self.use_mmap and os.fstat(f.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)[base_offset:]
+            else:
+                self._fh = f
+            try:
+                # Read and validate header
+                f.seek(base_offset)
+                header_data = f.read(HEADER_SIZE)
+                self.header = K2SHBWIHeader.unpack(header_data)
+                self._mark_unloaded()
+
+                if not self.lazy:
+                    self.metadata
+                    self.image_data
+                    self.hotspots
+                    self.data_layers
+            finally:
+                self._fh = None
+
+    def _read_at(self, offset: int, size: int) -> Buffer:
+        """Read ``size`` bytes at ``offset`` (relative to ``base_offset``).
+
+        In mmap mode this is a zero-copy slice of the mapping. Otherwise the
+        open handle is used during an eager ``decode()``; lazy accesses
+        re-open the file so no handle is held between section reads.
+        """
+        if self._view is not None:
+            return self._view[offset:offset + size]
+        if self._fh is not None:
+            self._fh.seek(self._base_offset + offset)
+            return self._fh.read(size)
+        if self._path is None:
+            raise FormatError("No file has been decoded")
+        with open(self._path, 'rb') as f:
+            f.seek(self._base_offset + offset)
+            return f.read(size)
+
+    def _read_section(self, offset: int, name: str) -> Tuple[CompressionType, Buffer]:
+        """Read a ``<I length><B comp_type>`` framed section and return its raw payload."""
+        head = self._read_at(offset, 5)
+        if len(head) < 5:
+            raise FormatError(f"Truncated {name} header")
+        length, comp_val = struct.unpack('<IB', head)
+        payload = self._read_at(offset + 5, length)
+        try:
+            comp_type = CompressionType(comp_val)
+        except Exception as e:
+            raise FormatError(f"Failed to decompress {name}: {e}")
+        return comp_type, payload
+
+    def resolve_dictionary(self) -> Any:
+        """The zstd dictionary named by the header, from ``dictionary_store``.
+
+        Raises ``FormatError`` when the header names no dictionary or no
+        store was given.
+        """
+        dict_id = self.header.dictionary_id
+        if not dict_id:
+            raise FormatError("Section uses a zstd dictionary but the header has no dictionary id")
+        if self.dictionary_store is None:
+            raise FormatError(f"File requires zstd dictionary {dict_id}; no dictionary_store given")
+        return self.dictionary_store.get(dict_id)
+
+    def _decompressor(self, comp_type: CompressionType):
+        dictionary = self.resolve_dictionary() if comp_type == CompressionType.ZSTD_DICT else None
+        if self.max_section_size is not None:
+            limit = self.max_section_size
+            return lambda data: decompress_bounded(comp_type, data, limit, dictionary)
+        return CompressionType.get_decompressor(comp_type, dictionary)
+
+    def _stream_image(self, comp_type: CompressionType, payload: Buffer) -> 'Image.Image':
+        """Decode a compressed image payload chunk by chunk with PIL's incremental parser."""
+        from PIL import ImageFile
+        parser = ImageFile.Parser()
+        for chunk in iter_decompress(comp_type, payload, self.max_section_size):
+            parser.feed(bytes(chunk))
+        return parser.close()
+
+    def _load_metadata(self) -> Dict[str, Any]:
+        # Read packed metadata (length + comp_type + payload) and use helper to unpack
+        offset = self.header.metadata_offset
+        header5 = self._read_at(offset, 5)
+        if len(header5) < 5:
+            raise FormatError("Truncated metadata header")
+        length, = struct.unpack('<I', header5[:4])
+        payload = self._read_at(offset + 5, length)
+        # Use K2SHBWIMetadata.unpack to handle different compression types
+        dictionary = self.resolve_dictionary() if header5[4] == CompressionType.ZSTD_DICT.value else None
+        meta_obj = K2SHBWIMetadata.unpack(bytes(header5) + bytes(payload), dictionary, self.max_section_size)
+        return meta_obj.data
+
+    def _read_hotspots_raw(self) -> bytes:
+        comp_type, compressed = self._read_section(self.header.hotspot_map_offset, 'hotspots')
+        try:
+            return self._decompressor(comp_type)(compressed)
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to decompress hotspots: {e}")
+
+    def _load_hotspot_arrays(self, raw: bytes) -> HotspotArrays:
+        try:
+            return decode_hotspot_arrays(raw)
+        except ValueError as e:
+            raise FormatError(f"Failed to decode binary hotspots: {e}")
+
+    def _load_hotspots(self) -> list:
+        raw = self._read_hotspots_raw()
+        if is_binary_hotspots(raw):
+            self._hotspot_arrays = self._load_hotspot_arrays(raw)
+            return self._hotspot_arrays.to_list()
+        return json.loads(bytes(raw))
+
+    def _load_data_layers(self) -> Dict[str, Any]:
+        index = self._read_data_layer_index()
+        if index:
+            return {layer_id: self._load_data_layer(layer_id) for layer_id in index}
+        comp_type, compressed = self._read_section(self.header.data_layers_offset, 'data layers')
+        try:
+            raw = self._decompressor(comp_type)(compressed)
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to decompress data layers: {e}")
+        return json.loads(bytes(raw))
+
+    def _read_data_layer_index(self) -> Dict[str, Tuple[CompressionType, int, int]]:
+        """Index of an indexed data-layer section (empty for a JSON blob).
+
+        Maps layer id to (comp_type, absolute offset, length). Only the
+        section frame and index are read; records are read on demand.
+        """
+        if self._data_layer_index is None:
+            with self._lock:
+                if self._data_layer_index is None:
+                    # Published only once complete: other threads must never
+                    # see a partial (or empty placeholder) index
+                    self._data_layer_index = self._parse_data_layer_index()
+        return self._data_layer_index
+
+    def _parse_data_layer_index(self) -> Dict[str, Tuple[CompressionType, int, int]]:
+        layer_index = {}
+        offset = self.header.data_layers_offset
+        head = self._read_at(offset, 5 + DATA_LAYER_INDEX_HEADER.size)
+        if len(head) < 5:
+            raise FormatError("Truncated data layers header")
+        length, comp_val = struct.unpack_from('<IB', head)
+        if (comp_val != CompressionType.NONE.value or len(head) < 5 + DATA_LAYER_INDEX_HEADER.size
+                or bytes(head[5:9]) != DATA_LAYERS_INDEXED_MAGIC):
+            return layer_index
+        _, count, index_size = DATA_LAYER_INDEX_HEADER.unpack_from(head, 5)
+        base = offset + 5
+        index = self._read_at(base + DATA_LAYER_INDEX_HEADER.size, index_size)
+        if len(index) < index_size:
+            raise FormatError("Truncated data layer index")
+        pos = 0
+        try:
+            for _ in range(count):
+                id_len, = DATA_LAYER_ID_LENGTH.unpack_from(index, pos)
+                pos += DATA_LAYER_ID_LENGTH.size
+                layer_id = bytes(index[pos:pos + id_len]).decode('utf-8')
+                pos += id_len
+                comp_val, rec_off, rec_len = DATA_LAYER_ENTRY.unpack_from(index, pos)
+                pos += DATA_LAYER_ENTRY.size
+                if rec_off + rec_len > length:
+                    raise FormatError(f"Data layer {layer_id!r} exceeds section")
+                layer_index[layer_id] = (CompressionType(comp_val), base + rec_off, rec_len)
+        except (struct.error, UnicodeDecodeError, ValueError) as e:
+            raise FormatError(f"Invalid data layer index: {e}")
+        return layer_index
+
+    def _load_data_layer(self, layer_id: str) -> Dict[str, Any]:
+        comp_type, offset, length = self._data_layer_index[layer_id]
+        try:
+            raw = self._decompressor(comp_type)(self._read_at(offset, length))
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to decompress data layer {layer_id!r}: {e}")
+        return json.loads(bytes(raw))
+
+    def _load_image_section(self):
+        """Parse the image section into ``_image_pyramid`` / ``_image_data``.
+
+        Only the level directory (or, for legacy linear containers, the level
+        record headers) is read here; level payloads are decompressed when
+        accessed (immediately in eager mode).
+        """
+        offset = self.header.image_pyramid_offset
+        size = struct.unpack('<I', self._read_at(offset, 4))[0]
+        base = offset + 4
+        # One small read covers the marker, level count and a full directory
+        head = self._read_at(base, min(size, _MAX_DIRECTORY_READ))
+
+        # Detect pyramid container marker (0x7E/0x7F). If present, parse levels;
+        # otherwise treat payload as a single-image blob (PNG/JPEG bytes).
+        if len(head) < 2 or head[0] not in (PYRAMID_MARKER_INDEXED, PYRAMID_MARKER_LINEAR):
+            # legacy single image blob
+            self._image_data = self._read_at(base, size)
+            self._image_pyramid = []
+            return
+
+        try:
+            if head[0] == PYRAMID_MARKER_INDEXED:
+                entries, locations = parse_pyramid_directory(head, base, size)
+            else:
+                entries, locations = walk_linear_pyramid(self._read_at, head[1], base)
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to parse image pyramid: {e}")
+
+        self._level_locations = locations
+        pyramid = _LazyPyramid(self, entries, locations)
+        if not self.lazy:
+            # store pyramid with every level decoded
+            pyramid = list(pyramid)
+        self._image_pyramid = pyramid
+
+    def read_level(self, idx: int) -> Dict[str, Any]:
+        """Return a single pyramid level, decoding only that level.
+
+        ``idx`` indexes the pyramid from the highest resolution (``0``) down;
+        negative indices count from the thumbnail end. On a lazy decoder this
+        costs one directory read plus one read of the level payload.
+        """
+        pyramid = self.image_pyramid
+        if not pyramid:
+            raise FormatError("File has no image pyramid")
+        return pyramid[idx]
+
+    def level_entries(self) -> List[Dict[str, Any]]:
+        """Pyramid level entries (``level_id``, ``width``, ``height``, ``format``,
+        ``quality``, ``tiled``) without their payloads.
+
+        Only the level directory is read: on a lazy decoder no level is
+        decompressed. Empty for files with a single image blob.
+        """
+        pyramid = self.image_pyramid
+        entries = pyramid._entries if isinstance(pyramid, _LazyPyramid) else pyramid or []
+        return [{k: v for k, v in entry.items() if k != 'data'} for entry in entries]
+
+    def level_locations(self) -> List[LevelLocation]:
+        """Where each pyramid level payload is stored, in level order.
+
+        Deduplicated levels share one location. Empty for files with a single
+        image blob and for pyramids assigned to ``image_pyramid`` directly.
+        """
+        self.image_pyramid
+        return list(self._level_locations)
+
+    def _load_level_data(self, entry: Dict[str, Any], location: LevelLocation) -> Buffer:
+        """Read and decompress the payload of one pyramid level.
+
+        Tiled levels are stitched back into one raster and returned as PNG
+        bytes; use ``read_region`` to avoid decoding the whole level.
+        """
+        comp_type_val, offset, length, flags = location
+        if flags & PYRAMID_LEVEL_TILED:
+            grid = self._read_tile_grid(offset, length)
+            img = self._assemble_tiles(grid, 0, 0, entry['width'], entry['height'])
+            buf = io.BytesIO()
+            img.save(buf, format='PNG')
+            return buf.getvalue()
+        comp_payload = self._read_at(offset, length)
+        try:
+            comp_type = CompressionType(comp_type_val)
+            return self._decompressor(comp_type)(comp_payload)
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to parse image pyramid: Failed to decompress pyramid level: {e}")
+
+    def _read_tile_grid(self, offset: int, length: int) -> Dict[str, Any]:
+        """Read the tile header and index of a tiled level (cached per level)."""
+        grid = self._tile_grids.get(offset)
+        if grid is None:
+            with self._lock:
+                grid = self._tile_grids.get(offset)
+                if grid is None:
+                    grid = self._tile_grids[offset] = self._parse_tile_grid(offset, length)
+        return grid
+
+    def _parse_tile_grid(self, offset: int, length: int) -> Dict[str, Any]:
+        head = self._read_at(offset, PYRAMID_TILE_HEADER.size)
+        if len(head) < PYRAMID_TILE_HEADER.size:
+            raise FormatError("Truncated tile grid header")
+        tile_w, tile_h, cols, rows = PYRAMID_TILE_HEADER.unpack(head)
+        index_size = PYRAMID_TILE_ENTRY.size * cols * rows
+        index = self._read_at(offset + PYRAMID_TILE_HEADER.size, index_size)
+        if len(index) < index_size:
+            raise FormatError("Truncated tile index")
+        tiles = []
+        for i in range(cols * rows):
+            comp_type_val, fmt, tile_off, tile_len = PYRAMID_TILE_ENTRY.unpack_from(index, i * PYRAMID_TILE_ENTRY.size)
+            if tile_off + tile_len > length:
+                raise FormatError("Tile exceeds level payload")
+            tiles.append((comp_type_val, offset + tile_off, tile_len))
+        return {'tile_width': tile_w, 'tile_height': tile_h, 'cols': cols, 'rows': rows, 'tiles': tiles}
+
+    def _decode_tile(self, grid: Dict[str, Any], row: int, col: int) -> 'Image.Image':
+        comp_type_val, tile_off, tile_len = grid['tiles'][row * grid['cols'] + col]
+        try:
+            return self._stream_image(CompressionType(comp_type_val), self._read_at(tile_off, tile_len))
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to decompress tile ({row}, {col}): {e}")
+
+    def _assemble_tiles(self, grid: Dict[str, Any], x: int, y: int, w: int, h: int) -> 'Image.Image':
+        """Decode the tiles covering ``(x, y, w, h)`` and paste them into one image."""
+        from PIL import Image
+        tile_w, tile_h = grid['tile_width'], grid['tile_height']
+        out = None
+        for row in range(y // tile_h, (y + h - 1) // tile_h + 1):
+            for col in range(x // tile_w, (x + w - 1) // tile_w + 1):
+                tile = self._decode_tile(grid, row, col)
+                if out is None:
+                    out = Image.new(tile.mode, (w, h))
+                elif tile.mode != out.mode:
+                    tile = tile.convert(out.mode)
+                out.paste(tile, (col * tile_w - x, row * tile_h - y))
+        return out
+
+    def read_level_image(self, idx: int) -> 'Image.Image':
+        """Decode pyramid level ``idx`` to a PIL image.
+
+        Unlike ``read_level(idx)['data']`` the decompressed image bytes are
+        never held in memory: the payload is decompressed in chunks and fed
+        to PIL's incremental parser (tiled levels are assembled tile by
+        tile). Levels already decoded by ``read_level`` are reused.
+        """
+        pyramid = self.image_pyramid
+        if not pyramid:
+            raise FormatError("File has no image pyramid")
+        if not isinstance(pyramid, _LazyPyramid) or 'data' in pyramid._entries[idx]:
+            from PIL import Image
+            return Image.open(io.BytesIO(pyramid[idx]['data']))
+        entry = pyramid._entries[idx]
+        comp_type_val, offset, length, flags = pyramid._locations[idx]
+        if flags & PYRAMID_LEVEL_TILED:
+            grid = self._read_tile_grid(offset, length)
+            return self._assemble_tiles(grid, 0, 0, entry['width'], entry['height'])
+        try:
+            return self._stream_image(CompressionType(comp_type_val), self._read_at(offset, length))
+        except FormatError:
+            raise
+        except Exception as e:
+            raise FormatError(f"Failed to decode pyramid level {idx}: {e}")
+
+    def read_region(self, level: int, x: int, y: int, w: int, h: int) -> 'Image.Image':
+        """Decode the ``(x, y, w, h)`` region of a pyramid level.
+
+        Coordinates are in the pixel space of that level and are clipped to
+        its bounds. For tiled levels only the tiles intersecting the region
+        are read and decoded; untiled levels are decoded whole and cropped.
+        """
+        pyramid = self.image_pyramid
+        if not pyramid:
+            raise FormatError("File has no image pyramid")
+        if isinstance(pyramid, _LazyPyramid):
+            entry = pyramid._entries[level]
+            location = pyramid._locations[level]
+        else:
+            entry = pyramid[level]
+            location = None
+
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(entry['width'], x + w), min(entry['height'], y + h)
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"Region ({x}, {y}, {w}, {h}) lies outside level {level}")
+
+        if entry.get('tiled') and location is not None:
+            comp_type_val, offset, length, flags = location
+            grid = self._read_tile_grid(offset, length)
+            return self._assemble_tiles(grid, x0, y0, x1 - x0, y1 - y0)
+
+        from PIL import Image
+        img = Image.open(io.BytesIO(self.read_level(level)['data']))
+        return img.crop((x0, y0, x1, y1))
+
+    def get_section_payload(self, name: str) -> Tuple[CompressionType, Buffer]:
+        """Return ``(compression_type, stored_bytes)`` for a section without decompressing.
+
+        ``name`` is one of ``'metadata'``, ``'hotspots'``, ``'data_layers'`` or
+        ``'image'``. The image section is returned as stored (the pyramid
+        container or single image blob) with ``CompressionType.NONE``. In mmap
+        mode the payload is a zero-copy ``memoryview`` suitable for handing
+        straight to a socket or HTTP response.
+        """
+        if self.header is None:
+            raise FormatError("No file has been decoded")
+        sections = {
+            'metadata': (FeatureFlags.HAS_METADATA, self.header.metadata_offset),
+            'image': (FeatureFlags.HAS_IMAGE_PYRAMID, self.header.image_pyramid_offset),
+            'hotspots': (FeatureFlags.HAS_HOTSPOTS, self.header.hotspot_map_offset),
+            'data_layers': (FeatureFlags.HAS_DATA_LAYERS, self.header.data_layers_offset),
+        }
+        if name not in sections:
+            raise ValueError(f"Unknown section: {name}")
+        flag, offset = sections[name]
+        if not self.header.has_feature(flag):
+            raise FormatError(f"File has no {name} section")
+        if name == 'image':
+            size = struct.unpack('<I', self._read_at(offset, 4))[0]
+            return CompressionType.NONE, self._read_at(offset + 4, size)
+        return self._read_section(offset, name)
+
+    def get_image(self) -> Optional['Image.Image']:
         """Extract the base image"""
         if self.image_data:
+            from PIL import Image
             return Image.open(io.BytesIO(self.image_data))
         return None
-    
+
     def get_metadata(self) -> Dict[str, Any]:
         """Get the metadata"""
         return self.metadata or {}
-    
+
     def get_hotspots(self) -> list:
         """Get the hotspot data"""
         return self.hotspots
-    
+
+    def get_hotspot_arrays(self) -> Optional[HotspotArrays]:
+        """Get the hotspots as columnar arrays (None if the file has none).
+
+        For binary hotspot sections (``encoder.hotspots_format = 'binary'``)
+        this avoids building a dict per hotspot; pass the result to
+        ``HotspotMapper.from_arrays``. JSON sections are converted.
+        """
+        if self._hotspot_arrays is None:
+            if self._hotspots is _UNLOADED:
+                raw = self._read_hotspots_raw()
+                if is_binary_hotspots(raw):
+                    self._hotspot_arrays = self._load_hotspot_arrays(raw)
+                    return self._hotspot_arrays
+                self._hotspots = json.loads(bytes(raw))
+            if not self._hotspots:
+                return None
+            try:
+                self._hotspot_arrays = decode_hotspot_arrays(encode_hotspots(self._hotspots))
+            except ValueError as e:
+                raise FormatError(f"Hotspots cannot be represented as arrays: {e}")
+        return self._hotspot_arrays
+
     def get_data_layer(self, layer_id: str) -> Dict[str, Any]:
-        """Get a specific data layer"""
-        return self.data_layers.get(layer_id, {})
\ No newline at end of file
+        """Get a specific data layer
+
+        In lazy mode, files with an indexed data-layer section only read and
+        decompress the requested layer.
+        """
+        if self._data_layers is _UNLOADED and self._read_data_layer_index():
+            if layer_id not in self._data_layer_index:
+                return {}
+            if layer_id not in self._layer_cache:
+                self._layer_cache[layer_id] = self._load_data_layer(layer_id)
+            return self._layer_cache[layer_id]
+        return self.data_layers.get(layer_id, {})
+
+    def get_data_layer_ids(self) -> List[str]:
+        """Ids of the data layers (from the index when the section has one)."""
+        if self._data_layers is _UNLOADED and self._read_data_layer_index():
+            return list(self._data_layer_index)
+        return list(self.data_layers)
@@ -0,0 +1,142 @@
+"""
+Trained zstd dictionaries for K2SHBWI
+
+Metadata and hotspot sections are small JSON documents that share most of
+their keys, so on their own they compress poorly. A zstd dictionary trained
+on a corpus of such sections is shared between files. The encoder compresses
+sections with ``CompressionType.ZSTD_DICT`` and writes the dictionary id in
+the header. The decoder resolves that id from a local ``DictionaryStore``.
+
+Usage:
+    samples = samples_from_files(Path('corpus').glob('*.k2sh'))
+    store = DictionaryStore()
+    dict_id = store.add(train_dictionary(samples))
+
+    encoder.dictionary = store.get(dict_id)
+    decoder = K2SHBWIDecoder(dictionary_store=store)
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from .format_spec import CompressionError, FormatError
+
+# Default location of the local dictionary store
+DEFAULT_STORE_PATH = Path.home() / '.k2shbwi' / 'dictionaries'
+# Default trained dictionary size in bytes
+DEFAULT_DICT_SIZE = 16 * 1024
+
+
+def _zstd():
+    try:
+        import zstandard as zstd
+        return zstd
+    except ImportError:
+        raise CompressionError(
+            "zstandard library is not installed. Install with: pip install zstandard"
+        )
+
+
+def train_dictionary(samples: Sequence[bytes], dict_size: int = DEFAULT_DICT_SIZE,
+                     level: Optional[int] = None) -> Any:
+    """Train a zstd dictionary from section payload samples.
+
+    Returns a ``zstandard.ZstdCompressionDict``. Training needs a reasonable
+    number of samples (a few dozen or more); CompressionError is raised if
+    zstd cannot build a dictionary from them.
+    """
+    zstd = _zstd()
+    kwargs = {} if level is None else {'level': level}
+    try:
+        return zstd.train_dictionary(dict_size, list(samples), **kwargs)
+    except zstd.ZstdError as e:
+        raise CompressionError(f"Failed to train dictionary: {e}")
+
+
+def section_samples(metadata: Optional[Dict[str, Any]] = None,
+                    hotspots: Optional[List[Any]] = None,
+                    hotspots_format: str = 'json') -> List[bytes]:
+    """Serialize sections exactly as the encoder does, for use as samples.
+
+    ``hotspots_format`` must match the encoder the dictionary is trained for:
+    a dictionary trained on JSON hotspots does little for ``'binary'`` (HSB1)
+    sections and vice versa.
+    """
+    from .encoder import K2SHBWIEncoder
+
+    encoder = K2SHBWIEncoder()
+    encoder.hotspots_format = hotspots_format
+    samples = []
+    if metadata:
+        encoder.metadata.data = metadata
+        samples.append(encoder._serialize_metadata())
+    if hotspots:
+        encoder.hotspots = hotspots
+        samples.append(encoder._serialize_hotspots())
+    return samples
+
+
+def samples_from_files(paths: Iterable[Union[str, Path]],
+                       hotspots_format: str = 'json') -> List[bytes]:
+    """Collect metadata and hotspot samples from existing .k2sh files.
+
+    Hotspots are re-serialized in ``hotspots_format`` (see ``section_samples``)
+    whatever format the source file used. Files that cannot be decoded (or whose sections need a dictionary that
+    is not available) are skipped.
+    """
+    from .decoder import K2SHBWIDecoder
+
+    samples = []
+    for path in paths:
+        try:
+            with K2SHBWIDecoder(lazy=True) as dec:
+                dec.decode(str(path))
+                samples.extend(section_samples(dec.get_metadata(), dec.get_hotspots(),
+                                               hotspots_format))
+        except Exception:
+            continue
+    return samples
+
+
+class DictionaryStore:
+    """Directory of trained dictionaries, one ``<dict_id>.zdict`` file each."""
+
+    def __init__(self, root: Union[str, Path, None] = None):
+        self.root = Path(root) if root is not None else DEFAULT_STORE_PATH
+        self._cache: Dict[int, Any] = {}
+
+    def _path(self, dict_id: int) -> Path:
+        return self.root / f'{dict_id}.zdict'
+
+    def add(self, dictionary: Any) -> int:
+        """Save a dictionary and return its id."""
+        dict_id = dictionary.dict_id()
+        if dict_id == 0:
+            raise ValueError("Raw-content dictionaries have no id; train one with train_dictionary")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._path(dict_id).write_bytes(dictionary.as_bytes())
+        self._cache[dict_id] = dictionary
+        return dict_id
+
+    def get(self, dict_id: int) -> Any:
+        """Load a dictionary by id (cached). Raises FormatError if missing."""
+        dictionary = self._cache.get(dict_id)
+        if dictionary is not None:
+            return dictionary
+        path = self._path(dict_id)
+        if not path.exists():
+            raise FormatError(f"Dictionary {dict_id} not found in {self.root}")
+        dictionary = _zstd().ZstdCompressionDict(path.read_bytes())
+        self._cache[dict_id] = dictionary
+        return dictionary
+
+    def __contains__(self, dict_id: int) -> bool:
+        return dict_id in self._cache or self._path(dict_id).exists()
+
+    def ids(self) -> List[int]:
+        """Ids of all stored dictionaries."""
+        if not self.root.exists():
+            return []
+        return sorted(int(p.stem) for p in self.root.glob('*.zdict') if p.stem.isdigit())
+
+
+__all__ = ['DictionaryStore', 'train_dictionary', 'samples_from_files', 'section_samples']
@@ -0,0 +1,346 @@
+"""
+In-place editing of K2SHBWI files
+
+``K2SHBWIEditor`` changes metadata, hotspots and data layers of an existing
+.k2sh file without re-encoding the image. Sections are serialized by a
+``K2SHBWIEncoder`` whose settings (compression types, hotspot format,
+indexed layers, dictionary) are inferred from the file, so edits keep the
+file's layout. The image section bytes are never touched.
+
+``save()`` only writes what changed, and never overwrites bytes the
+current header points at:
+  1. The changed sections are appended after the end of the file, then
+     flushed to disk (fsync).
+  2. The 56-byte header is rewritten with a single write and flushed
+     again. This is the commit point.
+  3. Bytes past the last live section are truncated.
+A crash before step 2 leaves the old header pointing at the old, intact
+sections (plus some unreferenced bytes at the end). A crash after it
+leaves the new file. Either way the file decodes.
+
+Old copies of rewritten sections stay in the file as dead space. When
+dead space would exceed ``compact_threshold`` (a fraction of the file),
+or with ``save(compact=True)``, the file is instead rewritten to a
+temporary file (image bytes copied as-is) that atomically replaces the
+original (``os.replace``). Compaction lays the sections out in the order
+of the file's encoder layout, so progressive files keep their hotspots
+ahead of the image.
+
+Usage:
+    with K2SHBWIEditor('map.k2sh') as editor:
+        editor.update_hotspot(3, data={'title': 'New title'})
+        editor.save()
+"""
+import copy
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .decoder import K2SHBWIDecoder
+from .encoder import SECTION_ORDERS, K2SHBWIEncoder
+from .fileio import copy_bytes
+from .format_spec import CompressionType, FeatureFlags, FormatError, HEADER_SIZE
+from .hotspot_codec import is_binary_hotspots
+
+# Section name -> (feature flag, header offset attribute, length prefix size)
+_SECTIONS = {
+    'metadata': (FeatureFlags.HAS_METADATA, 'metadata_offset', 5),
+    'image': (FeatureFlags.HAS_IMAGE_PYRAMID, 'image_pyramid_offset', 4),
+    'hotspots': (FeatureFlags.HAS_HOTSPOTS, 'hotspot_map_offset', 5),
+    'data_layers': (FeatureFlags.HAS_DATA_LAYERS, 'data_layers_offset', 5),
+}
+# Order in which rewritten sections are laid out
+_TRAILING_ORDER = ('hotspots', 'data_layers', 'metadata')
+# Default fraction of dead bytes above which save() compacts the file
+DEFAULT_COMPACT_THRESHOLD = 0.25
+
+
+class K2SHBWIEditor:
+    """Edit the metadata, hotspots and data layers of an existing .k2sh file."""
+
+    def __init__(self, path: Union[str, Path], dictionary_store: Any = None):
+        self.path = Path(path)
+        self.dictionary_store = dictionary_store
+        self.compact_threshold = DEFAULT_COMPACT_THRESHOLD
+        self.stats: Dict[str, Any] = {}
+        self._open()
+
+    def __enter__(self) -> 'K2SHBWIEditor':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.decoder.close()
+
+    def _open(self) -> None:
+        self.decoder = K2SHBWIDecoder(lazy=True, dictionary_store=self.dictionary_store)
+        self.decoder.decode(str(self.path))
+        self.header = self.decoder.header
+        self._edits: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # Section access and edits
+    # ------------------------------------------------------------------
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if 'metadata' not in self._edits:
+            self._edits['metadata'] = copy.deepcopy(self.decoder.get_metadata())
+        return self._edits['metadata']
+
+    @property
+    def hotspots(self) -> List[Dict[str, Any]]:
+        if 'hotspots' not in self._edits:
+            self._edits['hotspots'] = copy.deepcopy(self.decoder.get_hotspots())
+        return self._edits['hotspots']
+
+    @property
+    def data_layers(self) -> Dict[str, Any]:
+        if 'data_layers' not in self._edits:
+            self._edits['data_layers'] = copy.deepcopy(self.decoder.data_layers)
+        return self._edits['data_layers']
+
+    def set_metadata(self, metadata: Dict[str, Any]) -> None:
+        self._edits['metadata'] = dict(metadata)
+
+    def update_metadata(self, **fields) -> None:
+        self.metadata.update(fields)
+
+    def set_hotspots(self, hotspots: List[Dict[str, Any]]) -> None:
+        self._edits['hotspots'] = list(hotspots)
+
+    def add_hotspot(self, coords: tuple, data: Dict[str, Any]) -> None:
+        self.hotspots.append({'coords': coords, 'data': data})
+
+    def update_hotspot(self, index: int, data: Optional[Dict[str, Any]] = None, **fields) -> None:
+        """Merge ``data`` into hotspot ``index``'s data and set top-level ``fields``."""
+        hotspot = self.hotspots[index]
+        if data:
+            hotspot.setdefault('data', {}).update(data)
+        hotspot.update(fields)
+
+    def remove_hotspot(self, index: int) -> None:
+        del self.hotspots[index]
+
+    def set_data_layer(self, layer_id: str, data: Dict[str, Any]) -> None:
+        self.data_layers[layer_id] = data
+
+    def remove_data_layer(self, layer_id: str) -> None:
+        self.data_layers.pop(layer_id, None)
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+    def _frame_at(self, name: str) -> Optional[Tuple[int, int]]:
+        """(offset, size) of a present section, including its length prefix."""
+        flag, attr, prefix = _SECTIONS[name]
+        if not self.header.flags & flag.value:
+            return None
+        offset = getattr(self.header, attr)
+        head = self.decoder._read_at(offset, 4)
+        if len(head) < 4:
+            raise FormatError(f"Truncated {name} section")
+        return offset, prefix + struct.unpack('<I', head)[0]
+
+    def _section_comp_type(self, name: str) -> Optional[CompressionType]:
+        frame = self._frame_at(name)
+        if frame is None:
+            return None
+        return CompressionType(self.decoder._read_at(frame[0] + 4, 1)[0])
+
+    def _serializer(self) -> K2SHBWIEncoder:
+        """Encoder configured to reproduce the file's section layout."""
+        enc = K2SHBWIEncoder()
+        comp_types = {name: self._section_comp_type(name) for name in ('metadata', 'hotspots', 'data_layers')}
+        if 'hotspots' in self._edits and comp_types['hotspots'] is not None:
+            if is_binary_hotspots(self.decoder._read_hotspots_raw()):
+                enc.hotspots_format = 'binary'
+        if comp_types['data_layers'] is not None:
+            index = self.decoder._read_data_layer_index()
+            if index:
+                enc.data_layers_indexed = True
+                comp_types['data_layers'] = next(iter(index.values()))[0]
+
+        # Dictionary sections are re-encoded with the file's dictionary;
+        # ZSTD_DICT itself is selected through encoder.dictionary_sections
+        dict_sections = tuple(name for name, ct in comp_types.items() if ct == CompressionType.ZSTD_DICT)
+        if dict_sections:
+            enc.dictionary = self.decoder.resolve_dictionary()
+            enc.dictionary_sections = dict_sections
+        for name, ct in comp_types.items():
+            if ct is None:
+                continue
+            if ct == CompressionType.ZSTD_DICT:
+                ct = CompressionType.ZSTD
+            if name == 'metadata':
+                enc.metadata.compression_type = ct
+            else:
+                setattr(enc, f'{name}_compression', ct)
+        return enc
+
+    def _new_frames(self) -> Dict[str, Optional[bytes]]:
+        """Serialized frames of the edited sections (None = section removed)."""
+        enc = self._serializer()
+        frames: Dict[str, Optional[bytes]] = {}
+        if 'metadata' in self._edits:
+            enc.metadata.data = self._edits['metadata']
+            frames['metadata'] = enc._metadata_section() if self._edits['metadata'] else None
+        if 'hotspots' in self._edits:
+            enc.hotspots = self._edits['hotspots']
+            frames['hotspots'] = enc._hotspots_section() if enc.hotspots else None
+        if 'data_layers' in self._edits:
+            enc.data_layers = self._edits['data_layers']
+            frames['data_layers'] = enc._data_layers_section() if enc.data_layers else None
+        return frames
+
+    def _set_section(self, name: str, offset: Optional[int]) -> None:
+        flag, attr, _ = _SECTIONS[name]
+        if offset is None:
+            self.header.flags &= ~flag.value
+            setattr(self.header, attr, 0)
+        else:
+            self.header.set_feature_flag(flag)
+            setattr(self.header, attr, offset)
+
+    # ------------------------------------------------------------------
+    # Saving
+    # ------------------------------------------------------------------
+    def save(self, compact: bool = False) -> Dict[str, Any]:
+        """Write the edits to the file and return what was rewritten.
+
+        The returned dict (also kept in ``self.stats``) has the save
+        ``mode`` ('append' or 'compact'), the sections ``rewritten`` at new
+        offsets and ``removed``, and the number of ``bytes_written``. The
+        file is valid at every point of the save (see the module docstring).
+        """
+        frames = self._new_frames()
+        if compact or self._dead_fraction(frames) > self.compact_threshold:
+            self.stats = self._save_compact(frames)
+        else:
+            self.stats = self._save_append(frames)
+        self.decoder.close()
+        self._open()
+        return self.stats
+
+    def _dead_fraction(self, frames: Dict[str, Optional[bytes]]) -> float:
+        """Fraction of the file that would be unreferenced after an append save."""
+        layout = {name: self._frame_at(name) for name in _SECTIONS}
+        size = os.path.getsize(self.path) + sum(len(f) for f in frames.values() if f is not None)
+        live = HEADER_SIZE
+        for name, old in layout.items():
+            if name in frames:
+                live += len(frames[name]) if frames[name] is not None else 0
+            elif old is not None:
+                live += old[1]
+        return (size - live) / size
+
+    def _save_append(self, frames: Dict[str, Optional[bytes]]) -> Dict[str, Any]:
+        stats = {'mode': 'append', 'rewritten': [], 'removed': [], 'bytes_written': 0}
+        layout = {name: self._frame_at(name) for name in _SECTIONS}
+        with open(self.path, 'r+b') as f:
+            # 1. New sections go past the end of the file, away from live bytes
+            f.seek(0, os.SEEK_END)
+            for name in _TRAILING_ORDER:
+                frame = frames.get(name)
+                if frame is None:
+                    if name in frames and layout[name] is not None:
+                        stats['removed'].append(name)
+                        self._set_section(name, None)
+                    continue
+                self._set_section(name, f.tell())
+                f.write(frame)
+                stats['rewritten'].append(name)
+                stats['bytes_written'] += len(frame)
+            f.flush()
+            os.fsync(f.fileno())
+
+            # 2. Commit: one small write switches the header to the new sections
+            f.seek(0)
+            f.write(self.header.pack())
+            f.flush()
+            os.fsync(f.fileno())
+
+            # 3. Drop bytes past the last live section (e.g. a removed last section)
+            live_end = HEADER_SIZE
+            for name, old in layout.items():
+                if name in frames:
+                    if frames[name] is not None:
+                        live_end = max(live_end, getattr(self.header, _SECTIONS[name][1]) + len(frames[name]))
+                elif old is not None:
+                    live_end = max(live_end, old[0] + old[1])
+            if live_end < f.seek(0, os.SEEK_END):
+                f.truncate(live_end)
+                f.flush()
+                os.fsync(f.fileno())
+        return stats
+
+    def _save_compact(self, frames: Dict[str, Optional[bytes]]) -> Dict[str, Any]:
+        stats = {'mode': 'compact', 'rewritten': [], 'removed': [], 'bytes_written': 0}
+        layout = {name: self._frame_at(name) for name in _SECTIONS}
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            self._write_compact(frames, layout, stats, tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self.decoder.close()
+        os.replace(tmp_path, self.path)
+        _fsync_directory(self.path.parent)
+        return stats
+
+    def _source_layout(self, layout: Dict[str, Optional[Tuple[int, int]]]) -> str:
+        """Encoder layout the file was written with ('standard' or 'progressive').
+
+        Append saves move edited sections to the end of the file, so the
+        section order alone is not reliable. Pyramid payloads are never
+        moved: progressive files store them smallest level first.
+        """
+        if layout['image'] is not None:
+            locations = self.decoder.level_locations()
+            if len(locations) > 1 and locations[0] != locations[-1]:
+                return 'progressive' if locations[-1].offset < locations[0].offset else 'standard'
+        if layout['image'] is not None and layout['hotspots'] is not None:
+            return 'progressive' if layout['hotspots'][0] < layout['image'][0] else 'standard'
+        return 'standard'
+
+    def _write_compact(self, frames, layout, stats, tmp_path: Path) -> None:
+        order = SECTION_ORDERS[self._source_layout(layout)]
+        with open(self.path, 'rb') as src, open(tmp_path, 'wb') as out:
+            out.write(b'\x00' * HEADER_SIZE)
+            for name in order:
+                if name in frames:
+                    frame = frames[name]
+                    if frame is None:
+                        if layout[name] is not None:
+                            stats['removed'].append(name)
+                        self._set_section(name, None)
+                        continue
+                    self._set_section(name, out.tell())
+                    out.write(frame)
+                    stats['rewritten'].append(name)
+                elif layout[name] is not None:
+                    offset, size = layout[name]
+                    self._set_section(name, out.tell())
+                    src.seek(offset)
+                    copy_bytes(src, out, size, 'section')
+            stats['bytes_written'] = out.tell()
+            out.seek(0)
+            out.write(self.header.pack())
+            out.flush()
+            os.fsync(out.fileno())
+
+
+def _fsync_directory(path: Path) -> None:
+    """Persist a rename on POSIX systems (directories cannot be opened on Windows)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+__all__ = ['K2SHBWIEditor']
@@ -7,20 +7,15 @@ import json
 import zlib
 import struct
 from pathlib import Path
-from typing import Dict, Any, Optional
-from PIL import Image, features as _pil_features
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple, Union
+import hashlib
 import io
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Constants from PIL - handle both old and new PIL versions
-def _get_pil_constant(name):
-    """Helper to get PIL constants across versions"""
-    if hasattr(Image, 'Resampling') and hasattr(Image.Resampling, name):
-        return getattr(Image.Resampling, name)
-    return getattr(Image, name)
-
-LANCZOS = _get_pil_constant('LANCZOS')
-BILINEAR = _get_pil_constant('BILINEAR')
+if TYPE_CHECKING:
+    from PIL import Image
 
 from .format import (
     CompressionType,
@@ -33,28 +28,83 @@ from .format_spec import (
     HEADER_SIZE,
     MIN_IMAGE_SIZE,
     MAX_IMAGE_SIZE,
+    PYRAMID_MARKER_INDEXED,
+    PYRAMID_DIRECTORY_ENTRY,
+    PYRAMID_LEVEL_TILED,
+    PYRAMID_TILE_HEADER,
+    PYRAMID_TILE_ENTRY,
+    DATA_LAYERS_INDEXED_MAGIC,
+    DATA_LAYER_INDEX_HEADER,
+    DATA_LAYER_ID_LENGTH,
+    DATA_LAYER_ENTRY,
 )
 from .errors import ValidationError, CompressionError, FormatError
-from ..algorithms.registry import registry, init_registry
-from ..algorithms.smart_compression import adaptive_compress
+from .hotspot_codec import encode_hotspots
+from ..algorithms.smart_compression import adaptive_compress, is_incompressible
+
+# Section byte order of each encoder layout; progressive puts everything
+# needed to show a thumbnail with hotspots first
+SECTION_ORDERS = {
+    'standard': ('metadata', 'image', 'hotspots', 'data_layers'),
+    'progressive': ('metadata', 'hotspots', 'image', 'data_layers'),
+}
+
+# PIL is imported on first use so that importing the encoder stays cheap
+def _get_pil_constant(name):
+    """Helper to get PIL constants across versions"""
+    from PIL import Image
+    if hasattr(Image, 'Resampling') and hasattr(Image.Resampling, name):
+        return getattr(Image.Resampling, name)
+    return getattr(Image, name)
 
-# Initialize algorithm registry
-init_registry()
 
 class K2SHBWIEncoder:
     """Encodes images and data into K2SHBWI format"""
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.header = K2SHBWIHeader()
         self.metadata = K2SHBWIMetadata()
-        self.image_data = None
+        # Decoded base raster; encoded straight into the output file by encode()
+        self.image: 'Optional[Image.Image]' = None
+        # Optional pre-encoded image bytes, written as-is when no raster is set
+        self._image_data: Optional[bytes] = None
+        # (raster, PNG bytes) of the last ``image_data`` read of ``self.image``
+        self._png_cache: Optional[Tuple[Any, bytes]] = None
         self.hotspots = []
         self.data_layers = {}
         # Default compression types for sections
         self.hotspots_compression = CompressionType.ZLIB
         self.data_layers_compression = CompressionType.ZLIB
+        # Optional per-section compression levels for the fixed compressors
+        # above, keyed by 'metadata', 'hotspots', 'data_layers' or 'image'
+        # (pyramid level payloads); missing keys use the backend default.
+        self.section_levels: Dict[str, Optional[int]] = {}
+        # Hotspot section encoding: 'json' or 'binary' (columnar arrays with
+        # interned strings, see core.hotspot_codec). Hotspots the binary
+        # layout cannot represent fall back to JSON.
+        self.hotspots_format = 'json'
+        # Section byte order: 'standard' (metadata, image, hotspots, layers)
+        # or 'progressive' (metadata, hotspots, image, layers, with pyramid
+        # payloads stored smallest level first) so streaming readers can
+        # render a thumbnail early (see K2SHBWIStreamDecoder).
+        self.layout = 'standard'
+        # Indexed data-layer section: an index (layer id -> offset, length,
+        # codec) followed by one compressed record per layer, so readers
+        # can load a single layer. Off by default (one JSON blob).
+        self.data_layers_indexed = False
+        # Optional trained zstd dictionary (see core.dictionaries). When set,
+        # the sections listed in dictionary_sections are compressed with
+        # CompressionType.ZSTD_DICT and the header records the dictionary id.
+        self.dictionary: Any = None
+        self.dictionary_sections = ('metadata', 'hotspots')
         # Adaptive compression flag: when True encoder chooses the best compressor per-section
         self.adaptive_compression = False
+        # How adaptive compression picks a codec: 'rules' (fixed heuristics) or
+        # 'trial' (trial-compress a sample with each available codec/level and
+        # pick the best for compression_objective: 'size' or 'speed').
+        # The choice and its measurements land in stats['sections'].
+        self.compression_selection = 'rules'
+        self.compression_objective = 'size'
         # Image pyramid support (off by default). When enabled, encoder will
         # generate multiple resolution PNG levels and store them in a
         # pyramid container that the decoder can read.
@@ -82,10 +132,40 @@ class K2SHBWIEncoder:
         # Downsample size used for SSIM comparisons (longest side).
         # Downsampling keeps SSIM fast in CI and for large images.
         self.pyramid_ssim_downsample = 256
+        # Optional tiled layout: when set (e.g. 256), every pyramid level is
+        # split into tiles of this size, each encoded and indexed separately,
+        # so viewers can decode just the tiles covering a viewport.
+        self.pyramid_tile_size: Optional[int] = None
+        # Second-pass compression of encoded level images: 'auto' stores
+        # PNG/JPEG/WEBP (and anything a quick trial finds incompressible)
+        # with CompressionType.NONE; 'always' runs the section compressor.
+        self.pyramid_recompress = 'auto'
+        # Opt-in parallel pyramid generation: number of threads used to
+        # resize, encode and compress levels (None/1 = sequential).
+        self.max_workers = max_workers
+        # Cascaded downsampling: build each level from the previous level
+        # (Image.reduce() for integer factors) instead of the full-resolution
+        # source. Optional quality guard: minimum SSIM against the direct
+        # resize, below which the direct resize is used (costs one direct
+        # resize per level, so it is off by default).
+        self.pyramid_cascade = False
+        self.pyramid_cascade_min_ssim: Optional[float] = None
+        # Store levels with identical content once; duplicate directory
+        # entries point at the same payload.
+        self.pyramid_dedupe = True
+        # Statistics from the last encode() call
+        self.stats: Dict[str, Any] = {}
         
-    def set_image(self, image_path: str):
-        """Load and validate the base image"""
-        img = Image.open(image_path)
+    def set_image(self, image: Union[str, Path, 'Image.Image']):
+        """Load and validate the base image
+
+        ``image`` is a path or an already decoded PIL image. Passing the
+        image object (as ``K2SHBWIBuilder`` does) avoids decoding the file a
+        second time; the raster is used as-is and never round-tripped
+        through PNG before encoding.
+        """
+        from PIL import Image
+        img = image if isinstance(image, Image.Image) else Image.open(image)
         
         # Convert to standardized format
         if img.mode not in ('RGB', 'RGBA'):
@@ -96,20 +176,44 @@ class K2SHBWIEncoder:
         if w < MIN_IMAGE_SIZE or h < MIN_IMAGE_SIZE:
             target_w = max(w, MIN_IMAGE_SIZE)
             target_h = max(h, MIN_IMAGE_SIZE)
-            img = img.resize((target_w, target_h), resample=LANCZOS)
+            img = img.resize((target_w, target_h), resample=_get_pil_constant('LANCZOS'))
 
         if w > MAX_IMAGE_SIZE or h > MAX_IMAGE_SIZE:
             raise ValidationError(f"Image too large: {w}x{h} exceeds max {MAX_IMAGE_SIZE}")
 
-        # Store in memory as PNG (lossless base)
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        self.image_data = img_byte_arr.getvalue()
+        # Keep the decoded raster (lossless base); it is only encoded when
+        # the file is written, so no PNG copy is held in memory meanwhile.
+        img.load()
+        self.image = img
+        self._image_data = None
+        self._png_cache = None
 
         # Set flag (we have at least a base image level)
         self.header.set_feature_flag(FeatureFlags.HAS_IMAGE_PYRAMID)
 
-    def _shannon_entropy(self, img: Image.Image) -> float:
+    @property
+    def image_data(self) -> Optional[bytes]:
+        """Base image as PNG bytes.
+
+        Kept for compatibility: the encoder now holds the raster in
+        ``self.image``. It is encoded on first access and the bytes are
+        reused until ``set_image`` is called or ``self.image`` is replaced.
+        """
+        if self._image_data is not None or self.image is None:
+            return self._image_data
+        if self._png_cache is None or self._png_cache[0] is not self.image:
+            img_byte_arr = io.BytesIO()
+            self.image.save(img_byte_arr, format='PNG')
+            self._png_cache = (self.image, img_byte_arr.getvalue())
+        return self._png_cache[1]
+
+    @image_data.setter
+    def image_data(self, value: Optional[bytes]):
+        self._image_data = value
+        self.image = None
+        self._png_cache = None
+
+    def _shannon_entropy(self, img: 'Image.Image') -> float:
         """Compute Shannon entropy for a grayscale version of the image."""
         hist = img.convert('L').histogram()
         total = sum(hist)
@@ -122,7 +226,7 @@ class K2SHBWIEncoder:
                 ent -= p * math.log2(p)
         return ent
 
-    def _compute_ssim(self, img1: Image.Image, img2: Image.Image) -> Optional[float]:
+    def _compute_ssim(self, img1: 'Image.Image', img2: 'Image.Image') -> Optional[float]:
         """Try to compute SSIM between two PIL Images.
 
         First tries to use skimage.metrics.structural_similarity if available.
@@ -134,7 +238,7 @@ class K2SHBWIEncoder:
         # Ensure same size; if not, resize img2 to img1 size
         try:
             if img1.size != img2.size:
-                img2 = img2.resize(img1.size, resample=BILINEAR)
+                img2 = img2.resize(img1.size, resample=_get_pil_constant('BILINEAR'))
         except Exception:
             return None
 
@@ -185,12 +289,12 @@ class K2SHBWIEncoder:
             max_side = int(self.pyramid_ssim_downsample)
             if max(img1.size) > max_side:
                 img1_small = img1.copy()
-                img1_small.thumbnail((max_side, max_side), resample=LANCZOS)
+                img1_small.thumbnail((max_side, max_side), resample=_get_pil_constant('LANCZOS'))
             else:
                 img1_small = img1
             if max(img2.size) > max_side:
                 img2_small = img2.copy()
-                img2_small.thumbnail((max_side, max_side), resample=LANCZOS)
+                img2_small.thumbnail((max_side, max_side), resample=_get_pil_constant('LANCZOS'))
             else:
                 img2_small = img2
 
@@ -218,13 +322,14 @@ class K2SHBWIEncoder:
             return None
 
 
-    def _choose_format_for_level(self, img: Image.Image, prev_img: Optional[Image.Image] = None) -> int:
+    def _choose_format_for_level(self, img: 'Image.Image', prev_img: Optional['Image.Image'] = None) -> int:
         """Return format id for a level using simple heuristics.
 
         - If image has an alpha channel -> PNG (0)
         - Else compute entropy; if entropy > threshold -> lossy (WEBP if available else JPEG)
         - Otherwise PNG
         """
+        from PIL import features as _pil_features
         # Preserve alpha
         bands = img.getbands()
         if 'A' in bands:
@@ -253,100 +358,522 @@ class K2SHBWIEncoder:
             return 2 if webp_ok else 1
         return 0
 
-    def _generate_pyramid_blob(self, img: Image.Image) -> bytes:
-        """Generate a pyramid container bytes for the provided PIL Image.
+    def _encode_level_image(self, level_img: 'Image.Image', fmt: int) -> Tuple[bytes, int]:
+        """Encode a level (or tile) image; returns (image_bytes, format actually used)."""
+        buf = io.BytesIO()
+        # 0=PNG, 1=JPEG, 2=WEBP
+        if fmt == 0:
+            level_img.save(buf, format='PNG')
+        elif fmt == 1:
+            # JPEG doesn't support alpha; convert if necessary
+            save_img = level_img.convert('RGB')
+            save_img.save(buf, format='JPEG', quality=self.pyramid_quality)
+        elif fmt == 2:
+            try:
+                level_img.save(buf, format='WEBP', quality=self.pyramid_quality)
+            except Exception:
+                # Fallback to JPEG (if alpha then PNG)
+                buf = io.BytesIO()
+                try:
+                    save_img = level_img.convert('RGB')
+                    save_img.save(buf, format='JPEG', quality=self.pyramid_quality)
+                    fmt = 1
+                except Exception:
+                    buf = io.BytesIO()
+                    level_img.save(buf, format='PNG')
+                    fmt = 0
+        else:
+            level_img.save(buf, format='PNG')
+        return buf.getvalue(), fmt
+
+    def _compress_level_payload(self, img_bytes: bytes,
+                                level_stats: Optional[Dict[str, Any]] = None) -> Tuple[bytes, CompressionType]:
+        """Compress encoded image bytes with the section compressor.
+
+        With ``pyramid_recompress == 'auto'`` payloads that are already
+        entropy-coded are stored as-is. ``level_stats`` (if given) collects
+        how much the second pass saved.
+        """
+        start = time.perf_counter()
+        if self.pyramid_recompress == 'auto' and is_incompressible(img_bytes):
+            comp_bytes, comp_type = img_bytes, CompressionType.NONE
+        elif self.adaptive_compression:
+            comp_bytes, comp_type = adaptive_compress(img_bytes, data_type='image',
+                                                      mode=self.compression_selection,
+                                                      objective=self.compression_objective)
+        else:
+            compressor = CompressionType.get_compressor(self.data_layers_compression,
+                                                        self.section_levels.get('image'))
+            comp_bytes, comp_type = compressor(img_bytes), self.data_layers_compression
+
+        if level_stats is not None:
+            level_stats['raw_bytes'] += len(img_bytes)
+            level_stats['stored_bytes'] += len(comp_bytes)
+            level_stats['saved_bytes'] += len(img_bytes) - len(comp_bytes)
+            level_stats['compress_ms'] += (time.perf_counter() - start) * 1000.0
+            level_stats['recompressed' if comp_type != CompressionType.NONE else 'skipped'] += 1
+        return comp_bytes, comp_type
+
+    def _encode_tiled_level(self, level_img: 'Image.Image', fmt: int,
+                            level_stats: Optional[Dict[str, Any]] = None) -> bytes:
+        """Split a level into a grid of independently encoded tiles.
+
+        See ``PYRAMID_TILE_HEADER`` / ``PYRAMID_TILE_ENTRY`` in format_spec
+        for the layout.
+        """
+        tile = int(self.pyramid_tile_size)
+        w, h = level_img.size
+        cols = max(1, math.ceil(w / tile))
+        rows = max(1, math.ceil(h / tile))
+
+        index = []
+        payloads = []
+        offset = PYRAMID_TILE_HEADER.size + PYRAMID_TILE_ENTRY.size * cols * rows
+        for row in range(rows):
+            for col in range(cols):
+                box = (col * tile, row * tile, min(w, (col + 1) * tile), min(h, (row + 1) * tile))
+                tile_bytes, tile_fmt = self._encode_level_image(level_img.crop(box), fmt)
+                comp_bytes, comp_type = self._compress_level_payload(tile_bytes, level_stats)
+                index.append(PYRAMID_TILE_ENTRY.pack(comp_type.value, tile_fmt, offset, len(comp_bytes)))
+                payloads.append(comp_bytes)
+                offset += len(comp_bytes)
+
+        return b''.join([PYRAMID_TILE_HEADER.pack(tile, tile, cols, rows)] + index + payloads)
+
+    @staticmethod
+    def _level_dimensions(size_wh: Tuple[int, int], size: int) -> Tuple[int, int]:
+        """Dimensions of a level whose longest side is ``size`` (never upscaled)."""
+        w, h = size_wh
+        if max(w, h) <= size:
+            return w, h
+        if w >= h:
+            return size, int(h * (size / w))
+        return int(w * (size / h)), size
+
+    def _resize_level(self, img: 'Image.Image', size: int) -> 'Image.Image':
+        """Resize preserving aspect ratio to have longest side == size."""
+        target = self._level_dimensions(img.size, size)
+        if target == img.size:
+            return img.copy()
+        return img.resize(target, resample=_get_pil_constant('LANCZOS'))
+
+    def _cascade_level(self, img: 'Image.Image', prev_level_img: 'Image.Image', size: int) -> 'Image.Image':
+        """Derive a level from the previous (larger) level instead of the source.
+
+        Uses ``Image.reduce()`` when the previous level is an exact integer
+        multiple of the target, otherwise a LANCZOS resize of the previous
+        level. Falls back to the direct resize when the previous level is
+        smaller than the target.
+        """
+        target = self._level_dimensions(img.size, size)
+        if target == img.size:
+            return img.copy()
+        pw, ph = prev_level_img.size
+        if target == (pw, ph):
+            return prev_level_img.copy()
+        if pw < target[0] or ph < target[1]:
+            return self._resize_level(img, size)
+        factor = pw // target[0]
+        if factor >= 2 and pw == target[0] * factor and ph == target[1] * factor:
+            return prev_level_img.reduce(factor)
+        return prev_level_img.resize(target, resample=_get_pil_constant('LANCZOS'))
+
+    def _iter_pyramid_levels(self, img: 'Image.Image'):
+        """Yield ``(idx, level_img)`` for each pyramid level, one at a time.
+
+        With ``pyramid_cascade`` each level is built from the previous one,
+        so the full-resolution source is only resampled once. When
+        ``pyramid_cascade_min_ssim`` is set every cascaded level is compared
+        against the direct resize and replaced by it if the SSIM is lower.
+        """
+        cascade_stats = {'levels': 0, 'fallbacks': 0, 'min_ssim': None}
+        if self.pyramid_cascade:
+            self.stats['cascade'] = cascade_stats
+        prev_level_img = None
+        for idx, size in enumerate(self.pyramid_levels):
+            if not self.pyramid_cascade or prev_level_img is None:
+                level_img = self._resize_level(img, size)
+            else:
+                level_img = self._cascade_level(img, prev_level_img, size)
+                cascade_stats['levels'] += 1
+                if self.pyramid_cascade_min_ssim is not None:
+                    direct = self._resize_level(img, size)
+                    score = self._compute_ssim(level_img, direct)
+                    if score is not None:
+                        prev_min = cascade_stats['min_ssim']
+                        cascade_stats['min_ssim'] = score if prev_min is None else min(prev_min, score)
+                    if score is None or score < self.pyramid_cascade_min_ssim:
+                        cascade_stats['fallbacks'] += 1
+                        level_img = direct
+            yield idx, level_img
+            prev_level_img = level_img
+
+    def _encode_pyramid_level(self, idx: int, level_img: 'Image.Image',
+                              prev_level_img: Optional['Image.Image'],
+                              level_stats: Optional[Dict[str, Any]] = None) -> Tuple[int, int, int, bytes]:
+        """Encode and compress one level; returns (format, comp_type, flags, payload)."""
+        # Decide format for this level. If pyramid_level_formats is None -> auto-select by entropy.
+        if self.pyramid_level_formats is None:
+            fmt = self._choose_format_for_level(level_img, prev_level_img)
+        else:
+            fmt = self.pyramid_level_formats[idx] if idx < len(self.pyramid_level_formats) else 0
+
+        if self.pyramid_tile_size:
+            payload = self._encode_tiled_level(level_img, fmt, level_stats)
+            return fmt, CompressionType.NONE.value, PYRAMID_LEVEL_TILED, payload
+
+        img_bytes, fmt = self._encode_level_image(level_img, fmt)
+        comp_bytes, comp_type = self._compress_level_payload(img_bytes, level_stats)
+        return fmt, comp_type.value, 0, comp_bytes
+
+    def _encode_level_job(self, idx: int, level_img: 'Image.Image',
+                          prev_level_img: Optional['Image.Image']) -> Tuple[int, Tuple[int, int], int, int, int, bytes, Dict[str, Any]]:
+        """Encode one level and collect its statistics.
+
+        Returns (idx, size, format, comp_type, flags, payload, level_stats).
+        """
+        level_stats = {
+            'level_id': idx, 'raw_bytes': 0, 'stored_bytes': 0, 'saved_bytes': 0,
+            'compress_ms': 0.0, 'recompressed': 0, 'skipped': 0,
+        }
+        fmt, comp_type_val, flags, payload = self._encode_pyramid_level(
+            idx, level_img, prev_level_img, level_stats)
+        return idx, level_img.size, fmt, comp_type_val, flags, payload, level_stats
+
+    @staticmethod
+    def _level_digest(level_img: 'Image.Image') -> bytes:
+        return hashlib.blake2b(level_img.tobytes(), digest_size=16).digest()
+
+    def _duplicate_of(self, idx: int, level_img: 'Image.Image', prev_level_img: Optional['Image.Image'],
+                      digests: Dict[int, bytes], roots: Dict[int, int]) -> Optional[int]:
+        """Return the index of an earlier level with identical content, if any.
+
+        Only levels with the same dimensions and mode as the previous level
+        are hashed, which covers the common case of a source smaller than
+        several level sizes. With explicit ``pyramid_level_formats`` both
+        levels must also request the same format.
+        """
+        if not self.pyramid_dedupe or prev_level_img is None:
+            return None
+        if (level_img.size, level_img.mode) != (prev_level_img.size, prev_level_img.mode):
+            return None
+        prev_idx = idx - 1
+        if self.pyramid_level_formats is not None:
+            formats = self.pyramid_level_formats
+            requested = [formats[i] if i < len(formats) else 0 for i in (prev_idx, idx)]
+            if requested[0] != requested[1]:
+                return None
+        if prev_idx not in digests:
+            digests[prev_idx] = self._level_digest(prev_level_img)
+        digests[idx] = self._level_digest(level_img)
+        if digests[idx] != digests[prev_idx]:
+            return None
+        return roots.get(prev_idx, prev_idx)
+
+    def _duplicate_level_record(self, idx: int, level_img: 'Image.Image', root: int):
+        """Record for a level that reuses the payload of level ``root``."""
+        level_stats = {
+            'level_id': idx, 'raw_bytes': 0, 'stored_bytes': 0, 'saved_bytes': 0,
+            'compress_ms': 0.0, 'recompressed': 0, 'skipped': 0, 'duplicate_of': root,
+        }
+        return idx, level_img.size, None, None, None, None, level_stats
+
+    def _iter_encoded_levels(self, img: 'Image.Image'):
+        """Yield encoded levels (see ``_encode_level_job``) in level order.
+
+        Levels identical to an earlier level (``pyramid_dedupe``) are not
+        encoded again; their record has a ``None`` payload and
+        ``level_stats['duplicate_of']`` names the level whose payload the
+        directory entry should point at.
+
+        Sequential by default. With ``max_workers > 1`` levels are resized,
+        encoded and compressed in a thread pool (Pillow releases the GIL for
+        resize and save); results are still yielded in level order and are
+        byte-identical to the sequential path, at the cost of holding every
+        level raster in memory at once.
+        """
+        digests: Dict[int, bytes] = {}
+        roots: Dict[int, int] = {}
+
+        if not self.max_workers or self.max_workers <= 1:
+            prev_level_img = None
+            for idx, level_img in self._iter_pyramid_levels(img):
+                root = self._duplicate_of(idx, level_img, prev_level_img, digests, roots)
+                if root is not None:
+                    roots[idx] = root
+                    yield self._duplicate_level_record(idx, level_img, root)
+                else:
+                    yield self._encode_level_job(idx, level_img, prev_level_img)
+                # remember this level for next iteration SSIM comparison
+                prev_level_img = level_img
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            if self.pyramid_cascade:
+                # Each level is derived from the previous one, so resizing
+                # stays sequential; only encoding runs in the pool.
+                level_imgs = (level_img for _, level_img in self._iter_pyramid_levels(img))
+            else:
+                resized = [pool.submit(self._resize_level, img, size) for size in self.pyramid_levels]
+                level_imgs = (future.result() for future in resized)
+            encoded = []
+            prev_level_img = None
+            for idx, level_img in enumerate(level_imgs):
+                root = self._duplicate_of(idx, level_img, prev_level_img, digests, roots)
+                if root is not None:
+                    roots[idx] = root
+                    encoded.append(self._duplicate_level_record(idx, level_img, root))
+                else:
+                    encoded.append(pool.submit(self._encode_level_job, idx, level_img, prev_level_img))
+                prev_level_img = level_img
+            del level_imgs, prev_level_img
+            for future in encoded:
+                yield future if isinstance(future, tuple) else future.result()
+
+    def _write_pyramid_container(self, f, img: 'Image.Image') -> int:
+        """Stream a pyramid container for ``img`` into the file object ``f``.
 
-        Container format (binary):
-          marker (1B) = 0x7F
+        Container format (binary, indexed):
+          marker (1B) = 0x7E
           num_levels (1B)
-          for each level:
+          level directory, for each level (21B):
             level_id (1B)
             width (4B little)
             height (4B little)
             format (1B) (0=PNG)
             quality (1B) (reserved)
             comp_type (1B)
-            comp_len (4B little)
-            comp_payload (comp_len bytes)
-
-        Each level image is encoded as PNG bytes, then compressed using
-        the adaptive compressor (if enabled) or the encoder's preferred compressor.
+            flags (1B) (bit 0 = tiled)
+            offset (4B little, from the marker byte)
+            length (4B little)
+          level payloads (compressed image bytes, in directory order;
+          identical levels share one payload)
+
+        The directory lets a reader seek straight to a single level. Each
+        level image is encoded as PNG bytes, then compressed using the
+        adaptive compressor (if enabled) or the encoder's preferred compressor.
+        When ``pyramid_tile_size`` is set every level is stored as a grid of
+        independently encoded tiles instead of one image.
+
+        Levels are generated, encoded and written one at a time; the directory
+        is reserved up front and patched once all payloads are written, so
+        peak memory is bounded by a single level (unless ``max_workers``
+        enables parallel generation). ``f`` must be seekable. With
+        ``layout = 'progressive'`` payloads are stored smallest level first.
+        Per-level compression statistics are recorded in
+        ``self.stats['pyramid_levels']``. Returns the number of bytes written.
         """
-        import io
-        from struct import pack
-
-        marker = b'\x7F'
-        levels = []
-
-        prev_level_img = None
-        for idx, size in enumerate(self.pyramid_levels):
-            # Resize preserving aspect ratio to have longest side == size
-            w, h = img.size
-            if max(w, h) <= size:
-                level_img = img.copy()
-            else:
-                if w >= h:
-                    nw = size
-                    nh = int(h * (size / w))
-                else:
-                    nh = size
-                    nw = int(w * (size / h))
-                level_img = img.resize((nw, nh), resample=LANCZOS)
-
-            buf = io.BytesIO()
-
-            # Decide format for this level. If pyramid_level_formats is None -> auto-select by entropy.
-            if self.pyramid_level_formats is None:
-                fmt = self._choose_format_for_level(level_img, prev_level_img)
+        start = f.tell()
+        num_levels = len(self.pyramid_levels)
+        f.write(struct.pack('<BB', PYRAMID_MARKER_INDEXED, num_levels))
+        directory_pos = f.tell()
+        f.write(b'\x00' * (PYRAMID_DIRECTORY_ENTRY.size * num_levels))
+
+        self.stats['pyramid_levels'] = []
+        if self.layout == 'progressive':
+            return self._write_progressive_levels(f, img, start, directory_pos)
+        directory = []
+        written = {}
+        for idx, (w, h), fmt, comp_type_val, flags, payload, level_stats in self._iter_encoded_levels(img):
+            self.stats['pyramid_levels'].append(level_stats)
+            if payload is None:
+                # Duplicate level: point the directory at the earlier payload
+                fmt, comp_type_val, flags, offset, length = written[level_stats['duplicate_of']]
             else:
-                fmt = self.pyramid_level_formats[idx] if idx < len(self.pyramid_level_formats) else 0
-
-            # 0=PNG, 1=JPEG, 2=WEBP
-            if fmt == 0:
-                level_img.save(buf, format='PNG')
-            elif fmt == 1:
-                # JPEG doesn't support alpha; convert if necessary
-                save_img = level_img.convert('RGB')
-                save_img.save(buf, format='JPEG', quality=self.pyramid_quality)
-            elif fmt == 2:
-                try:
-                    level_img.save(buf, format='WEBP', quality=self.pyramid_quality)
-                except Exception:
-                    # Fallback to JPEG (if alpha then PNG)
-                    try:
-                        save_img = level_img.convert('RGB')
-                        save_img.save(buf, format='JPEG', quality=self.pyramid_quality)
-                        fmt = 1
-                    except Exception:
-                        level_img.save(buf, format='PNG')
-                        fmt = 0
+                offset, length = f.tell() - start, len(payload)
+                f.write(payload)
+                written[idx] = (fmt, comp_type_val, flags, offset, length)
+            directory.append(PYRAMID_DIRECTORY_ENTRY.pack(
+                idx, w, h, fmt, self.pyramid_quality, comp_type_val, flags, offset, length))
+
+        end = f.tell()
+        f.seek(directory_pos)
+        f.write(b''.join(directory))
+        f.seek(end)
+        return end - start
+
+    def _write_progressive_levels(self, f, img: 'Image.Image', start: int, directory_pos: int) -> int:
+        """Write level payloads smallest first (progressive layout).
+
+        Levels are generated from the largest down, so every encoded payload
+        is held until the last one is ready (peak memory is the compressed
+        pyramid, not a single level).
+        """
+        levels = list(self._iter_encoded_levels(img))
+        offset = directory_pos - start + PYRAMID_DIRECTORY_ENTRY.size * len(levels)
+        written = {}
+        for idx, size, fmt, comp_type_val, flags, payload, level_stats in reversed(levels):
+            if payload is not None:
+                written[idx] = (fmt, comp_type_val, flags, offset, len(payload))
+                offset += len(payload)
+
+        directory = []
+        for idx, (w, h), fmt, comp_type_val, flags, payload, level_stats in levels:
+            self.stats['pyramid_levels'].append(level_stats)
+            fmt, comp_type_val, flags, level_off, length = written[level_stats.get('duplicate_of', idx)]
+            directory.append(PYRAMID_DIRECTORY_ENTRY.pack(
+                idx, w, h, fmt, self.pyramid_quality, comp_type_val, flags, level_off, length))
+        f.seek(directory_pos)
+        f.write(b''.join(directory))
+        for level in reversed(levels):
+            if level[5] is not None:
+                f.write(level[5])
+        return f.tell() - start
+
+    def _generate_pyramid_blob(self, img: 'Image.Image') -> bytes:
+        """Generate the pyramid container bytes for the provided PIL Image.
+
+        In-memory variant of ``_write_pyramid_container``; ``encode()``
+        streams the container straight to the output file instead.
+        """
+        buf = io.BytesIO()
+        self._write_pyramid_container(buf, img)
+        return buf.getvalue()
+
+    def _adaptive_compress_section(self, name: str, raw: bytes) -> Tuple[bytes, CompressionType]:
+        """Adaptively compress a JSON section and record the choice in stats."""
+        section_stats: Dict[str, Any] = {}
+        compressed, chosen = adaptive_compress(raw, data_type='json',
+                                               mode=self.compression_selection,
+                                               objective=self.compression_objective,
+                                               stats=section_stats)
+        self.stats.setdefault('sections', {})[name] = section_stats
+        return compressed, chosen
+
+    def _serialize_metadata(self) -> bytes:
+        """Compact JSON metadata payload (adaptive and dictionary sections)."""
+        return json.dumps(self.metadata.data, separators=(',', ':')).encode('utf-8')
+
+    def _serialize_hotspots(self) -> bytes:
+        """Hotspot section payload in the configured ``hotspots_format``."""
+        if self.hotspots_format == 'binary':
+            try:
+                raw = encode_hotspots(self.hotspots)
+                self.stats['hotspots_format'] = 'binary'
+                return raw
+            except ValueError as e:
+                self.stats['hotspots_format_fallback'] = str(e)
+        elif self.hotspots_format != 'json':
+            raise ValueError(f"Unknown hotspots_format: {self.hotspots_format}")
+        self.stats['hotspots_format'] = 'json'
+        return json.dumps(self.hotspots).encode('utf-8')
+
+    def _serialize_indexed_data_layers(self) -> bytes:
+        """Indexed data-layer payload: layer index, then one record per layer."""
+        entries, records = [], []
+        for layer_id, data in self.data_layers.items():
+            raw = json.dumps(data).encode('utf-8')
+            compressed, chosen = self._compress_section('data_layers', raw, self.data_layers_compression,
+                                                        stats_name=f'data_layers/{layer_id}')
+            entries.append((str(layer_id).encode('utf-8'), chosen))
+            records.append(compressed)
+
+        index_size = sum(DATA_LAYER_ID_LENGTH.size + len(lid) + DATA_LAYER_ENTRY.size for lid, _ in entries)
+        offset = DATA_LAYER_INDEX_HEADER.size + index_size
+        index = [DATA_LAYER_INDEX_HEADER.pack(DATA_LAYERS_INDEXED_MAGIC, len(entries), index_size)]
+        for (lid, chosen), record in zip(entries, records):
+            index.append(DATA_LAYER_ID_LENGTH.pack(len(lid)) + lid)
+            index.append(DATA_LAYER_ENTRY.pack(chosen.value, offset, len(record)))
+            offset += len(record)
+        return b''.join(index + records)
+
+    def _write_metadata_section(self, f) -> None:
+        if self.header.flags & FeatureFlags.HAS_METADATA.value:
+            self.header.metadata_offset = f.tell()
+            f.write(self._metadata_section())
+
+    def _write_image_section(self, f) -> None:
+        """Write the image (single blob or pyramid container), streamed into
+        the file with the length prefix patched afterwards."""
+        img = self.image
+        if img is None and self._image_data and self.image_pyramid_enabled:
+            from PIL import Image
+            img = Image.open(io.BytesIO(self._image_data))
+        if img is not None:
+            self.header.image_pyramid_offset = f.tell()
+            if self.image_pyramid_enabled:
+                self._write_length_prefixed(f, lambda out: self._write_pyramid_container(out, img))
             else:
-                level_img.save(buf, format='PNG')
-
-            png_bytes = buf.getvalue()
-
-            # Choose compressor
+                self._write_length_prefixed(f, lambda out: img.save(out, format='PNG'))
+        elif self._image_data:
+            # Write pre-encoded image blob (length + bytes)
+            self.header.image_pyramid_offset = f.tell()
+            f.write(struct.pack('<I', len(self._image_data)))
+            f.write(self._image_data)
+
+    def _write_hotspots_section(self, f) -> None:
+        if self.hotspots:
+            self.header.hotspot_map_offset = f.tell()
+            f.write(self._hotspots_section())
+
+    def _write_data_layers_section(self, f) -> None:
+        if self.data_layers:
+            self.header.data_layers_offset = f.tell()
+            f.write(self._data_layers_section())
+
+    def _metadata_section(self) -> bytes:
+        """Framed (``<I length><B comp_type>``) metadata section."""
+        try:
             if self.adaptive_compression:
-                comp_bytes, comp_type = adaptive_compress(png_bytes, data_type='image')
+                raw = self._serialize_metadata()
+                compressed, chosen = self._adaptive_compress_section('metadata', raw)
+            elif self._uses_dictionary('metadata'):
+                self.metadata.validate()
+                raw = self._serialize_metadata()
+                compressed, chosen = self._compress_section('metadata', raw, CompressionType.ZSTD_DICT)
             else:
-                compressor = CompressionType.get_compressor(self.data_layers_compression)
-                comp_bytes = compressor(png_bytes)
-                comp_type = self.data_layers_compression
-
-            levels.append((idx, level_img.width, level_img.height, fmt, self.pyramid_quality, comp_type.value, comp_bytes))
-            # remember this level for next iteration SSIM comparison
-            prev_level_img = level_img.copy()
-
-        parts = [marker, pack('<B', len(levels))]
-        for lvl in levels:
-            idx, w, h, fmt, quality, comp_type_val, comp_bytes = lvl
-            parts.append(pack('<BII', idx, w, h))
-            parts.append(pack('<BB', fmt, quality))
-            parts.append(pack('<BI', comp_type_val, len(comp_bytes)))
-            parts.append(comp_bytes)
-
-        return b''.join(parts)
-        
+                self.metadata.compression_level = self.section_levels.get('metadata')
+                packed_meta, total_len = self.metadata.pack()
+                return packed_meta
+        except Exception as e:
+            raise CompressionError(f"Failed to pack metadata: {e}")
+        return struct.pack('<IB', len(compressed), chosen.value) + compressed
+
+    def _hotspots_section(self) -> bytes:
+        """Framed hotspot section."""
+        compressed, chosen = self._compress_section('hotspots', self._serialize_hotspots(),
+                                                    self.hotspots_compression)
+        return struct.pack('<IB', len(compressed), chosen.value) + compressed
+
+    def _data_layers_section(self) -> bytes:
+        """Framed data-layer section (JSON blob or indexed records)."""
+        if self.data_layers_indexed:
+            compressed, chosen = self._serialize_indexed_data_layers(), CompressionType.NONE
+        else:
+            layers_json = json.dumps(self.data_layers).encode('utf-8')
+            compressed, chosen = self._compress_section('data_layers', layers_json,
+                                                        self.data_layers_compression)
+        return struct.pack('<IB', len(compressed), chosen.value) + compressed
+
+    def _uses_dictionary(self, name: str) -> bool:
+        return (self.dictionary is not None and not self.adaptive_compression
+                and name in self.dictionary_sections)
+
+    def _compress_section(self, name: str, raw: bytes, comp_type: CompressionType,
+                          stats_name: Optional[str] = None) -> Tuple[bytes, CompressionType]:
+        """Compress a JSON section with the adaptive, dictionary or fixed codec.
+
+        ``stats_name`` overrides the key adaptive choices are recorded under.
+        """
+        if self.adaptive_compression:
+            return self._adaptive_compress_section(stats_name or name, raw)
+        dict_data = None
+        if self._uses_dictionary(name):
+            comp_type, dict_data = CompressionType.ZSTD_DICT, self.dictionary
+        compressor = CompressionType.get_compressor(comp_type, self.section_levels.get(name), dict_data)
+        return compressor(raw), comp_type
+
+    def _write_length_prefixed(self, f, write_body) -> None:
+        """Write a ``<I length>`` prefixed section whose length is patched afterwards."""
+        length_pos = f.tell()
+        f.write(b'\x00\x00\x00\x00')
+        start = f.tell()
+        write_body(f)
+        end = f.tell()
+        f.seek(length_pos)
+        f.write(struct.pack('<I', end - start))
+        f.seek(end)
+
     def add_metadata(self, metadata: Dict[str, Any]):
         """Add metadata to the file"""
         self.metadata.data = metadata
@@ -368,74 +895,17 @@ class K2SHBWIEncoder:
         
     def encode(self, output_path: str):
         """Encode everything into K2SHBWI format"""
+        self.stats = {}
+        uses_dictionary = any(self._uses_dictionary(name) for name in ('metadata', 'hotspots', 'data_layers'))
+        self.header.dictionary_id = self.dictionary.dict_id() if uses_dictionary else 0
         with open(output_path, 'wb') as f:
             # Write header placeholder (don't validate yet) - reserve HEADER_SIZE bytes
             f.write(b'\x00' * HEADER_SIZE)
-            current_offset = HEADER_SIZE
-            
-            # Write metadata
-            if self.header.flags & FeatureFlags.HAS_METADATA.value:
-                self.header.metadata_offset = current_offset
-                try:
-                    if self.adaptive_compression:
-                        raw = json.dumps(self.metadata.data, separators=(',', ':')).encode('utf-8')
-                        compressed, chosen = adaptive_compress(raw, data_type='json')
-                        f.write(struct.pack('<IB', len(compressed), chosen.value))
-                        f.write(compressed)
-                    else:
-                        packed_meta, total_len = self.metadata.pack()
-                        f.write(packed_meta)
-                except Exception as e:
-                    raise CompressionError(f"Failed to pack metadata: {e}")
-
-                current_offset = f.tell()
-            
-            # Write image data (single blob or pyramid container)
-            if self.image_data:
-                self.header.image_pyramid_offset = current_offset
-                if self.image_pyramid_enabled:
-                    # Build pyramid container from the in-memory image
-                    import io as _io
-                    from PIL import Image as _Image
-                    img = _Image.open(_io.BytesIO(self.image_data))
-                    pyramid_blob = self._generate_pyramid_blob(img)
-                    f.write(struct.pack('<I', len(pyramid_blob)))
-                    f.write(pyramid_blob)
-                else:
-                    # Write image blob (length + bytes)
-                    f.write(struct.pack('<I', len(self.image_data)))
-                    f.write(self.image_data)
-                current_offset = f.tell()
-            
-            # Write hotspots
-            if self.hotspots:
-                self.header.hotspot_map_offset = current_offset
-                hotspots_json = json.dumps(self.hotspots).encode('utf-8')
-                if self.adaptive_compression:
-                    compressed, chosen = adaptive_compress(hotspots_json, data_type='json')
-                    f.write(struct.pack('<IB', len(compressed), chosen.value))
-                    f.write(compressed)
-                else:
-                    compressor = CompressionType.get_compressor(self.hotspots_compression)
-                    compressed = compressor(hotspots_json)
-                    f.write(struct.pack('<IB', len(compressed), self.hotspots_compression.value))
-                    f.write(compressed)
-                current_offset = f.tell()
             
-            # Write data layers
-            if self.data_layers:
-                self.header.data_layers_offset = current_offset
-                layers_json = json.dumps(self.data_layers).encode('utf-8')
-                if self.adaptive_compression:
-                    compressed, chosen = adaptive_compress(layers_json, data_type='json')
-                    f.write(struct.pack('<IB', len(compressed), chosen.value))
-                    f.write(compressed)
-                else:
-                    compressor = CompressionType.get_compressor(self.data_layers_compression)
-                    compressed = compressor(layers_json)
-                    f.write(struct.pack('<IB', len(compressed), self.data_layers_compression.value))
-                    f.write(compressed)
-                current_offset = f.tell()
+            if self.layout not in SECTION_ORDERS:
+                raise ValueError(f"Unknown layout: {self.layout}")
+            for name in SECTION_ORDERS[self.layout]:
+                getattr(self, f'_write_{name}_section')(f)
             
             # Go back and update header with final offsets
             f.seek(0)
@@ -0,0 +1,23 @@
+"""
+File helpers shared by the editor and the bundle writer
+"""
+from .format_spec import FormatError
+
+# Read size used when copying stored bytes between files
+COPY_CHUNK = 1024 * 1024
+
+
+def copy_bytes(src, dst, size: int, what: str = 'data') -> None:
+    """Copy ``size`` bytes from ``src`` to ``dst`` in ``COPY_CHUNK`` pieces.
+
+    ``what`` names the copied item in the error raised when ``src`` ends early.
+    """
+    while size > 0:
+        chunk = src.read(min(COPY_CHUNK, size))
+        if not chunk:
+            raise FormatError(f"Unexpected end of file while copying {what}")
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+__all__ = ['copy_bytes', 'COPY_CHUNK']
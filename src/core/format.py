@@ -1,9 +1,7 @@
 """Format definitions for K2SHBWI."""
 
 from enum import Enum
-from typing import Callable
-import zlib
-from .errors import CompressionError
+from typing import Any, Callable, Optional
 
 class CompressionType(Enum):
     """Available compression types."""
@@ -12,100 +10,27 @@ class CompressionType(Enum):
     BROTLI = 2
     LZMA = 3
     ZSTD = 4
+    ZSTD_DICT = 5  # zstd with the file's trained dictionary (header dictionary_id)
 
     @classmethod
-    def get_compressor(cls, comp_type: 'CompressionType') -> Callable[[bytes], bytes]:
-        """Get the compression function for the given type"""
-        # Type validation
-        if not isinstance(comp_type, cls):
-            raise ValueError(f"Unsupported compression type: {comp_type}")
-
-        # Handle compression types
-        if comp_type == cls.NONE:
-            return lambda x: x
-
-        elif comp_type == cls.ZLIB:
-            return zlib.compress
-
-        elif comp_type == cls.BROTLI:
-            try:
-                import brotli
-                return brotli.compress
-            except ImportError:
-                raise CompressionError(
-                    "brotli library is not installed. Install with: pip install brotli"
-                )
-
-        elif comp_type == cls.LZMA:
-            try:
-                import lzma
-                return lzma.compress
-            except ImportError:
-                raise CompressionError(
-                    "lzma library is not available in this Python installation"
-                )
-
-        elif comp_type == cls.ZSTD:
-            try:
-                import zstandard as zstd
-                def zstd_compress(b: bytes) -> bytes:
-                    cctx = zstd.ZstdCompressor()
-                    return cctx.compress(b)
-                return zstd_compress
-            except ImportError:
-                raise CompressionError(
-                    "zstandard library is not installed. Install with: pip install zstandard"
-                )
-
-        # Default handler for unknown types
-        return lambda x: x
+    def get_compressor(cls, comp_type: 'CompressionType', level: Optional[int] = None,
+                       dict_data: Any = None) -> Callable[[bytes], bytes]:
+        """Get the compression function for the given type
+
+        ``level`` is passed to the backend when given (zlib level, brotli
+        quality, lzma preset, zstd level); None uses the backend default.
+        ``dict_data`` is the zstd dictionary required by ZSTD_DICT.
+        Backend contexts are cached per thread by ``codecs``.
+        """
+        from .codecs import get_compressor
+        return get_compressor(comp_type, level, dict_data)
 
     @classmethod
-    def get_decompressor(cls, comp_type: 'CompressionType') -> Callable[[bytes], bytes]:
+    def get_decompressor(cls, comp_type: 'CompressionType',
+                         dict_data: Any = None) -> Callable[[bytes], bytes]:
         """Get the decompression function for the given type"""
-        # Type validation
-        if not isinstance(comp_type, cls):
-            raise ValueError(f"Unsupported compression type: {comp_type}")
-
-        # Handle decompression types
-        if comp_type == cls.NONE:
-            return lambda x: x
-
-        elif comp_type == cls.ZLIB:
-            return zlib.decompress
-
-        elif comp_type == cls.BROTLI:
-            try:
-                import brotli
-                return brotli.decompress
-            except ImportError:
-                raise CompressionError(
-                    "brotli library is not installed. Install with: pip install brotli"
-                )
-
-        elif comp_type == cls.LZMA:
-            try:
-                import lzma
-                return lzma.decompress
-            except ImportError:
-                raise CompressionError(
-                    "lzma library is not available in this Python installation"
-                )
-
-        elif comp_type == cls.ZSTD:
-            try:
-                import zstandard as zstd
-                def zstd_decompress(b: bytes) -> bytes:
-                    dctx = zstd.ZstdDecompressor()
-                    return dctx.decompress(b)
-                return zstd_decompress
-            except ImportError:
-                raise CompressionError(
-                    "zstandard library is not installed. Install with: pip install zstandard"
-                )
-
-        # Default handler for unknown types
-        return lambda x: x
+        from .codecs import get_decompressor
+        return get_decompressor(comp_type, dict_data)
 
 
 class ImageFormat(Enum):
@@ -8,14 +8,18 @@ File Structure:
         - Version (4 bytes)
         - Feature flags (2 bytes)
         - Section offsets (32 bytes)
-        - Reserved (16 bytes)
+        - zstd dictionary id (4 bytes, 0 = none)
+        - Reserved (10 bytes)
     - Metadata Section
         - Length (4 bytes)
         - Compression type (1 byte)
         - Compressed JSON data
     - Image Pyramid
+        - Length (4 bytes)
+        - Container marker (1 byte, 0x7E indexed / 0x7F legacy linear)
         - Number of levels (1 byte)
-        - Level data
+        - Level directory (21 bytes per level, indexed containers only)
+        - Level data (one encoded image, or a tile grid for tiled levels)
     - Hotspot Map
         - Length (4 bytes)
         - Compression type (1 byte)
@@ -23,7 +27,8 @@ File Structure:
     - Data Layers
         - Length (4 bytes)
         - Compression type (1 byte)
-        - Compressed JSON data
+        - Compressed JSON data, or (indexed layout) a layer index followed
+          by one compressed JSON record per layer
 """
 
 from enum import Enum, auto
@@ -40,11 +45,60 @@ CURRENT_VERSION_MINOR = 0
 
 # File format constants
 HEADER_SIZE = 56
+# magic, version major/minor, flags, 4 section offsets, dictionary id, reserved
+# (files written before dictionary support have zeros in the dictionary id)
+HEADER_FORMAT = '<4sHHHQQQQI10s'
 MIN_IMAGE_SIZE = 512  # Minimum image dimension
 MAX_IMAGE_SIZE = 16384  # Maximum image dimension
 MAX_METADATA_SIZE = 1024 * 1024  # 1MB
 MAX_HOTSPOTS = 1000  # Maximum number of hotspots per image
 
+# Image pyramid container markers (first byte of the image section payload)
+PYRAMID_MARKER_LINEAR = 0x7F   # Legacy: consecutive (level header, payload) records
+PYRAMID_MARKER_INDEXED = 0x7E  # Level directory up front, payloads follow
+
+# Level directory entry of an indexed pyramid container:
+#   level_id (1), width (4), height (4), format (1), quality (1),
+#   comp_type (1), flags (1, reserved), offset (4), length (4)
+# Offsets are relative to the start of the container (the marker byte).
+# Several entries may point at the same payload (deduplicated levels).
+PYRAMID_DIRECTORY_ENTRY = struct.Struct('<BIIBBBBII')
+
+# Level directory flags
+PYRAMID_LEVEL_TILED = 0x01  # Level payload is a tile grid (see below)
+
+# Tiled level payload: tile_width (2), tile_height (2), cols (2), rows (2)
+# followed by a row-major tile index and the tile payloads. Each index entry
+# is comp_type (1), format (1), offset (4, from the start of the level
+# payload), length (4). The directory comp_type of a tiled level is NONE.
+PYRAMID_TILE_HEADER = struct.Struct('<HHHH')
+PYRAMID_TILE_ENTRY = struct.Struct('<BBII')
+
+# Indexed data-layer section (stored with section comp_type NONE): magic,
+# layer count and index byte length, then one index entry per layer -
+# id length (2) + UTF-8 id, followed by comp_type (1), offset (4, from the
+# start of the section payload), length (4) - then the separately
+# compressed JSON records.
+DATA_LAYERS_INDEXED_MAGIC = b'K2DL'
+DATA_LAYER_INDEX_HEADER = struct.Struct('<4sII')
+DATA_LAYER_ID_LENGTH = struct.Struct('<H')
+DATA_LAYER_ENTRY = struct.Struct('<BII')
+
+# Bundle container (see core.bundle): header (magic, version), then complete
+# K2SHBWI files back to back, then the central directory and a fixed-size
+# trailer at the end of the file. Directory entries are name length (2) +
+# UTF-8 name, followed by offset (8, from the start of the bundle), length
+# (8) and a summary of the entry header: version major (2), version minor
+# (2), feature flags (2), dictionary id (4). The trailer holds the
+# directory offset (8), entry count (4), directory length (4) and magic.
+BUNDLE_MAGIC = b'K2SB'
+BUNDLE_TRAILER_MAGIC = b'K2SE'
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct('<4sH2x')
+BUNDLE_NAME_LENGTH = struct.Struct('<H')
+BUNDLE_ENTRY = struct.Struct('<QQHHHI')
+BUNDLE_TRAILER = struct.Struct('<QII4s')
+
 class K2SHBWIError(Exception):
     """Base exception for all K2SHBWI-related errors"""
     pass
@@ -61,6 +115,10 @@ class FormatError(K2SHBWIError):
     """Raised when file format is invalid"""
     pass
 
+class DecompressionLimitError(FormatError):
+    """Raised when a section decompresses to more than the allowed size"""
+    pass
+
 # CompressionType is defined centrally in src/core/format.py. Import it
 # here to avoid duplicate definitions and potential inconsistencies.
 
@@ -103,6 +161,8 @@ class K2SHBWIHeader:
         self.image_pyramid_offset: int = 0
         self.hotspot_map_offset: int = 0
         self.data_layers_offset: int = 0
+        # Id of the zstd dictionary used by ZSTD_DICT sections (0 = none)
+        self.dictionary_id: int = 0
         
     def validate(self) -> bool:
         """
@@ -160,9 +220,10 @@ class K2SHBWIHeader:
             # H   -> version_minor (2)
             # H   -> flags (2)
             # Q*4 -> offsets (32)
-            # 14s -> reserved (14)  => total 56
+            # I   -> dictionary_id (4)
+            # 10s -> reserved (10)  => total 56
             return struct.pack(
-                '<4sHHHQQQQ14s',
+                HEADER_FORMAT,
                 MAGIC_BYTES,
                 self.version_major,
                 self.version_minor,
@@ -171,7 +232,8 @@ class K2SHBWIHeader:
                 self.image_pyramid_offset,
                 self.hotspot_map_offset,
                 self.data_layers_offset,
-                b'\x00' * 14  # Reserved bytes (14 to keep header 56 bytes)
+                self.dictionary_id,
+                b'\x00' * 10  # Reserved bytes (10 to keep header 56 bytes)
             )
         except struct.error as e:
             raise FormatError(f"Failed to pack header: {e}")
@@ -195,8 +257,8 @@ class K2SHBWIHeader:
             raise ValidationError(f"Header too small: {len(data)} bytes")
             
         try:
-            magic, major, minor, flags_val, meta_off, img_off, hot_off, data_off, _ = struct.unpack(
-                '<4sHHHQQQQ14s', data[:HEADER_SIZE]
+            magic, major, minor, flags_val, meta_off, img_off, hot_off, data_off, dict_id, _ = struct.unpack(
+                HEADER_FORMAT, data[:HEADER_SIZE]
             )
         except struct.error as e:
             raise FormatError(f"Failed to unpack header: {e}")
@@ -212,6 +274,7 @@ class K2SHBWIHeader:
         header.image_pyramid_offset = img_off
         header.hotspot_map_offset = hot_off
         header.data_layers_offset = data_off
+        header.dictionary_id = dict_id
         
         # Validate the unpacked header
         header.validate()
@@ -283,6 +346,10 @@ class K2SHBWIMetadata:
 
     def __init__(self):
         self.compression_type: CompressionType = CompressionType.ZLIB
+        # Backend compression level (None = backend default)
+        self.compression_level: Optional[int] = None
+        # zstd dictionary used when compression_type is ZSTD_DICT
+        self.dictionary: Any = None
         self.data: Dict[str, Any] = {
             'title': '',
             'author': '',
@@ -342,7 +409,8 @@ class K2SHBWIMetadata:
 
         try:
             raw = json.dumps(self.data, separators=(',', ':')).encode('utf-8')
-            compressor = CompressionType.get_compressor(self.compression_type)
+            compressor = CompressionType.get_compressor(self.compression_type, self.compression_level,
+                                                     self.dictionary)
             compressed = compressor(raw)
             header = struct.pack('<IB', len(compressed), self.compression_type.value)
             return header + compressed, len(header) + len(compressed)
@@ -350,22 +418,34 @@ class K2SHBWIMetadata:
             raise CompressionError(f'Failed to pack metadata: {e}')
 
     @classmethod
-    def unpack(cls, data: bytes) -> 'K2SHBWIMetadata':
+    def unpack(cls, data: bytes, dictionary: Any = None,
+               max_size: Optional[int] = None) -> 'K2SHBWIMetadata':
         """Unpack metadata from raw bytes and return a K2SHBWIMetadata instance.
 
         Expects first 5 bytes to be: <I (length)><B (compression type)> followed by compressed payload.
+        ``dictionary`` is the zstd dictionary needed for ZSTD_DICT payloads.
+        ``max_size`` bounds the decompressed size (DecompressionLimitError).
         """
         try:
             length, comp_val = struct.unpack('<IB', data[:5])
             payload = data[5:5+length]
             comp_type = CompressionType(comp_val)
-            decompressor = CompressionType.get_decompressor(comp_type)
-            raw = decompressor(payload)
+            if comp_type != CompressionType.ZSTD_DICT:
+                dictionary = None
+            if max_size is not None:
+                from .codecs import decompress_bounded
+                raw = decompress_bounded(comp_type, payload, max_size, dictionary)
+            else:
+                decompressor = CompressionType.get_decompressor(comp_type, dictionary)
+                raw = decompressor(payload)
             inst = cls()
             inst.compression_type = comp_type
+            inst.dictionary = dictionary
             inst.data = json.loads(raw)
             inst.validate()
             return inst
+        except DecompressionLimitError:
+            raise
         except Exception as e:
             raise FormatError(f'Failed to unpack metadata: {e}')
 
@@ -0,0 +1,317 @@
+"""
+Binary columnar hotspot encoding for K2SHBWI
+
+The default hotspot section is ``json.dumps(hotspots)``. Large maps take
+seconds to parse that way, and parsing creates nested dicts for every
+hotspot. This module stores the same list column by column. The decoder can
+read it straight into NumPy arrays, which ``HotspotMapper.from_arrays``
+indexes without building one Python object per hotspot.
+
+Section payload (before section compression), little-endian:
+    - Magic ``HSB1`` (4 bytes)
+    - Hotspot count (4 bytes)
+    - Coordinate dtype (1 byte: 0 = int32, 1 = float64) + 3 reserved bytes
+    - Number of coordinate values (4 bytes)
+    - String table: count (4), byte length (4)
+    - Payload table: count (4), byte length (4)
+    - Columns (one entry per hotspot unless noted):
+        - coord_offsets: uint32[count + 1] into the coordinate values
+        - values: int32/float64[n_values], coordinates flattened
+        - coord_kind: uint8 (0 = flat numbers, 1 = list of (x, y) points)
+        - id: uint32 string index (NO_INDEX = absent)
+        - shape: uint32 string index (NO_INDEX = absent)
+        - priority: int32
+        - flag_values: uint8 (visible, clickable, hoverable, lazy_load bits)
+        - flag_present: uint8 (same bits, plus PRIORITY_PRESENT and
+          NESTED_FIELDS)
+        - payload: uint32 payload index (NO_INDEX = no other fields)
+    - String table: uint32 offsets[count + 1] + UTF-8 bytes
+    - Payload table: uint32 offsets[count + 1] + JSON bytes
+
+``K2SHBWIBuilder`` stores id, shape, flags and priority inside the
+hotspot's ``data`` dict rather than at the top level. When a hotspot has
+none of these fields at the top level, they are read from ``data``
+instead and the NESTED_FIELDS bit records that they go back there on
+decode.
+
+Strings (ids, shape names) and payloads (every other field of a hotspot as
+compact JSON, usually ``{"data": ...}``) are interned. Identical values are
+stored once. Coordinates are int32 when every value is an integer that fits,
+otherwise float64 (integers then decode as floats).
+"""
+import json
+import struct
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+HOTSPOT_BINARY_MAGIC = b'HSB1'
+_HEADER = struct.Struct('<4sIB3xIIIII')
+NO_INDEX = 0xFFFFFFFF
+
+COORDS_FLAT = 0
+COORDS_POINTS = 1
+
+# Boolean columns, as (field name, bit)
+FLAG_FIELDS = (('visible', 0x01), ('clickable', 0x02), ('hoverable', 0x04), ('lazy_load', 0x08))
+PRIORITY_PRESENT = 0x80
+# The column fields of this hotspot belong inside its 'data' dict
+NESTED_FIELDS = 0x40
+
+_COLUMN_FIELDS = {'id', 'shape', 'coords', 'priority'} | {name for name, _ in FLAG_FIELDS}
+_LIFTED_FIELDS = _COLUMN_FIELDS - {'coords'}
+_COLUMN_TYPES = {'id': 'a string', 'shape': 'a string', 'priority': 'an int'}
+
+
+@dataclass
+class HotspotArrays:
+    """Columnar hotspot table as decoded from a binary hotspot section."""
+    coord_offsets: 'np.ndarray'
+    values: 'np.ndarray'
+    coord_kind: 'np.ndarray'
+    id_index: 'np.ndarray'
+    shape_index: 'np.ndarray'
+    priority: 'np.ndarray'
+    flag_values: 'np.ndarray'
+    flag_present: 'np.ndarray'
+    payload_index: 'np.ndarray'
+    strings: List[str]
+    payload_blob: bytes
+    payload_offsets: 'np.ndarray'
+
+    def __len__(self) -> int:
+        return len(self.coord_kind)
+
+    def coords(self, i: int) -> Any:
+        """Coordinates of hotspot ``i`` (flat list or list of [x, y] points)."""
+        vals = self.values[self.coord_offsets[i]:self.coord_offsets[i + 1]].tolist()
+        if self.coord_kind[i] == COORDS_POINTS:
+            return [vals[j:j + 2] for j in range(0, len(vals), 2)]
+        return vals
+
+    def string(self, index_column: 'np.ndarray', i: int) -> Optional[str]:
+        idx = int(index_column[i])
+        return None if idx == NO_INDEX else self.strings[idx]
+
+    def payload(self, i: int) -> Dict[str, Any]:
+        """Non-columnar fields of hotspot ``i`` (parsed on demand)."""
+        idx = int(self.payload_index[i])
+        if idx == NO_INDEX:
+            return {}
+        start, end = self.payload_offsets[idx], self.payload_offsets[idx + 1]
+        return json.loads(self.payload_blob[start:end])
+
+    def columns(self, i: int) -> Dict[str, Any]:
+        """Id, shape, flags and priority of hotspot ``i`` (only those present)."""
+        fields: Dict[str, Any] = {}
+        hid = self.string(self.id_index, i)
+        if hid is not None:
+            fields['id'] = hid
+        shape = self.string(self.shape_index, i)
+        if shape is not None:
+            fields['shape'] = shape
+        present, values = int(self.flag_present[i]), int(self.flag_values[i])
+        for name, bit in FLAG_FIELDS:
+            if present & bit:
+                fields[name] = bool(values & bit)
+        if present & PRIORITY_PRESENT:
+            fields['priority'] = int(self.priority[i])
+        return fields
+
+    def is_nested(self, i: int) -> bool:
+        """True if the column fields of hotspot ``i`` live in its ``data``."""
+        return bool(int(self.flag_present[i]) & NESTED_FIELDS)
+
+    def to_dict(self, i: int) -> Dict[str, Any]:
+        """Rebuild hotspot ``i`` as the dict it was encoded from."""
+        fields = self.columns(i)
+        if self.is_nested(i):
+            hotspot: Dict[str, Any] = {'coords': self.coords(i)}
+            hotspot.update(self.payload(i))
+            hotspot['data'].update(fields)
+            return hotspot
+        hotspot = {k: fields[k] for k in ('id',) if k in fields}
+        hotspot['coords'] = self.coords(i)
+        hotspot.update((k, v) for k, v in fields.items() if k != 'id')
+        hotspot.update(self.payload(i))
+        return hotspot
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [self.to_dict(i) for i in range(len(self))]
+
+
+class _Interner:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.items: List[bytes] = []
+
+    def add(self, value: str) -> int:
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.items)
+            self.items.append(value.encode('utf-8'))
+        return idx
+
+    def pack(self) -> bytes:
+        import numpy as np
+        offsets = np.zeros(len(self.items) + 1, dtype='<u4')
+        offsets[1:] = np.cumsum([len(b) for b in self.items], dtype=np.uint64)
+        return offsets.tobytes() + b''.join(self.items)
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _flatten_coords(coords: Any):
+    """Return (kind, flat values) or raise ValueError for unsupported coords."""
+    coords = list(coords)
+    if coords and all(_is_number(v) for v in coords):
+        return COORDS_FLAT, coords
+    if coords and all(isinstance(p, (list, tuple)) and len(p) == 2 and all(_is_number(v) for v in p)
+                      for p in coords):
+        return COORDS_POINTS, [v for p in coords for v in p]
+    raise ValueError(f"Unsupported hotspot coords for binary encoding: {coords!r}")
+
+
+def _column_source(hotspot: Dict[str, Any]):
+    """Dict the column fields of ``hotspot`` are read from, and whether it is ``data``."""
+    data = hotspot.get('data')
+    if isinstance(data, dict) and not any(name in hotspot for name in _LIFTED_FIELDS) \
+            and any(name in data for name in _LIFTED_FIELDS):
+        return data, True
+    return hotspot, False
+
+
+def _column_value_ok(name: str, value: Any) -> bool:
+    if name in ('id', 'shape'):
+        return isinstance(value, str)
+    if name == 'priority':
+        return isinstance(value, int) and not isinstance(value, bool) and -2**31 <= value < 2**31
+    return isinstance(value, bool)
+
+
+def encode_hotspots(hotspots: Sequence[Dict[str, Any]]) -> bytes:
+    """Encode a hotspot list into the binary columnar layout.
+
+    Raises ValueError for hotspots the layout cannot represent exactly
+    (non-numeric or empty coords, non-string ids/shapes, non-bool flags).
+    Fields read from ``data`` (see ``NESTED_FIELDS``) that do not fit a
+    column are left in the payload instead.
+    """
+    import numpy as np
+    n = len(hotspots)
+    strings, payloads = _Interner(), _Interner()
+    values: List[Any] = []
+    offsets = np.zeros(n + 1, dtype='<u4')
+    kind = np.zeros(n, dtype='u1')
+    id_index = np.full(n, NO_INDEX, dtype='<u4')
+    shape_index = np.full(n, NO_INDEX, dtype='<u4')
+    priority = np.zeros(n, dtype='<i4')
+    flag_values = np.zeros(n, dtype='u1')
+    flag_present = np.zeros(n, dtype='u1')
+    payload_index = np.full(n, NO_INDEX, dtype='<u4')
+
+    for i, h in enumerate(hotspots):
+        kind[i], flat = _flatten_coords(h['coords'])
+        values.extend(flat)
+        offsets[i + 1] = len(values)
+        source, nested = _column_source(h)
+        lifted = set()
+        for name in _LIFTED_FIELDS:
+            if name not in source:
+                continue
+            if not _column_value_ok(name, source[name]):
+                if nested:
+                    continue
+                expected = _COLUMN_TYPES.get(name, 'a bool')
+                raise ValueError(f"Hotspot {name} must be {expected} for binary encoding")
+            lifted.add(name)
+        for name, column in (('id', id_index), ('shape', shape_index)):
+            if name in lifted:
+                column[i] = strings.add(source[name])
+        for name, bit in FLAG_FIELDS:
+            if name in lifted:
+                flag_present[i] |= bit
+                if source[name]:
+                    flag_values[i] |= bit
+        if 'priority' in lifted:
+            priority[i] = source['priority']
+            flag_present[i] |= PRIORITY_PRESENT
+        rest = {k: v for k, v in h.items() if k not in _COLUMN_FIELDS}
+        if nested:
+            flag_present[i] |= NESTED_FIELDS
+            rest['data'] = {k: v for k, v in source.items() if k not in lifted}
+        if rest:
+            payload_index[i] = payloads.add(json.dumps(rest, separators=(',', ':')))
+
+    is_int = all(isinstance(v, int) and -2**31 <= v < 2**31 for v in values)
+    coord_array = np.asarray(values, dtype='<i4' if is_int else '<f8')
+
+    string_table, payload_table = strings.pack(), payloads.pack()
+    header = _HEADER.pack(HOTSPOT_BINARY_MAGIC, n, 0 if is_int else 1, len(values),
+                          len(strings.items), len(string_table),
+                          len(payloads.items), len(payload_table))
+    return b''.join((header, offsets.tobytes(), coord_array.tobytes(), kind.tobytes(),
+                     id_index.tobytes(), shape_index.tobytes(), priority.tobytes(),
+                     flag_values.tobytes(), flag_present.tobytes(), payload_index.tobytes(),
+                     string_table, payload_table))
+
+
+def is_binary_hotspots(data: bytes) -> bool:
+    return bytes(data[:4]) == HOTSPOT_BINARY_MAGIC
+
+
+def decode_hotspot_arrays(data: bytes) -> HotspotArrays:
+    """Decode a binary hotspot section into columnar arrays (no per-hotspot objects)."""
+    import numpy as np
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated binary hotspot section")
+    magic, n, dtype_code, n_values, n_strings, strings_len, n_payloads, payloads_len = \
+        _HEADER.unpack_from(data)
+    if magic != HOTSPOT_BINARY_MAGIC:
+        raise ValueError(f"Invalid binary hotspot magic: {magic!r}")
+
+    pos = _HEADER.size
+
+    def column(dtype, count):
+        nonlocal pos
+        arr = np.frombuffer(data, dtype=dtype, count=count, offset=pos)
+        pos += arr.nbytes
+        return arr
+
+    try:
+        coord_offsets = column('<u4', n + 1)
+        values = column('<i4' if dtype_code == 0 else '<f8', n_values)
+        coord_kind = column('u1', n)
+        id_index = column('<u4', n)
+        shape_index = column('<u4', n)
+        priority = column('<i4', n)
+        flag_values = column('u1', n)
+        flag_present = column('u1', n)
+        payload_index = column('<u4', n)
+        string_offsets = column('<u4', n_strings + 1)
+        string_start = pos
+        pos += strings_len - string_offsets.nbytes
+        payload_offsets = column('<u4', n_payloads + 1)
+    except ValueError as e:
+        raise ValueError(f"Truncated binary hotspot section: {e}")
+    payload_blob = bytes(data[pos:pos + payloads_len - payload_offsets.nbytes])
+
+    string_blob = bytes(data[string_start:string_start + string_offsets[-1]])
+    strings = [string_blob[string_offsets[i]:string_offsets[i + 1]].decode('utf-8')
+               for i in range(n_strings)]
+    return HotspotArrays(coord_offsets, values, coord_kind, id_index, shape_index, priority,
+                         flag_values, flag_present, payload_index, strings, payload_blob,
+                         payload_offsets)
+
+
+def decode_hotspots(data: bytes) -> List[Dict[str, Any]]:
+    """Decode a binary hotspot section into the usual list of dicts."""
+    return decode_hotspot_arrays(data).to_list()
+
+
+__all__ = ['HotspotArrays', 'encode_hotspots', 'decode_hotspots', 'decode_hotspot_arrays',
+           'is_binary_hotspots', 'HOTSPOT_BINARY_MAGIC']
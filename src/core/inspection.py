@@ -0,0 +1,242 @@
+"""
+Fast inspection of K2SHBWI files
+
+``stat_k2sh`` describes a file without decoding it. It reads the header,
+the length prefix of each section and the pyramid level directory, all
+through one open file handle with a few small reads. Image payloads are
+never read or decompressed. Metadata is decoded only when asked for
+(``include_metadata=True``). Binary hotspot sections store their count in
+the column header, so only the start of the section is decompressed; JSON
+sections are only decompressed and parsed to count their hotspots when
+asked for (``count_hotspots=True``). Data layers are never decoded.
+"""
+import io
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from .codecs import iter_decompress
+from .decoder import K2SHBWIDecoder, _MAX_DIRECTORY_READ, parse_pyramid_directory, walk_linear_pyramid
+from .hotspot_codec import is_binary_hotspots
+from .format_spec import (
+    CompressionType,
+    DATA_LAYER_INDEX_HEADER,
+    DATA_LAYERS_INDEXED_MAGIC,
+    FeatureFlags,
+    FormatError,
+    HEADER_SIZE,
+    K2SHBWIHeader,
+    K2SHBWIMetadata,
+    PYRAMID_MARKER_INDEXED,
+    PYRAMID_MARKER_LINEAR,
+)
+
+# Pyramid level format codes (see K2SHBWIEncoder.pyramid_level_formats)
+LEVEL_FORMATS = {0: 'PNG', 1: 'JPEG', 2: 'WEBP'}
+# Bytes read to identify a single (non-pyramid) image blob
+_IMAGE_SNIFF_SIZE = 64 * 1024
+
+_SECTIONS = (
+    ('metadata', FeatureFlags.HAS_METADATA, 'metadata_offset'),
+    ('image', FeatureFlags.HAS_IMAGE_PYRAMID, 'image_pyramid_offset'),
+    ('hotspots', FeatureFlags.HAS_HOTSPOTS, 'hotspot_map_offset'),
+    ('data_layers', FeatureFlags.HAS_DATA_LAYERS, 'data_layers_offset'),
+)
+
+
+def _codec_name(value: int) -> str:
+    try:
+        return CompressionType(value).name
+    except ValueError:
+        return f'unknown({value})'
+
+
+def stat_k2sh(path: Union[str, Path], include_metadata: bool = False,
+              dictionary_store: Any = None, base_offset: int = 0,
+              count_hotspots: bool = False) -> Dict[str, Any]:
+    """Describe a K2SHBWI file from its header and section prefixes.
+
+    Returns a dict with ``file_size``, ``version``, ``flags``, ``features``
+    (names of the set feature flags), ``dictionary_id`` and ``sections``.
+    ``sections`` maps each present section to its offset, stored payload
+    size and codec. An image section also has a ``container`` kind, plus
+    ``levels`` (dimensions, format, codec and stored size of each pyramid
+    level) or, for a single image blob, the ``format``, ``width`` and
+    ``height`` read from the image header. With ``include_metadata=True``
+    the decoded metadata is added under ``metadata``. A binary hotspot
+    section gets a ``count``; a JSON one only with ``count_hotspots=True``.
+    ZSTD_DICT sections need ``dictionary_store``. ``base_offset`` locates an
+    entry inside a bundle.
+    """
+    with open(path, 'rb') as f:
+        def read(offset: int, size: int) -> bytes:
+            f.seek(base_offset + offset)
+            return f.read(size)
+
+        header = K2SHBWIHeader.unpack(read(0, HEADER_SIZE))
+        info: Dict[str, Any] = {
+            'path': str(path),
+            'file_size': os.fstat(f.fileno()).st_size - base_offset,
+            'version': f'{header.version_major}.{header.version_minor}',
+            'flags': header.flags,
+            'features': [flag.name for flag in FeatureFlags if header.flags & flag.value],
+            'dictionary_id': header.dictionary_id,
+            'sections': {},
+        }
+
+        for name, flag, attr in _SECTIONS:
+            if not header.has_feature(flag):
+                continue
+            offset = getattr(header, attr)
+            if name == 'image':
+                info['sections'][name] = _stat_image(read, offset)
+                continue
+            head = read(offset, 5 + DATA_LAYER_INDEX_HEADER.size)
+            if len(head) < 5:
+                raise FormatError(f"Truncated {name} header")
+            length, comp_val = struct.unpack_from('<IB', head)
+            section = {'offset': offset, 'size': length, 'compression': _codec_name(comp_val)}
+            if name == 'data_layers' and head[5:9] == DATA_LAYERS_INDEXED_MAGIC:
+                _, count, _ = DATA_LAYER_INDEX_HEADER.unpack_from(head, 5)
+                section.update(indexed=True, layer_count=count)
+            info['sections'][name] = section
+
+        if include_metadata and header.has_feature(FeatureFlags.HAS_METADATA):
+            size = info['sections']['metadata']['size']
+            frame = read(header.metadata_offset, 5 + size)
+            dictionary = None
+            if frame[4] == CompressionType.ZSTD_DICT.value:
+                dictionary = _dictionary(header, dictionary_store)
+            info['metadata'] = K2SHBWIMetadata.unpack(frame, dictionary).data
+
+        hotspots = info['sections'].get('hotspots')
+        if hotspots is not None:
+            count = _count_hotspots(read, header, hotspots['size'], dictionary_store, count_hotspots)
+            if count is not None:
+                hotspots['count'] = count
+    return info
+
+
+def _dictionary(header: K2SHBWIHeader, dictionary_store: Any) -> Any:
+    decoder = K2SHBWIDecoder(dictionary_store=dictionary_store)
+    decoder.header = header
+    return decoder.resolve_dictionary()
+
+
+def _count_hotspots(read, header: K2SHBWIHeader, size: int, dictionary_store: Any,
+                    parse_json: bool) -> Optional[int]:
+    """Number of hotspots, or None when finding it out is not cheap.
+
+    A binary section stores the count after its magic, so only the first
+    decompressed bytes are needed. A JSON section is decompressed and
+    parsed in full, and only when ``parse_json`` is set.
+    """
+    frame = read(header.hotspot_map_offset, 5 + size)
+    try:
+        comp_type = CompressionType(frame[4])
+    except ValueError:
+        return None
+    dictionary = None
+    if comp_type == CompressionType.ZSTD_DICT:
+        if dictionary_store is None and not parse_json:
+            return None
+        dictionary = _dictionary(header, dictionary_store)
+    chunks = iter_decompress(comp_type, frame[5:], dict_data=dictionary)
+    head = b''
+    for chunk in chunks:
+        head += bytes(chunk)
+        if len(head) >= 8:
+            break
+    if is_binary_hotspots(head):
+        return struct.unpack_from('<I', head, 4)[0]
+    if not parse_json:
+        return None
+    return len(json.loads(head + b''.join(bytes(chunk) for chunk in chunks)))
+
+
+def _stat_image(read, offset: int) -> Dict[str, Any]:
+    head = read(offset, 4)
+    if len(head) < 4:
+        raise FormatError("Truncated image header")
+    (size,) = struct.unpack('<I', head)
+    base = offset + 4
+    section: Dict[str, Any] = {'offset': offset, 'size': size, 'compression': CompressionType.NONE.name}
+
+    head = read(base, min(size, _MAX_DIRECTORY_READ))
+    if len(head) >= 2 and head[0] == PYRAMID_MARKER_INDEXED:
+        entries, locations = parse_pyramid_directory(head, base, size)
+        section['container'] = 'pyramid'
+    elif len(head) >= 2 and head[0] == PYRAMID_MARKER_LINEAR:
+        entries, locations = walk_linear_pyramid(read, head[1], base)
+        section['container'] = 'linear_pyramid'
+    else:
+        section['container'] = 'image'
+        section.update(_sniff_image(read(base, min(size, _IMAGE_SNIFF_SIZE))))
+        return section
+
+    levels = []
+    for entry, location in zip(entries, locations):
+        levels.append({
+            'level_id': entry['level_id'],
+            'width': entry['width'],
+            'height': entry['height'],
+            'format': LEVEL_FORMATS.get(entry['format'], f"unknown({entry['format']})"),
+            'compression': _codec_name(location.comp_type),
+            'stored_bytes': location.length,
+            'tiled': entry['tiled'],
+        })
+    section['levels'] = levels
+    return section
+
+
+def _sniff_image(head: bytes) -> Dict[str, Optional[Any]]:
+    """Format and size from the start of an image blob.
+
+    PNG and JPEG headers are parsed directly. Other formats fall back to
+    PIL, which reads only the image header but costs a noticeable import.
+    """
+    size = _png_size(head) or _jpeg_size(head)
+    if size:
+        return size
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(head)) as img:
+            return {'format': img.format, 'width': img.width, 'height': img.height}
+    except Exception:
+        return {'format': None, 'width': None, 'height': None}
+
+
+def _png_size(head: bytes) -> Optional[Dict[str, Any]]:
+    if len(head) < 24 or head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack_from('>II', head, 16)
+    return {'format': 'PNG', 'width': width, 'height': height}
+
+
+def _jpeg_size(head: bytes) -> Optional[Dict[str, Any]]:
+    """Walk the JPEG marker segments up to the first start-of-frame."""
+    if head[:2] != b'\xff\xd8':
+        return None
+    pos = 2
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            return None
+        marker = head[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        (length,) = struct.unpack_from('>H', head, pos + 2)
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(head):
+                return None
+            height, width = struct.unpack_from('>HH', head, pos + 5)
+            return {'format': 'JPEG', 'width': width, 'height': height}
+        pos += 2 + length
+    return None
+
+
+__all__ = ['stat_k2sh', 'LEVEL_FORMATS']
@@ -0,0 +1,200 @@
+"""
+Incremental (streaming) decoding of K2SHBWI files
+
+``K2SHBWIStreamDecoder`` consumes a file as a sequence of byte chunks (an
+HTTP response, a socket) and reports each part as soon as all of its bytes
+have arrived. It works with any file. Files written with the encoder's
+``layout = 'progressive'`` give the best results. They store metadata,
+hotspots and the pyramid before the data layers, and they store level
+payloads smallest first. A reader can then show a thumbnail with working
+hotspots after receiving only a small prefix of the file.
+
+Events are ``(kind, value)`` tuples:
+    - ``('header', K2SHBWIHeader)``
+    - ``('metadata', dict)``
+    - ``('hotspots', list)``
+    - ``('pyramid', list)``: level entries (width, height, ...) once the
+      directory is known
+    - ``('level', dict)``: a level entry plus ``index`` and a PIL ``image``
+    - ``('image', PIL.Image)``: single-image (non-pyramid) files
+    - ``('data_layers', dict)``
+    - ``('done', None)``: every section has been decoded
+
+Usage:
+    stream = K2SHBWIStreamDecoder()
+    for chunk in response.iter_content(64 * 1024):
+        for kind, value in stream.feed(chunk):
+            if kind == 'level':
+                show(value['image'])
+"""
+import io
+import struct
+from typing import Any, Generator, List, Optional, Tuple
+
+from .decoder import K2SHBWIDecoder, _LazyPyramid
+from .format_spec import (
+    FeatureFlags,
+    FormatError,
+    HEADER_SIZE,
+    K2SHBWIHeader,
+    PYRAMID_DIRECTORY_ENTRY,
+    PYRAMID_MARKER_INDEXED,
+)
+
+Event = Tuple[str, Any]
+
+# A section reader yields the file size it needs before it can continue and
+# reports its results through K2SHBWIStreamDecoder._emit
+_SectionReader = Generator[int, None, None]
+
+
+class _BufferDecoder(K2SHBWIDecoder):
+    """Lazy decoder whose reads are served from the bytes received so far."""
+
+    def __init__(self, buffer: bytearray, dictionary_store: Any = None):
+        super().__init__(lazy=True, dictionary_store=dictionary_store)
+        self._buffer = buffer
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        return bytes(self._buffer[offset:offset + size])
+
+
+class K2SHBWIStreamDecoder:
+    """Decode a K2SHBWI file from chunks of bytes as they arrive."""
+
+    def __init__(self, dictionary_store: Any = None):
+        self._buffer = bytearray()
+        self._decoder = _BufferDecoder(self._buffer, dictionary_store)
+        self._readers: List[Tuple[int, _SectionReader]] = []
+        self._events: List[Tuple[int, Event]] = []
+        self._position = 0
+        self.header: Optional[K2SHBWIHeader] = None
+        self.done = False
+
+    @property
+    def decoder(self) -> K2SHBWIDecoder:
+        """Lazy decoder over the bytes received so far (sections complete
+        once their events have been reported)."""
+        return self._decoder
+
+    @property
+    def bytes_received(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, chunk: bytes) -> List[Event]:
+        """Append ``chunk`` and return the events it completed, in file order."""
+        if self.done:
+            if chunk:
+                raise FormatError("Data received after the end of the file")
+            return []
+        self._buffer.extend(chunk)
+        events: List[Event] = []
+        if self.header is None:
+            if len(self._buffer) < HEADER_SIZE:
+                return events
+            self.header = K2SHBWIHeader.unpack(bytes(self._buffer[:HEADER_SIZE]))
+            self._decoder.header = self.header
+            self._decoder._mark_unloaded()
+            self._start_readers()
+            events.append(('header', self.header))
+        events.extend(self._advance())
+        if not self._readers:
+            self.done = True
+            events.append(('done', None))
+        return events
+
+    def close(self) -> None:
+        """Check that the stream ended after a complete file."""
+        if not self.done:
+            raise FormatError(f"Stream ended after {len(self._buffer)} bytes, before the file was complete")
+
+    # ------------------------------------------------------------------
+    # Section readers
+    # ------------------------------------------------------------------
+    def _start_readers(self) -> None:
+        header = self.header
+        sections = (
+            (FeatureFlags.HAS_METADATA, self._framed('metadata', header.metadata_offset)),
+            (FeatureFlags.HAS_IMAGE_PYRAMID, self._image(header.image_pyramid_offset)),
+            (FeatureFlags.HAS_HOTSPOTS, self._framed('hotspots', header.hotspot_map_offset)),
+            (FeatureFlags.HAS_DATA_LAYERS, self._framed('data_layers', header.data_layers_offset)),
+        )
+        for flag, reader in sections:
+            if header.has_feature(flag):
+                self._readers.append((next(reader), reader))
+            else:
+                reader.close()
+
+    def _advance(self) -> List[Event]:
+        """Run every reader as far as the received bytes allow."""
+        self._events = []
+        waiting = []
+        for needed, reader in self._readers:
+            try:
+                while needed <= len(self._buffer):
+                    self._position = needed
+                    needed = next(reader)
+            except StopIteration:
+                continue
+            waiting.append((needed, reader))
+        self._readers = waiting
+        # Report events in the order their bytes appear in the file
+        self._events.sort(key=lambda item: item[0])
+        return [event for _, event in self._events]
+
+    def _emit(self, *events: Event) -> None:
+        self._events.extend((self._position, event) for event in events)
+
+    def _length_at(self, offset: int) -> int:
+        return struct.unpack('<I', self._buffer[offset:offset + 4])[0]
+
+    def _framed(self, name: str, offset: int) -> _SectionReader:
+        """Reader for a ``<I length><B comp_type>`` framed section."""
+        yield offset + 5
+        yield offset + 5 + self._length_at(offset)
+        self._emit((name, getattr(self._decoder, name)))
+
+    def _image(self, offset: int) -> _SectionReader:
+        """Reader for the image section; pyramid levels are reported one by one."""
+        yield offset + 4
+        size = self._length_at(offset)
+        base = offset + 4
+        yield base + min(size, 2)
+        decoder = self._decoder
+        if size < 2 or self._buffer[base] != PYRAMID_MARKER_INDEXED:
+            # Single image blob or legacy linear pyramid: needs the whole section
+            yield base + size
+            pyramid = decoder.image_pyramid
+            if not pyramid:
+                from PIL import Image
+                self._emit(('image', Image.open(io.BytesIO(decoder.image_data))))
+                return
+            entries = decoder.level_entries()
+            self._emit(('pyramid', entries))
+            by_size = sorted(range(len(entries)), key=lambda i: entries[i]['width'])
+            self._emit(*(('level', self._level_event(pyramid, i)) for i in by_size))
+            return
+
+        yield base + 2 + self._buffer[base + 1] * PYRAMID_DIRECTORY_ENTRY.size
+        pyramid = decoder.image_pyramid
+        self._emit(('pyramid', decoder.level_entries()))
+        # Levels become renderable in the order their payloads end;
+        # deduplicated levels share one payload
+        by_location = {}
+        for idx, location in enumerate(decoder.level_locations()):
+            by_location.setdefault(location, []).append(idx)
+        for location in sorted(by_location, key=lambda loc: loc.offset + loc.length):
+            yield location.offset + location.length
+            self._emit(*(('level', self._level_event(pyramid, idx)) for idx in by_location[location]))
+
+    @staticmethod
+    def _level_event(pyramid: _LazyPyramid, idx: int) -> dict:
+        from PIL import Image
+        entry = pyramid[idx]
+        event = {k: v for k, v in entry.items() if k != 'data'}
+        event['index'] = idx
+        event['image'] = Image.open(io.BytesIO(entry['data']))
+        return event
+
+
+__all__ = ['K2SHBWIStreamDecoder']
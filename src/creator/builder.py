@@ -31,14 +31,16 @@ class K2SHBWIBuilder:
         >>> stats = builder.build('output.k2sh')
     """
     
-    def __init__(self, config: Optional[Dict] = None):
+    def __init__(self, config: Optional[Dict] = None, max_workers: Optional[int] = None):
         """
         Initialize builder
         
         Args:
             config: Optional configuration dictionary
+            max_workers: Threads used to generate pyramid levels in parallel
+                (None = sequential)
         """
-        self.encoder = K2SHBWIEncoder()
+        self.encoder = K2SHBWIEncoder(max_workers=max_workers)
         self.compressor = MultiLevelCompressor()
         
         self.base_image = None
@@ -138,10 +140,14 @@ class K2SHBWIBuilder:
         
         self.base_image_path = image_path
         self.base_image = Image.open(image_path)
+        # Decode once; this raster is what the encoder receives
+        self.base_image.load()
         
-        # Convert to RGB if necessary
+        # Convert to RGB if necessary, keeping transparency (LA, PA, P with
+        # a transparent index) as RGBA
         if self.base_image.mode not in ('RGB', 'RGBA'):
-            self.base_image = self.base_image.convert('RGB')
+            has_alpha = 'A' in self.base_image.getbands() or 'transparency' in self.base_image.info
+            self.base_image = self.base_image.convert('RGBA' if has_alpha else 'RGB')
         
         # Auto-optimize if enabled
         should_optimize = (
@@ -152,7 +158,9 @@ class K2SHBWIBuilder:
         if should_optimize:
             self.optimize_image()
         
-        self.encoder.set_image(image_path)
+        # Hand the decoded (and optimized) raster to the encoder instead of
+        # letting it re-open and re-decode the file
+        self.encoder.set_image(self.base_image)
         
         return self
     
@@ -185,6 +193,9 @@ class K2SHBWIBuilder:
             ratio = max_dim / max(w, h)
             new_size = (int(w * ratio), int(h * ratio))
             self.base_image = self.base_image.resize(new_size, Image.Resampling.LANCZOS)
+            # Keep the encoder on the optimized raster when called after set_base_image
+            if self.encoder.image is not None:
+                self.encoder.set_image(self.base_image)
         
         # Apply perceptual optimization (quality='perceptual' would require external library)
         # For now, just keep the resized image
@@ -8,6 +8,8 @@ import numpy as np
 from dataclasses import dataclass
 import uuid
 
+from ..core.hotspot_codec import COORDS_POINTS, FLAG_FIELDS
+
 
 @dataclass
 class Hotspot:
@@ -136,6 +138,44 @@ class Hotspot:
         return 0
 
 
+def _hotspot_field(hotspot: Dict[str, Any], name: str, default: Any) -> Any:
+    """Field of a hotspot dict, falling back to its ``data`` (where the builder keeps it)."""
+    if name in hotspot:
+        return hotspot[name]
+    data = hotspot.get('data')
+    if isinstance(data, dict) and name in data:
+        return data[name]
+    return default
+
+
+def _array_bounding_boxes(arrays: Any) -> np.ndarray:
+    """Bounding boxes (n, 4) of columnar hotspot arrays, computed vectorized.
+
+    Flat coords are treated as (x, y) pairs, which gives the bounding box of
+    rectangles and polygons alike; circles (cx, cy, radius, _) are expanded
+    by their radius.
+    """
+    n = len(arrays)
+    if n == 0:
+        return np.zeros((0, 4))
+    starts = arrays.coord_offsets[:-1].astype(np.int64)
+    counts = np.diff(arrays.coord_offsets.astype(np.int64))
+    values = arrays.values.astype(np.float64)
+    even = (np.arange(values.size) - np.repeat(starts, counts)) % 2 == 0
+    bbox = np.column_stack([
+        np.minimum.reduceat(np.where(even, values, np.inf), starts),
+        np.minimum.reduceat(np.where(even, np.inf, values), starts),
+        np.maximum.reduceat(np.where(even, values, -np.inf), starts),
+        np.maximum.reduceat(np.where(even, -np.inf, values), starts),
+    ])
+    if 'circle' in arrays.strings:
+        circle = (arrays.shape_index == arrays.strings.index('circle')) & (counts >= 3)
+        cs = starts[circle]
+        cx, cy, r = values[cs], values[cs + 1], values[cs + 2]
+        bbox[circle] = np.column_stack([cx - r, cy - r, cx + r, cy + r])
+    return bbox
+
+
 class HotspotMapper:
     """
     Manages collection of hotspots with spatial indexing
@@ -151,12 +191,82 @@ class HotspotMapper:
         """
         self.image_width = image_width
         self.image_height = image_height
-        self.hotspots: List[Hotspot] = []
+        self._hotspots: List[Hotspot] = []
         self.hotspot_index: Dict[str, Hotspot] = {}
         
         # Spatial grid for fast lookup
         self.grid_size = 50
         self.grid = self._create_spatial_grid()
+        
+        # Columnar hotspots (see from_arrays); None for object-backed mappers
+        self._arrays = None
+        self._bboxes = None
+        self._materialized: Dict[int, Hotspot] = {}
+        self._id_lookup: Optional[Dict[str, int]] = None
+    
+    @classmethod
+    def from_arrays(cls, arrays: Any, image_width: int, image_height: int) -> 'HotspotMapper':
+        """
+        Build a read-only mapper over columnar hotspot arrays
+        
+        ``arrays`` is a ``HotspotArrays`` (``K2SHBWIDecoder.get_hotspot_arrays()``).
+        Point and region queries run vectorized over bounding-box arrays and
+        Hotspot objects are only created for the hotspots a query returns;
+        ``hotspots`` (statistics, export, validation) materializes them all.
+        Editing methods raise ``ValueError``.
+        """
+        mapper = cls(image_width, image_height)
+        mapper._arrays = arrays
+        mapper._bboxes = _array_bounding_boxes(arrays)
+        return mapper
+    
+    @property
+    def hotspots(self) -> List[Hotspot]:
+        """All hotspots in layer order (materialized on first use in arrays mode)."""
+        if self._arrays is not None and len(self._hotspots) != len(self._arrays):
+            self._hotspots = [self._materialize(i) for i in range(len(self._arrays))]
+        return self._hotspots
+    
+    def _check_writable(self) -> None:
+        """Reject edits to an array-backed mapper."""
+        if self._arrays is not None:
+            raise ValueError(
+                "HotspotMapper.from_arrays() mappers are read-only; "
+                "use import_map() on a new HotspotMapper to edit hotspots"
+            )
+    
+    def _materialize(self, i: int) -> Hotspot:
+        """Hotspot object for row ``i`` of the arrays (cached)."""
+        hotspot = self._materialized.get(i)
+        if hotspot is not None:
+            return hotspot
+        arrays = self._arrays
+        points = arrays.coord_kind[i] == COORDS_POINTS
+        coords = arrays.coords(i)
+        coords = [tuple(p) for p in coords] if points else tuple(coords)
+        fields = arrays.columns(i)
+        data = arrays.payload(i).get('data', {})
+        if arrays.is_nested(i):
+            # Builder-style hotspot: the fields also stay in its data
+            data = {**data, **fields}
+        hotspot = Hotspot(
+            id=fields.get('id', str(i)),
+            coords=coords,
+            shape=fields.get('shape') or ('polygon' if points else 'rectangle'),
+            data=data,
+            priority=fields.get('priority', 5),
+            layer_index=i,
+            **{name: fields[name] for name, _ in FLAG_FIELDS if name in fields}
+        )
+        self._materialized[i] = hotspot
+        return hotspot
+    
+    def _array_hits(self, x: float, y: float) -> List[Hotspot]:
+        """Hotspots containing (x, y), in layer order (arrays mode)."""
+        b = self._bboxes
+        candidates = np.flatnonzero((b[:, 0] <= x) & (x <= b[:, 2]) & (b[:, 1] <= y) & (y <= b[:, 3]))
+        hits = (self._materialize(int(i)) for i in candidates)
+        return [h for h in hits if h.contains_point(x, y)]
     
     def _create_spatial_grid(self) -> Dict:
         """Create spatial grid for fast point queries"""
@@ -175,6 +285,7 @@ class HotspotMapper:
         Returns:
             hotspot_id
         """
+        self._check_writable()
         hotspot_id = str(uuid.uuid4())
         
         hotspot = Hotspot(
@@ -212,10 +323,19 @@ class HotspotMapper:
     
     def get_hotspot(self, hotspot_id: str) -> Optional[Hotspot]:
         """Get hotspot by ID"""
+        if self._arrays is not None:
+            if self._id_lookup is None:
+                self._id_lookup = {
+                    self._arrays.string(self._arrays.id_index, i) or str(i): i
+                    for i in range(len(self._arrays))
+                }
+            i = self._id_lookup.get(hotspot_id)
+            return None if i is None else self._materialize(i)
         return self.hotspot_index.get(hotspot_id)
     
     def remove_hotspot(self, hotspot_id: str) -> bool:
         """Remove hotspot"""
+        self._check_writable()
         if hotspot_id not in self.hotspot_index:
             return False
         
@@ -239,6 +359,10 @@ class HotspotMapper:
         Returns:
             Hotspot or None
         """
+        if self._arrays is not None:
+            hits = self._array_hits(x, y)
+            return hits[0] if hits else None
+        
         # Get grid cell
         grid_x = int(x / self.grid_size)
         grid_y = int(y / self.grid_size)
@@ -262,6 +386,11 @@ class HotspotMapper:
         Returns:
             List of hotspots (empty if none)
         """
+        if self._arrays is not None:
+            matches = self._array_hits(x, y)
+            matches.sort(key=lambda h: h.priority, reverse=True)
+            return matches
+        
         grid_x = int(x / self.grid_size)
         grid_y = int(y / self.grid_size)
         cell_key = (grid_x, grid_y)
@@ -308,6 +437,11 @@ class HotspotMapper:
         Returns:
             List of hotspots in region
         """
+        if self._arrays is not None:
+            b = self._bboxes
+            inside = ~((b[:, 2] < x1) | (x2 < b[:, 0]) | (b[:, 3] < y1) | (y2 < b[:, 1]))
+            return [self._materialize(int(i)) for i in np.flatnonzero(inside)]
+        
         region_hotspots = []
         
         for hotspot in self.hotspots:
@@ -327,6 +461,7 @@ class HotspotMapper:
         Args:
             method: 'priority', 'size', 'position'
         """
+        self._check_writable()
         if method == 'priority':
             # Sort by priority
             self.hotspots.sort(key=lambda h: h.priority, reverse=True)
@@ -415,6 +550,7 @@ class HotspotMapper:
         Args:
             hotspot_data: List of hotspot dictionaries
         """
+        self._check_writable()
         self.hotspots.clear()
         self.hotspot_index.clear()
         self.grid.clear()
@@ -423,11 +559,11 @@ class HotspotMapper:
             self.add_hotspot(
                 coords=tuple(data['coords']),
                 data=data.get('data', {}),
-                shape=data.get('shape', 'rectangle'),
-                visible=data.get('visible', True),
-                clickable=data.get('clickable', True),
-                lazy_load=data.get('lazy_load', False),
-                priority=data.get('priority', 5)
+                shape=_hotspot_field(data, 'shape', 'rectangle'),
+                visible=_hotspot_field(data, 'visible', True),
+                clickable=_hotspot_field(data, 'clickable', True),
+                lazy_load=_hotspot_field(data, 'lazy_load', False),
+                priority=_hotspot_field(data, 'priority', 5)
             )
     
     def get_statistics(self) -> Dict[str, Any]:
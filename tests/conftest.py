@@ -0,0 +1,15 @@
+import pytest
+
+from src.core.encoder import K2SHBWIEncoder
+
+
+@pytest.fixture
+def encode_map():
+    """Factory writing a small metadata + hotspot file: ``encode_map(out, i) -> out``."""
+    def encode(out, i):
+        enc = K2SHBWIEncoder()
+        enc.add_metadata({'title': f'Map {i}', 'author': 'Tester'})
+        enc.add_hotspot((i, i, 10, 10), {'title': f'Spot {i}'})
+        enc.encode(str(out))
+        return out
+    return encode
@@ -25,4 +25,82 @@ def test_invalid_algorithm():
     """Test that requesting an invalid algorithm raises ValueError."""
     init_registry()
     with pytest.raises(ValueError):
-        get_compression_pair("nonexistent_algo")
\ No newline at end of file
+        get_compression_pair("nonexistent_algo")
+
+
+def test_codec_levels_via_registry():
+    """Built-in codecs accept a compression level."""
+    init_registry()
+    compress, decompress = registry.get_compression("zlib", level=1)
+    data = b"level test " * 100
+    assert decompress(compress(data)) == data
+
+    previous = registry._default_levels["zlib"]
+    registry.set_default_level("zlib", 9)
+    try:
+        compress, _ = registry.get_compression("zlib")
+        assert decompress(compress(data)) == data
+    finally:
+        registry.set_default_level("zlib", previous)
+
+    with pytest.raises(ValueError):
+        registry.get_compression("smart", level=3)
+
+
+def _install_plugin(tmp_path, monkeypatch):
+    """A fake installed distribution declaring one k2shbwi.algorithms entry point."""
+    (tmp_path / "inhouse_codec.py").write_text(
+        "from src.algorithms.registry import AlgorithmPlugin\n"
+        "PLUGIN = AlgorithmPlugin(compress=lambda data: data[::-1], decompress=lambda data: data[::-1])\n")
+    dist_info = tmp_path / "inhouse_codec-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: inhouse-codec\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text(
+        "[k2shbwi.algorithms]\n"
+        "inhouse = inhouse_codec:PLUGIN [streaming, thread_safe, mbps_5000]\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+
+def test_entry_point_plugins_load_lazily(tmp_path, monkeypatch):
+    """Plugins are listed from package metadata and imported on first request."""
+    import sys
+    from src.algorithms.registry import AlgorithmRegistry
+    _install_plugin(tmp_path, monkeypatch)
+    reg = AlgorithmRegistry()
+    assert reg.list_compression_algos() == []
+    assert reg.load_entry_points() == ["inhouse"]
+    assert "inhouse" in reg.list_compression_algos()
+
+    # Capability queries read the declaration, not the plugin module
+    caps = reg.get_capabilities("inhouse")
+    assert caps.streaming and caps.thread_safe and caps.lossless and caps.typical_mbps == 5000
+    assert reg.find_compression_algos(streaming=True, min_mbps=1000) == ["inhouse"]
+    assert "inhouse_codec" not in sys.modules
+
+    compress, decompress = reg.get_compression("inhouse")
+    assert "inhouse_codec" in sys.modules
+    assert decompress(compress(b"plugin data")) == b"plugin data"
+    assert reg.get_capabilities("inhouse") == caps
+    monkeypatch.delitem(sys.modules, "inhouse_codec")
+
+
+def test_discovering_registry_fills_itself(tmp_path, monkeypatch):
+    """discover=True registers the built-ins and installed plugins on first use."""
+    from src.algorithms.registry import AlgorithmRegistry
+    _install_plugin(tmp_path, monkeypatch)
+    reg = AlgorithmRegistry(discover=True)
+    algos = reg.list_compression_algos()
+    assert {"smart", "zlib", "inhouse"} <= set(algos)
+
+
+def test_select_by_capabilities():
+    """Selection filters on capability metadata and prefers faster algorithms."""
+    from src.core.algorithm_selector import select_compression
+    init_registry()
+    assert registry.get_capabilities("zlib").lossless
+    assert select_compression(streaming=True, thread_safe=True) in registry.find_compression_algos(streaming=True)
+    assert "smart" not in registry.find_compression_algos(streaming=True)
+    assert registry.find_compression_algos(min_mbps=1) == sorted(
+        registry.find_compression_algos(min_mbps=1), key=lambda n: -registry.get_capabilities(n).typical_mbps)
+    with pytest.raises(ValueError):
+        select_compression(lossless=False)
@@ -0,0 +1,86 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from src.core.async_reader import AsyncK2SHBWIReader
+from src.core.encoder import K2SHBWIEncoder
+
+
+def _encode(out):
+    enc = K2SHBWIEncoder()
+    enc.set_image(Image.frombytes('RGB', (256, 192), random.Random(1).randbytes(256 * 192 * 3)))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_levels = [256, 128, 64]
+    enc.add_metadata({'title': 'Async', 'author': 'Tester'})
+    enc.add_hotspot((1, 2, 3, 4), {'title': 'Spot'})
+    enc.encode(str(out))
+    return out
+
+
+def test_async_reader_shares_concurrent_work(tmp_path):
+    out = _encode(tmp_path / 'async.k2sh')
+
+    async def run():
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            async with AsyncK2SHBWIReader(out, executor=pool) as reader:
+                calls = []
+                orig = reader.decoder.read_level
+                reader.decoder.read_level = lambda idx: calls.append(idx) or orig(idx)
+
+                header = await reader.read_header()
+                metas = await asyncio.gather(*(reader.read_metadata() for _ in range(5)))
+                levels = await asyncio.gather(*(reader.read_level(i) for i in (-1, 2, 2, 0)))
+                hotspots = await reader.read_hotspots()
+                return header, metas, levels, hotspots, calls
+
+    header, metas, levels, hotspots, calls = asyncio.run(run())
+    assert header.metadata_offset > 0
+    assert all(meta['title'] == 'Async' for meta in metas)
+    assert [lvl['width'] for lvl in levels] == [64, 64, 64, 256]
+    assert levels[0]['image'].size == (levels[0]['width'], levels[0]['height'])
+    # -1 and 2 name the same level: decoded once for all three requests
+    assert sorted(calls) == [0, 2]
+    assert hotspots[0]['data'] == {'title': 'Spot'}
+
+
+def test_async_reader_cancelled_waiter_does_not_cancel_shared_job(tmp_path):
+    out = _encode(tmp_path / 'async.k2sh')
+
+    async def run():
+        reader = AsyncK2SHBWIReader(out)
+        first = asyncio.ensure_future(reader.read_level(0))
+        second = asyncio.ensure_future(reader.read_level(0))
+        await asyncio.sleep(0)
+        first.cancel()
+        level = await second
+        await reader.close()
+        return first.cancelled(), level
+
+    cancelled, level = asyncio.run(run())
+    assert cancelled
+    assert level['width'] == 256
+
+
+def test_async_reader_concurrent_data_layers(tmp_path):
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': 'Layers', 'author': 'Tester'})
+    enc.data_layers_indexed = True
+    for i in range(64):
+        enc.add_data_layer(f'layer{i}', {'values': list(range(i, i + 200))})
+    out = tmp_path / 'layers.k2sh'
+    enc.encode(str(out))
+    ids = [f'layer{i}' for i in range(64)]
+
+    async def run():
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            async with AsyncK2SHBWIReader(out, executor=pool) as reader:
+                # Slow reads widen the window in which threads race for the index
+                read_at = reader.decoder._read_at
+                reader.decoder._read_at = lambda *args: time.sleep(0.001) or read_at(*args)
+                return await asyncio.gather(*(reader.read_data_layer(i) for i in ids))
+
+    layers = asyncio.run(run())
+    assert [layer['values'][0] for layer in layers] == list(range(64))
@@ -0,0 +1,57 @@
+import os
+import pickle
+
+from src.core import batch
+from src.core.batch import decode_many
+
+
+def _decode_or_crash(path, sections, dictionary_root):
+    """Worker that dies like an OOM-killed process on files named crash.k2sh."""
+    if os.path.basename(str(path)) == 'crash.k2sh':
+        os._exit(1)
+    return _decode_file(path, sections, dictionary_root)
+
+
+_decode_file = batch.decode_file
+
+
+def test_decode_many_over_process_pool(tmp_path, encode_map):
+    paths = [encode_map(tmp_path / f'map{i}.k2sh', i) for i in range(6)]
+    broken = tmp_path / 'broken.k2sh'
+    broken.write_bytes(b'not a k2sh file')
+    paths.insert(3, broken)
+
+    results = list(decode_many(paths, sections=('header', 'metadata', 'hotspots'), workers=2, max_pending=2))
+    assert [r['path'] for r in results] == [str(p) for p in paths]
+    assert [r['index'] for r in results] == list(range(len(paths)))
+    assert not results[3]['ok'] and results[3]['error'].startswith('ValidationError')
+    good = [r for r in results if r['ok']]
+    assert [r['metadata']['title'] for r in good] == [f'Map {i}' for i in range(6)]
+    assert good[0]['hotspots'][0]['data'] == {'title': 'Spot 0'}
+    pickle.dumps(results)
+
+    unordered = list(decode_many(paths, sections=('metadata',), workers=2, ordered=False))
+    assert sorted(r['index'] for r in unordered) == list(range(len(paths)))
+    assert 'hotspots' not in unordered[0]
+
+    inline = list(decode_many(paths, sections=('metadata',), workers=0))
+    assert [r['ok'] for r in inline] == [r['ok'] for r in results]
+
+
+def test_decode_many_survives_worker_crash(tmp_path, monkeypatch, encode_map):
+    paths = [encode_map(tmp_path / f'map{i}.k2sh', i) for i in range(6)]
+    crash = encode_map(tmp_path / 'crash.k2sh', 99)
+    paths.insert(3, crash)
+    monkeypatch.setattr(batch, 'decode_file', _decode_or_crash)
+
+    for ordered in (True, False):
+        results = list(decode_many(paths, sections=('metadata',), workers=2, ordered=ordered, max_pending=2))
+        assert sorted(r['index'] for r in results) == list(range(len(paths)))
+        by_index = {r['index']: r for r in results}
+        assert not by_index[3]['ok'] and by_index[3]['error'].startswith('BrokenProcessPool')
+        # Only files in flight with the crashed one fail; later ones use a new pool
+        assert all(r['ok'] or r['error'].startswith('BrokenProcessPool') for r in results)
+        assert sum(r['ok'] for r in results) >= len(paths) - 3
+        if ordered:
+            # Submitted after the crash was seen, so always in the new pool
+            assert by_index[len(paths) - 1]['ok']
@@ -0,0 +1,54 @@
+from PIL import Image
+
+from src.creator.builder import K2SHBWIBuilder
+from src.core.decoder import K2SHBWIDecoder
+
+
+def test_builder_passes_one_decoded_raster_to_encoder(tmp_path, monkeypatch):
+    src = tmp_path / 'big.png'
+    Image.new('RGB', (1200, 800), color=(10, 20, 30)).save(src, format='PNG')
+
+    opened = []
+    orig_open = Image.open
+    monkeypatch.setattr(Image, 'open', lambda *a, **kw: opened.append(a) or orig_open(*a, **kw))
+
+    builder = K2SHBWIBuilder()
+    builder.config['optimization']['max_image_dimension'] = 1000
+    builder.set_base_image(str(src))
+
+    # The file is decoded once and the optimized raster is what gets encoded
+    assert len(opened) == 1
+    assert builder.encoder.image is builder.base_image
+    assert builder.base_image.size == (1000, 666)
+
+    out = tmp_path / 'built.k2sh'
+    builder.build(str(out), validate=False, verbose=False)
+    assert len(opened) == 1
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(out))
+    assert dec.get_image().size == (1000, 666)
+
+
+def test_builder_keeps_transparency(tmp_path):
+    la = tmp_path / 'la.png'
+    Image.new('LA', (300, 200), color=(120, 0)).save(la, format='PNG')
+    pal = Image.new('P', (300, 200), color=1)
+    pal.putpalette([0, 0, 0, 255, 0, 0])
+    indexed = tmp_path / 'indexed.png'
+    pal.save(indexed, format='PNG', transparency=1)
+    grey = tmp_path / 'grey.png'
+    Image.new('L', (300, 200), color=50).save(grey, format='PNG')
+
+    for src, mode in ((la, 'RGBA'), (indexed, 'RGBA'), (grey, 'RGB')):
+        builder = K2SHBWIBuilder()
+        builder.set_base_image(str(src))
+        out = tmp_path / f'{src.stem}.k2sh'
+        builder.build(str(out), validate=False, verbose=False)
+
+        dec = K2SHBWIDecoder()
+        dec.decode(str(out))
+        img = dec.get_image()
+        assert img.mode == mode
+        if mode == 'RGBA':
+            assert img.getpixel((0, 0))[3] == 0
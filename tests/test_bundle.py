@@ -0,0 +1,71 @@
+import pytest
+
+from src.core.bundle import K2SHBWIBundle, K2SHBWIBundleWriter
+from src.core.format_spec import FeatureFlags, FormatError
+
+
+def test_bundle_random_access_and_append(tmp_path, encode_map):
+    files = [encode_map(tmp_path / f'map{i}.k2sh', i) for i in range(5)]
+    bundle_path = tmp_path / 'maps.k2sb'
+    with K2SHBWIBundleWriter(bundle_path) as writer:
+        for i, path in enumerate(files[:3]):
+            writer.add_file(f'map{i}', path)
+
+    with K2SHBWIBundleWriter(bundle_path, append=True) as writer:
+        writer.add_bytes('map3', files[3].read_bytes())
+        writer.add_file('map4', files[4])
+        with pytest.raises(ValueError):
+            writer.add_file('map0', files[0])
+
+    bundle = K2SHBWIBundle(bundle_path)
+    assert bundle.names() == [f'map{i}' for i in range(5)]
+    assert bundle.entry('map2').has_feature(FeatureFlags.HAS_HOTSPOTS)
+    for i in (4, 0, 2):
+        with bundle.open(f'map{i}') as dec:
+            assert dec.get_metadata()['title'] == f'Map {i}'
+            assert dec.get_hotspots()[0]['data'] == {'title': f'Spot {i}'}
+        assert bundle.read_bytes(f'map{i}') == files[i].read_bytes()
+
+    with bundle.open('map3', lazy=False, use_mmap=True) as dec:
+        assert dec.get_hotspots()[0]['coords'] == [3, 3, 10, 10]
+
+
+def test_bundle_rejects_unfinished_file(tmp_path, encode_map):
+    bundle_path = tmp_path / 'maps.k2sb'
+    writer = K2SHBWIBundleWriter(bundle_path)
+    writer.add_file('map0', encode_map(tmp_path / 'map0.k2sh', 0))
+    writer._f.flush()
+    with pytest.raises(FormatError):
+        K2SHBWIBundle(bundle_path)
+    writer.close()
+    assert len(K2SHBWIBundle(bundle_path)) == 1
+
+
+def test_interrupted_append_keeps_existing_entries(tmp_path, encode_map):
+    files = [encode_map(tmp_path / f'map{i}.k2sh', i) for i in range(4)]
+    bundle_path = tmp_path / 'maps.k2sb'
+    with K2SHBWIBundleWriter(bundle_path) as writer:
+        writer.add_file('map0', files[0])
+        writer.add_file('map1', files[1])
+    before = bundle_path.read_bytes()
+
+    # Crash after writing an entry but before the new directory and trailer
+    writer = K2SHBWIBundleWriter(bundle_path, append=True)
+    writer.add_file('map2', files[2])
+    writer._f.write(b'K2SE partial directory')
+    writer._f.close()
+    assert bundle_path.read_bytes()[:len(before)] == before
+
+    bundle = K2SHBWIBundle(bundle_path)
+    assert bundle.names() == ['map0', 'map1']
+    assert bundle.end == len(before)
+    assert bundle.read_bytes('map1') == files[1].read_bytes()
+
+    # The next append reuses the space of the unfinished one
+    with K2SHBWIBundleWriter(bundle_path, append=True) as writer:
+        writer.add_file('map3', files[3])
+    bundle = K2SHBWIBundle(bundle_path)
+    assert bundle.names() == ['map0', 'map1', 'map3']
+    assert bundle.end == bundle_path.stat().st_size
+    with bundle.open('map3') as dec:
+        assert dec.get_metadata()['title'] == 'Map 3'
@@ -22,3 +22,76 @@ def test_compressor_decompressor_roundtrip_or_skip(ctype):
     decompressed = decomp(compressed)
     assert isinstance(decompressed, (bytes, bytearray))
     assert decompressed == SAMPLE
+
+
+def test_zstd_contexts_are_reused_per_thread():
+    """Compressor contexts are cached per (type, level) and per thread."""
+    import threading
+    from src.core import codecs
+
+    pytest.importorskip('zstandard')
+    codecs.clear_cache()
+    compress = codecs.get_compressor(CompressionType.ZSTD, 3)
+    decompress = codecs.get_decompressor(CompressionType.ZSTD)
+    for _ in range(5):
+        assert decompress(compress(SAMPLE)) == SAMPLE
+    assert len(codecs._contexts()) == 2
+
+    codecs.get_compressor(CompressionType.ZSTD, 19)(SAMPLE)
+    assert len(codecs._contexts()) == 3
+
+    seen = []
+    t = threading.Thread(target=lambda: (compress(SAMPLE), seen.append(len(codecs._contexts()))))
+    t.start()
+    t.join()
+    assert seen == [1]
+
+
+@pytest.mark.parametrize('ctype', [CompressionType.ZLIB, CompressionType.LZMA, CompressionType.ZSTD])
+def test_compressor_levels_roundtrip(ctype):
+    data = SAMPLE * 50
+    fast = CompressionType.get_compressor(ctype, 1)(data)
+    try:
+        best = CompressionType.get_compressor(ctype, 9)(data)
+    except Exception as e:
+        pytest.skip(f"Skipping {ctype}: {e}")
+    decomp = CompressionType.get_decompressor(ctype)
+    assert decomp(fast) == data and decomp(best) == data
+
+
+@pytest.mark.parametrize('ctype', [CompressionType.ZLIB, CompressionType.LZMA, CompressionType.BROTLI, CompressionType.ZSTD])
+def test_bounded_streaming_decompression(ctype):
+    """iter_decompress yields bounded chunks and stops a bomb at the limit."""
+    from src.core import codecs
+    from src.core.format_spec import DecompressionLimitError
+    try:
+        comp = CompressionType.get_compressor(ctype)
+    except Exception as e:
+        pytest.skip(f"Skipping {ctype}: {e}")
+
+    data = bytes(range(256)) * 4096
+    compressed = comp(data)
+    chunks = list(codecs.iter_decompress(ctype, compressed, chunk_size=64 * 1024))
+    assert b''.join(chunks) == data
+    assert max(len(c) for c in chunks) <= 64 * 1024
+    assert codecs.decompress_bounded(ctype, compressed, len(data)) == data
+
+    bomb = comp(b'\0' * (16 * 1024 * 1024))
+    with pytest.raises(DecompressionLimitError):
+        codecs.decompress_bounded(ctype, bomb, 1024 * 1024)
+
+
+@pytest.mark.parametrize('ctype', [CompressionType.ZLIB, CompressionType.LZMA, CompressionType.BROTLI, CompressionType.ZSTD])
+def test_truncated_streaming_decompression(ctype):
+    """A truncated payload raises instead of returning a short result."""
+    from src.core import codecs
+    from src.core.errors import CompressionError
+    try:
+        comp = CompressionType.get_compressor(ctype)
+    except Exception as e:
+        pytest.skip(f"Skipping {ctype}: {e}")
+
+    compressed = comp(bytes(range(256)) * 4096)
+    for cut in (len(compressed) // 2, len(compressed) - 1):
+        with pytest.raises(CompressionError):
+            codecs.decompress_bounded(ctype, compressed[:cut], 1 << 24)
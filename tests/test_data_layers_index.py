@@ -0,0 +1,49 @@
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder, _UNLOADED
+from src.core.format_spec import CompressionType
+
+LAYERS = {f'lang-{i:03d}': {'title': f'Title {i}', 'body': 'localized text ' * (i % 20 + 1)} for i in range(200)}
+
+
+def _encode(out, indexed=True, adaptive=False):
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': 'Layers', 'author': 'Tester'})
+    for layer_id, data in LAYERS.items():
+        enc.add_data_layer(layer_id, data)
+    enc.data_layers_indexed = indexed
+    enc.data_layers_compression = CompressionType.ZSTD
+    enc.adaptive_compression = adaptive
+    enc.encode(str(out))
+    return enc
+
+
+def test_indexed_layers_load_one_record(tmp_path):
+    out = tmp_path / 'indexed.k2sh'
+    _encode(out)
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out))
+    loaded = []
+    orig = dec._load_data_layer
+    dec._load_data_layer = lambda layer_id: loaded.append(layer_id) or orig(layer_id)
+
+    assert dec.get_data_layer('lang-042') == LAYERS['lang-042']
+    assert dec.get_data_layer('lang-042') == LAYERS['lang-042']
+    assert loaded == ['lang-042']
+    assert dec._data_layers is _UNLOADED
+    assert dec.get_data_layer('missing') == {}
+    assert dec.get_data_layer_ids() == list(LAYERS)
+
+
+def test_indexed_layers_match_blob_layout(tmp_path):
+    indexed, blob = tmp_path / 'indexed.k2sh', tmp_path / 'blob.k2sh'
+    enc = _encode(indexed, adaptive=True)
+    _encode(blob, indexed=False)
+    assert 'data_layers/lang-000' in enc.stats['sections']
+
+    a, b = K2SHBWIDecoder(), K2SHBWIDecoder()
+    a.decode(str(indexed))
+    b.decode(str(blob))
+    assert a.data_layers == b.data_layers == LAYERS
+    assert a.get_data_layer('lang-199') == LAYERS['lang-199']
+    assert b.get_data_layer_ids() == list(LAYERS)
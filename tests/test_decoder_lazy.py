@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder, _UNLOADED
+
+SAMPLE_IMAGE = Path(__file__).parent / 'assets' / 'sample.png'
+
+
+def _encode_sample(out, pyramid=True):
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(SAMPLE_IMAGE))
+    enc.image_pyramid_enabled = pyramid
+    enc.pyramid_use_ssim = False
+    enc.add_metadata({'title': 'Lazy', 'author': 'Tester'})
+    enc.add_hotspot((10, 10, 50, 50), {'note': 'h1'})
+    enc.add_data_layer('layer1', {'k': 'v'})
+    enc.encode(str(out))
+
+
+def test_lazy_decode_reads_only_header(tmp_path):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+    out = tmp_path / 'lazy.k2sh'
+    _encode_sample(out)
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out))
+    assert dec.header is not None
+    assert dec._metadata is _UNLOADED
+    assert dec._image_pyramid is _UNLOADED
+    assert dec._hotspots is _UNLOADED
+    assert dec._data_layers is _UNLOADED
+
+    # Touching metadata must not decode any other section
+    assert dec.get_metadata()['title'] == 'Lazy'
+    assert dec._image_pyramid is _UNLOADED
+    assert dec._hotspots is _UNLOADED
+
+
+def test_lazy_pyramid_decodes_levels_on_access(tmp_path):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+    out = tmp_path / 'lazy_pyr.k2sh'
+    _encode_sample(out)
+
+    eager = K2SHBWIDecoder()
+    eager.decode(str(out))
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out))
+    pyramid = dec.image_pyramid
+    assert len(pyramid) == len(eager.image_pyramid)
+    # Level directory without payloads, same for eager and lazy decoders
+    assert dec.level_entries() == eager.level_entries()
+    assert all('data' not in e for e in dec.level_entries())
+    assert dec.level_locations() == eager.level_locations()
+    assert len(dec.level_locations()) == len(pyramid)
+    # Nothing decoded until a level is indexed
+    assert all('data' not in e for e in pyramid._entries)
+    last = pyramid[-1]
+    assert last['data'] == eager.image_pyramid[-1]['data']
+    assert 'data' not in pyramid._entries[0]
+
+    assert list(pyramid) == eager.image_pyramid
+    assert dec.get_hotspots() == eager.get_hotspots()
+    assert dec.get_data_layer('layer1') == {'k': 'v'}
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+from PIL import Image
+
+from src.core.decoder import K2SHBWIDecoder
+from src.core.encoder import K2SHBWIEncoder
+from src.core.format_spec import CompressionType, DecompressionLimitError
+
+
+def test_max_section_size_stops_oversized_sections(tmp_path):
+    out = tmp_path / 'bomb.k2sh'
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': 'Bomb', 'author': 'Tester'})
+    enc.add_data_layer('zeros', {'text': '0' * (8 * 1024 * 1024)})
+    enc.data_layers_compression = CompressionType.ZLIB
+    enc.encode(str(out))
+    assert out.stat().st_size < 64 * 1024
+
+    dec = K2SHBWIDecoder(lazy=True, max_section_size=1024 * 1024)
+    dec.decode(str(out))
+    assert dec.get_metadata()['title'] == 'Bomb'
+    with pytest.raises(DecompressionLimitError):
+        dec.data_layers
+
+    dec = K2SHBWIDecoder(max_section_size=16 * 1024 * 1024)
+    dec.decode(str(out))
+    assert len(dec.data_layers['zeros']['text']) == 8 * 1024 * 1024
+
+
+def test_read_level_image_streams_into_pil(tmp_path):
+    out = tmp_path / 'levels.k2sh'
+    img = Image.frombytes('RGB', (256, 192), random.Random(3).randbytes(256 * 192 * 3))
+    enc = K2SHBWIEncoder()
+    enc.set_image(img)
+    enc.image_pyramid_enabled = True
+    enc.pyramid_levels = [256, 128]
+    enc.pyramid_level_formats = [0, 0]
+    enc.pyramid_recompress = 'always'
+    enc.encode(str(out))
+
+    dec = K2SHBWIDecoder(lazy=True, max_section_size=4 * 1024 * 1024)
+    dec.decode(str(out))
+    streamed = dec.read_level_image(0)
+    assert 'data' not in dec.image_pyramid._entries[0]
+    eager = K2SHBWIDecoder()
+    eager.decode(str(out))
+    assert streamed.tobytes() == eager.get_image().tobytes()
+
+    dec = K2SHBWIDecoder(lazy=True, max_section_size=1024)
+    dec.decode(str(out))
+    with pytest.raises(DecompressionLimitError):
+        dec.read_level_image(0)
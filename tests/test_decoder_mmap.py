@@ -0,0 +1,60 @@
+import mmap
+from pathlib import Path
+
+import pytest
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder
+from src.core.format_spec import CompressionType
+
+SAMPLE_IMAGE = Path(__file__).parent / 'assets' / 'sample.png'
+
+
+def _encode_uncompressed(out):
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(SAMPLE_IMAGE))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_use_ssim = False
+    enc.hotspots_compression = CompressionType.NONE
+    enc.data_layers_compression = CompressionType.NONE
+    enc.add_metadata({'title': 'Mapped', 'author': 'Tester'})
+    enc.add_hotspot((10, 10, 50, 50), {'note': 'h1'})
+    enc.add_data_layer('layer1', {'k': 'v'})
+    enc.encode(str(out))
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_mmap_decode_matches_file_decode(tmp_path, lazy):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+    out = tmp_path / 'mapped.k2sh'
+    _encode_uncompressed(out)
+
+    plain = K2SHBWIDecoder()
+    plain.decode(str(out))
+
+    with K2SHBWIDecoder(lazy=lazy, use_mmap=True) as dec:
+        dec.decode(str(out))
+        assert dec.get_metadata() == plain.get_metadata()
+        assert dec.get_hotspots() == plain.get_hotspots()
+        assert dec.get_data_layer('layer1') == {'k': 'v'}
+        assert [bytes(l['data']) for l in dec.image_pyramid] == [l['data'] for l in plain.image_pyramid]
+        assert dec.get_image().size == plain.get_image().size
+
+
+def test_mmap_uncompressed_payloads_are_zero_copy(tmp_path):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+    out = tmp_path / 'mapped.k2sh'
+    _encode_uncompressed(out)
+
+    with K2SHBWIDecoder(lazy=True, use_mmap=True) as dec:
+        dec.decode(str(out))
+        level = dec.image_pyramid[0]['data']
+        assert isinstance(level, memoryview)
+        assert isinstance(level.obj, mmap.mmap)
+
+        comp_type, payload = dec.get_section_payload('hotspots')
+        assert comp_type == CompressionType.NONE
+        assert isinstance(payload, memoryview)
+        assert isinstance(payload.obj, mmap.mmap)
@@ -0,0 +1,100 @@
+import json
+import random
+
+import pytest
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder
+from src.core.format_spec import CompressionType, FormatError
+from src.core.hotspot_codec import encode_hotspots, is_binary_hotspots
+
+zstd = pytest.importorskip('zstandard')
+
+from src.core.dictionaries import DictionaryStore, samples_from_files, section_samples, train_dictionary
+
+
+CATEGORIES = ['building', 'park', 'station', 'museum', 'restaurant']
+
+
+def _hotspot_map(seed, n=12):
+    # About 4 KB of JSON: per-file coordinates and ids, corpus-wide keys and text
+    rng = random.Random(seed)
+    hotspots = []
+    for _ in range(n):
+        category = rng.choice(CATEGORIES)
+        x, y = rng.randint(0, 1900), rng.randint(0, 1900)
+        user_data = {'title': f'{category.title()} {rng.randint(1, 99)}', 'category': category,
+                     'description': f'Opening hours and accessibility information for this {category}; '
+                                    'tap for photos, reviews and directions.',
+                     'icon': f'icons/{category}.svg',
+                     'url': f'https://maps.example.com/{category}/{rng.randint(1000, 9999)}'}
+        hotspots.append({'coords': [x, y, x + rng.randint(20, 100), y + rng.randint(20, 100)],
+                         'data': {'shape': rng.choice(['rectangle', 'circle', 'polygon']),
+                                  'priority': rng.randint(0, 5), 'user_data': user_data}})
+    return hotspots
+
+
+def _encode(out, seed, dictionary=None, hotspots_format='json'):
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': f'Map {seed}', 'author': 'Tester', 'tags': ['map']})
+    enc.hotspots_compression = CompressionType.ZSTD
+    enc.hotspots_format = hotspots_format
+    for h in _hotspot_map(seed):
+        enc.add_hotspot(tuple(h['coords']), h['data'])
+    enc.dictionary = dictionary
+    enc.encode(str(out))
+    return enc
+
+
+def _hotspot_section_size(path):
+    with K2SHBWIDecoder(lazy=True) as dec:
+        dec.decode(str(path))
+        return len(dec.get_section_payload('hotspots')[1])
+
+
+@pytest.mark.parametrize('hotspots_format', ['json', 'binary'])
+def test_dictionary_roundtrip_through_store(tmp_path, hotspots_format):
+    corpus = []
+    for seed in range(100):
+        path = tmp_path / f'corpus{seed}.k2sh'
+        _encode(path, seed)
+        corpus.append(path)
+    samples = samples_from_files(corpus, hotspots_format)
+    assert len(samples) == 200
+    assert all(is_binary_hotspots(s) == (hotspots_format == 'binary') for s in samples[1::2])
+
+    store = DictionaryStore(tmp_path / 'dicts')
+    dict_id = store.add(train_dictionary(samples))
+    assert store.ids() == [dict_id]
+
+    # The shared dictionary more than halves 2-5 KB hotspot sections
+    dictionary = DictionaryStore(tmp_path / 'dicts').get(dict_id)
+    plain = packed = 0
+    for seed in (9997, 9998, 9999):
+        _encode(tmp_path / 'plain.k2sh', seed, hotspots_format=hotspots_format)
+        _encode(tmp_path / 'packed.k2sh', seed, dictionary, hotspots_format)
+        plain += _hotspot_section_size(tmp_path / 'plain.k2sh')
+        packed += _hotspot_section_size(tmp_path / 'packed.k2sh')
+    assert packed < plain / 2
+
+    packed = tmp_path / 'packed.k2sh'
+    dec = K2SHBWIDecoder(dictionary_store=DictionaryStore(tmp_path / 'dicts'))
+    dec.decode(str(packed))
+    assert dec.header.dictionary_id == dict_id
+    assert dec.get_metadata()['title'] == 'Map 9999'
+    assert dec.get_hotspots() == json.loads(json.dumps(_hotspot_map(9999)))
+
+    with pytest.raises(FormatError):
+        K2SHBWIDecoder().decode(str(packed))
+    with pytest.raises(FormatError):
+        K2SHBWIDecoder(dictionary_store=DictionaryStore(tmp_path / 'empty')).decode(str(packed))
+
+
+def test_files_without_dictionary_have_zero_id(tmp_path):
+    out = tmp_path / 'plain.k2sh'
+    _encode(out, 1)
+    dec = K2SHBWIDecoder()
+    dec.decode(str(out))
+    assert dec.header.dictionary_id == 0
+    assert section_samples(dec.get_metadata(), dec.get_hotspots())[1] == json.dumps(dec.get_hotspots()).encode('utf-8')
+    assert section_samples(None, dec.get_hotspots(), 'binary') == [encode_hotspots(dec.get_hotspots())]
@@ -0,0 +1,158 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder
+from src.core.editor import K2SHBWIEditor
+from src.core.format_spec import CompressionType
+
+SAMPLE_IMAGE = Path(__file__).parent / 'assets' / 'sample.png'
+
+
+def _encode(out, **settings):
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(SAMPLE_IMAGE))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_use_ssim = False
+    enc.add_metadata({'title': 'Editable', 'author': 'Tester'})
+    for i in range(5):
+        enc.add_hotspot((i * 10, i * 10, i * 10 + 5, i * 10 + 5), {'title': f'Hotspot {i}'})
+    enc.add_data_layer('en', {'caption': 'Hello'})
+    enc.add_data_layer('fr', {'caption': 'Bonjour'})
+    for key, value in settings.items():
+        setattr(enc, key, value)
+    enc.encode(str(out))
+
+
+def _image_section(path):
+    with K2SHBWIDecoder(lazy=True) as dec:
+        dec.decode(str(path))
+        return dec.header.image_pyramid_offset, bytes(dec.get_section_payload('image')[1])
+
+
+@pytest.fixture
+def k2sh(tmp_path):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+    out = tmp_path / 'edit.k2sh'
+    _encode(out)
+    return out
+
+
+def test_edit_hotspot_rewrites_only_trailing_sections(k2sh):
+    image_before = _image_section(k2sh)
+
+    with K2SHBWIEditor(k2sh) as editor:
+        editor.update_hotspot(3, data={'title': 'Renamed'})
+        stats = editor.save()
+    assert stats['rewritten'] == ['hotspots']
+    assert image_before == _image_section(k2sh)
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(k2sh))
+    assert dec.get_hotspots()[3]['data']['title'] == 'Renamed'
+    assert dec.get_hotspots()[4]['data']['title'] == 'Hotspot 4'
+    assert dec.get_data_layer('fr') == {'caption': 'Bonjour'}
+    assert dec.get_metadata()['title'] == 'Editable'
+
+
+def test_metadata_append_and_compact(k2sh):
+    with K2SHBWIEditor(k2sh) as editor:
+        editor.update_metadata(title='Short')
+        stats = editor.save()
+    assert stats['mode'] == 'append' and stats['rewritten'] == ['metadata']
+
+    with K2SHBWIEditor(k2sh) as editor:
+        editor.update_metadata(description='x' * 5000, tags=[str(i) for i in range(200)])
+        editor.set_data_layer('de', {'caption': 'Hallo'})
+        editor.remove_data_layer('en')
+        stats = editor.save()
+    assert set(stats['rewritten']) == {'metadata', 'data_layers'}
+    size_after_append = k2sh.stat().st_size
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(k2sh))
+    assert dec.get_metadata()['title'] == 'Short'
+    assert len(dec.get_metadata()['tags']) == 200
+    assert set(dec.data_layers) == {'fr', 'de'}
+    image_before = _image_section(k2sh)[1]
+
+    with K2SHBWIEditor(k2sh) as editor:
+        editor.set_hotspots([])
+        stats = editor.save(compact=True)
+    assert stats['removed'] == ['hotspots']
+    assert k2sh.stat().st_size < size_after_append
+    assert _image_section(k2sh)[1] == image_before
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(k2sh))
+    assert dec.get_hotspots() == []
+    assert dec.get_metadata()['description'] == 'x' * 5000
+    assert dec.get_data_layer('de') == {'caption': 'Hallo'}
+
+
+def test_editor_keeps_section_layouts(tmp_path):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+    out = tmp_path / 'layouts.k2sh'
+    _encode(out, hotspots_format='binary', data_layers_indexed=True,
+            hotspots_compression=CompressionType.ZSTD)
+
+    with K2SHBWIEditor(out) as editor:
+        editor.add_hotspot((1, 2, 3, 4), {'title': 'New'})
+        editor.set_data_layer('en', {'caption': 'Hi'})
+        editor.save()
+
+    with K2SHBWIDecoder(lazy=True) as dec:
+        dec.decode(str(out))
+        comp_type, payload = dec.get_section_payload('hotspots')
+        assert comp_type == CompressionType.ZSTD
+        assert dec._read_hotspots_raw()[:4] == b'HSB1'
+        assert dec.get_data_layer_ids() == ['en', 'fr']
+        assert dec.get_data_layer('en') == {'caption': 'Hi'}
+        assert dec.get_hotspots()[-1]['data'] == {'title': 'New'}
+
+
+def test_interrupted_save_leaves_old_file_readable(k2sh, monkeypatch):
+    before = k2sh.read_bytes()
+    editor = K2SHBWIEditor(k2sh)
+    editor.update_hotspot(0, data={'title': 'Never committed'})
+    editor.update_metadata(title='Never committed')
+
+    def crash(*args):
+        raise OSError('simulated crash before the header write')
+
+    # The new sections are written and synced, then the "crash" hits
+    # before the header is switched over
+    monkeypatch.setattr(editor.header, 'pack', crash)
+    with pytest.raises(OSError):
+        editor.save()
+    editor.close()
+    assert k2sh.read_bytes()[:len(before)] == before
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(k2sh))
+    assert dec.get_hotspots()[0]['data']['title'] == 'Hotspot 0'
+    assert dec.get_metadata()['title'] == 'Editable'
+
+
+def test_dead_space_triggers_compaction(k2sh):
+    with K2SHBWIEditor(k2sh) as editor:
+        editor.remove_data_layer('en')
+        editor.remove_data_layer('fr')
+        stats = editor.save()
+    # The removed last section is truncated away
+    assert stats['removed'] == ['data_layers']
+    with K2SHBWIDecoder(lazy=True) as dec:
+        dec.decode(str(k2sh))
+        offset, size = dec.header.hotspot_map_offset, len(dec.get_section_payload('hotspots')[1])
+    assert k2sh.stat().st_size == offset + 5 + size
+
+    with K2SHBWIEditor(k2sh) as editor:
+        editor.compact_threshold = 0.0
+        editor.update_hotspot(1, data={'title': 'Compacted'})
+        assert editor.save()['mode'] == 'compact'
+    dec = K2SHBWIDecoder()
+    dec.decode(str(k2sh))
+    assert dec.get_hotspots()[1]['data']['title'] == 'Compacted'
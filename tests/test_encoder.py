@@ -46,4 +46,16 @@ def test_basic_encoding():
     
     assert decoder.get_metadata() == test_metadata
     assert len(decoder.get_hotspots()) == 1
-    assert decoder.get_data_layer("layer1") == test_layer
\ No newline at end of file
+    assert decoder.get_data_layer("layer1") == test_layer
+
+def test_image_data_is_encoded_once_per_image():
+    encoder = K2SHBWIEncoder()
+    encoder.set_image(Image.new('RGB', (600, 520), color=(1, 2, 3)))
+    first = encoder.image_data
+    assert encoder.image_data is first
+    assert Image.open(io.BytesIO(first)).size == (600, 520)
+
+    encoder.set_image(Image.new('RGB', (640, 560)))
+    assert Image.open(io.BytesIO(encoder.image_data)).size == (640, 560)
+    encoder.image = Image.new('RGB', (700, 600))
+    assert Image.open(io.BytesIO(encoder.image_data)).size == (700, 600)
@@ -40,3 +40,30 @@ def test_encoder_decoder_adaptive_roundtrip():
         out_file.unlink()
     except Exception:
         pass
+
+
+def test_trial_selection_records_choice_in_stats(tmp_path):
+    layers = {f'layer{i}': {'id': i, 'name': f'feature-{i % 17}', 'values': list(range(i % 50))}
+              for i in range(300)}
+
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': 'Trial Test', 'author': 'Tester'})
+    for layer_id, data in layers.items():
+        enc.add_data_layer(layer_id, data)
+    enc.adaptive_compression = True
+    enc.compression_selection = 'trial'
+    out_file = tmp_path / 'trial.k2sh'
+    enc.encode(str(out_file))
+
+    chosen = enc.stats['sections']['data_layers']
+    assert chosen['mode'] == 'trial' and chosen['objective'] == 'size'
+    assert chosen['trials']
+    best = min(t['compressed_bytes'] for t in chosen['trials'])
+    assert any(t['compressed_bytes'] == best and t['comp_type'] == chosen['comp_type']
+               and t['level'] == chosen['level'] for t in chosen['trials'])
+    assert chosen['stored_bytes'] < chosen['raw_bytes']
+    assert 'metadata' in enc.stats['sections']
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(out_file))
+    assert dec.get_data_layer('layer42') == layers['layer42']
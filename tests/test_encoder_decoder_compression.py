@@ -58,3 +58,23 @@ def test_encoder_decoder_roundtrip(comp_types):
         out_file.unlink()
     except Exception:
         pass
+
+
+def test_section_levels_roundtrip(tmp_path):
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': 'Levels', 'author': 'Tester'})
+    enc.metadata.compression_type = CompressionType.ZSTD
+    enc.hotspots_compression = CompressionType.ZSTD
+    enc.data_layers_compression = CompressionType.ZLIB
+    enc.section_levels = {'metadata': 19, 'hotspots': 1, 'data_layers': 9}
+    for i in range(50):
+        enc.add_hotspot((i, i, i + 10, i + 10), {'note': f'h{i}'})
+    enc.add_data_layer('layer1', {'values': list(range(500))})
+    out = tmp_path / 'levels.k2sh'
+    enc.encode(str(out))
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(out))
+    assert dec.get_metadata()['title'] == 'Levels'
+    assert len(dec.get_hotspots()) == 50
+    assert dec.get_data_layer('layer1')['values'][-1] == 499
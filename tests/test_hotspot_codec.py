@@ -0,0 +1,136 @@
+import json
+import random
+
+import pytest
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder, _UNLOADED
+from src.core.hotspot_codec import decode_hotspot_arrays, decode_hotspots, encode_hotspots
+from src.creator.hotspot_mapper import HotspotMapper
+
+
+def _mapper_with_shapes(n=300, seed=7):
+    rng = random.Random(seed)
+    mapper = HotspotMapper(2000, 2000)
+    for i in range(n):
+        x, y = rng.randint(0, 1900), rng.randint(0, 1900)
+        kind = i % 3
+        if kind == 0:
+            mapper.add_hotspot((x, y, x + rng.randint(5, 100), y + rng.randint(5, 100)),
+                               {'label': f'r{i}'}, priority=rng.randint(0, 9))
+        elif kind == 1:
+            mapper.add_hotspot((x, y, rng.randint(5, 60), 0), {'label': f'c{i}'}, shape='circle')
+        else:
+            mapper.add_hotspot([(x, y), (x + 80, y + 10), (x + 40, y + 90.5)], {'label': f'p{i}'},
+                               shape='polygon', lazy_load=True)
+    return mapper
+
+
+def test_binary_hotspots_roundtrip_like_json():
+    hotspots = _mapper_with_shapes().export_map() + [
+        {'coords': (1, 2, 3, 4), 'data': {'note': 'encoder style'}},
+        {'coords': [0.5, 1.5, 2.5, 3.5], 'data': {}, 'extra': [1, 2]},
+    ]
+    expected = json.loads(json.dumps(hotspots))
+    assert decode_hotspots(encode_hotspots(hotspots)) == expected
+    assert decode_hotspots(encode_hotspots([])) == []
+
+
+def test_encoder_binary_hotspots_section(tmp_path):
+    hotspots = _mapper_with_shapes(50).export_map()
+    files = {}
+    for fmt in ('json', 'binary'):
+        enc = K2SHBWIEncoder()
+        enc.hotspots_format = fmt
+        for h in hotspots:
+            enc.hotspots.append(h)
+        enc.add_hotspot((0, 0, 10, 10), {'note': 'last'})
+        files[fmt] = tmp_path / f'{fmt}.k2sh'
+        enc.encode(str(files[fmt]))
+        assert enc.stats['hotspots_format'] == fmt
+
+    plain, packed = K2SHBWIDecoder(), K2SHBWIDecoder()
+    plain.decode(str(files['json']))
+    packed.decode(str(files['binary']))
+    assert packed.get_hotspots() == plain.get_hotspots()
+
+    lazy = K2SHBWIDecoder(lazy=True)
+    lazy.decode(str(files['binary']))
+    arrays = lazy.get_hotspot_arrays()
+    assert len(arrays) == 51
+    assert lazy._hotspots is _UNLOADED
+
+    # Hotspots the binary layout cannot hold fall back to JSON
+    enc = K2SHBWIEncoder()
+    enc.hotspots_format = 'binary'
+    enc.add_hotspot(('a', 'b'), {})
+    enc.encode(str(tmp_path / 'fallback.k2sh'))
+    assert enc.stats['hotspots_format'] == 'json'
+
+
+def test_mapper_from_arrays_matches_object_mapper():
+    mapper = _mapper_with_shapes()
+    exported = mapper.export_map()
+    arrays = decode_hotspot_arrays(encode_hotspots(exported))
+    fast = HotspotMapper.from_arrays(arrays, 2000, 2000)
+
+    rng = random.Random(1)
+    for _ in range(300):
+        x, y = rng.uniform(0, 2000), rng.uniform(0, 2000)
+        expected = [h.id for h in mapper.hotspots if h.contains_point(x, y)]
+        got = [h.id for h in fast.find_all_hotspots_at_point(x, y)]
+        assert sorted(got) == sorted(expected)
+        first = fast.find_hotspot_at_point(x, y)
+        assert (first.id if first else None) == (expected[0] if expected else None)
+
+    region = {h.id for h in mapper.get_hotspots_in_region(100, 100, 600, 600)}
+    assert {h.id for h in fast.get_hotspots_in_region(100, 100, 600, 600)} == region
+
+    hotspot = fast.get_hotspot(exported[2]['id'])
+    assert hotspot.shape == 'polygon' and hotspot.lazy_load
+    assert hotspot.coords == mapper.hotspots[2].coords
+
+
+def test_array_mapper_reads_all_hotspots_and_rejects_edits():
+    mapper = _mapper_with_shapes()
+    exported = mapper.export_map()
+    fast = HotspotMapper.from_arrays(decode_hotspot_arrays(encode_hotspots(exported)), 2000, 2000)
+
+    assert fast.get_statistics() == mapper.get_statistics()
+    assert [h['id'] for h in fast.export_map()] == [h['id'] for h in exported]
+    assert [h.id for h in fast.hotspots] == [h.id for h in mapper.hotspots]
+
+    for edit in (lambda: fast.add_hotspot((0, 0, 10, 10), {}),
+                 lambda: fast.remove_hotspot(exported[0]['id']),
+                 lambda: fast.import_map(exported),
+                 lambda: fast.optimize_layout()):
+        with pytest.raises(ValueError, match='read-only'):
+            edit()
+    assert len(fast.hotspots) == len(exported)
+
+
+def test_builder_hotspots_use_columns(tmp_path):
+    from src.creator.builder import K2SHBWIBuilder
+
+    builder = K2SHBWIBuilder()
+    circle_id = builder.add_hotspot((100, 100, 150, 160), {'title': 'Circle'}, shape='circle',
+                                    lazy_load=True, priority=2)
+    rect_id = builder.add_hotspot((300, 300, 400, 380), {'title': 'Rect'}, visible=False)
+    hotspots = builder.encoder.hotspots
+
+    arrays = decode_hotspot_arrays(encode_hotspots(hotspots))
+    assert decode_hotspots(encode_hotspots(hotspots)) == json.loads(json.dumps(hotspots))
+    assert arrays.strings[:2] == [circle_id, 'circle']
+    assert arrays.columns(0) == {'id': circle_id, 'shape': 'circle', 'visible': True,
+                                 'lazy_load': True, 'priority': 2}
+    assert arrays.payload(0) == {'data': {'user_data': {'title': 'Circle'}}}
+
+    for mapper in (HotspotMapper.from_arrays(arrays, 1000, 1000), HotspotMapper(1000, 1000)):
+        if mapper._arrays is None:
+            mapper.import_map(json.loads(json.dumps(hotspots)))
+        circle = mapper.find_hotspot_at_point(120, 120)
+        assert circle is not None and circle.shape == 'circle'
+        assert circle.priority == 2 and circle.lazy_load
+        assert circle.data['user_data'] == {'title': 'Circle'}
+        assert mapper.find_hotspot_at_point(350, 350).visible is False
+    assert HotspotMapper.from_arrays(arrays, 1000, 1000).get_hotspot(rect_id).id == rect_id
@@ -37,3 +37,139 @@ def test_image_pyramid_roundtrip():
         out_file.unlink()
     except Exception:
         pass
+
+
+def test_read_level_seeks_straight_to_one_level(tmp_path):
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(SAMPLE_IMAGE))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_use_ssim = False
+    out_file = tmp_path / 'levels.k2sh'
+    enc.encode(str(out_file))
+
+    eager = K2SHBWIDecoder()
+    eager.decode(str(out_file))
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out_file))
+    reads = []
+    orig_read_at = dec._read_at
+    dec._read_at = lambda off, size: reads.append(size) or orig_read_at(off, size)
+
+    thumb = dec.read_level(-1)
+    assert thumb['data'] == eager.image_pyramid[-1]['data']
+    assert (thumb['width'], thumb['height']) == (eager.image_pyramid[-1]['width'], eager.image_pyramid[-1]['height'])
+    # section length, level directory, level payload
+    assert len(reads) == 3
+
+
+def test_legacy_linear_pyramid_still_decodes(tmp_path):
+    import io
+    import struct
+    from PIL import Image
+    from src.core.format_spec import K2SHBWIHeader, FeatureFlags, HEADER_SIZE
+
+    levels = []
+    for idx, size in enumerate((64, 32)):
+        buf = io.BytesIO()
+        Image.new('RGB', (size, size), color=(idx, 0, 0)).save(buf, format='PNG')
+        levels.append((idx, size, buf.getvalue()))
+    blob = bytes([0x7F, len(levels)])
+    for idx, size, png in levels:
+        blob += struct.pack('<BIIBBBI', idx, size, size, 0, 80, 0, len(png)) + png
+
+    header = K2SHBWIHeader()
+    header.set_feature_flag(FeatureFlags.HAS_IMAGE_PYRAMID)
+    header.image_pyramid_offset = HEADER_SIZE
+    out_file = tmp_path / 'legacy.k2sh'
+    out_file.write_bytes(header.pack() + struct.pack('<I', len(blob)) + blob)
+
+    for lazy in (False, True):
+        dec = K2SHBWIDecoder(lazy=lazy)
+        dec.decode(str(out_file))
+        assert len(dec.image_pyramid) == 2
+        assert dec.read_level(1)['data'] == levels[1][2]
+        assert dec.image_data == levels[0][2]
+
+
+def test_streamed_pyramid_matches_in_memory_container(tmp_path):
+    import struct
+    from src.core.format_spec import HEADER_SIZE
+
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(SAMPLE_IMAGE))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_use_ssim = False
+    out_file = tmp_path / 'streamed.k2sh'
+    enc.encode(str(out_file))
+
+    # The encoder keeps the raster, not an encoded copy of it
+    assert enc.image is not None
+    assert enc._image_data is None
+
+    data = out_file.read_bytes()
+    size = struct.unpack_from('<I', data, HEADER_SIZE)[0]
+    section = data[HEADER_SIZE + 4:HEADER_SIZE + 4 + size]
+    assert section == enc._generate_pyramid_blob(enc.image)
+
+
+def test_encoded_levels_are_not_recompressed(tmp_path):
+    from src.core.format_spec import CompressionType
+
+    if not SAMPLE_IMAGE.exists():
+        pytest.skip('Sample image not found; generate assets first')
+
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(SAMPLE_IMAGE))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_use_ssim = False
+    out_file = tmp_path / 'skip.k2sh'
+    enc.encode(str(out_file))
+
+    stats = enc.stats['pyramid_levels']
+    assert len(stats) == len(enc.pyramid_levels)
+    encoded = [s for s in stats if 'duplicate_of' not in s]
+    assert all(s['skipped'] == 1 and s['recompressed'] == 0 and s['saved_bytes'] == 0 for s in encoded)
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out_file))
+    assert {loc[0] for loc in dec.image_pyramid._locations} == {CompressionType.NONE.value}
+
+    # 'always' restores the second pass and reports what it saved
+    enc.pyramid_recompress = 'always'
+    enc.encode(str(out_file))
+    assert all(s['recompressed'] == 1 for s in enc.stats['pyramid_levels'] if 'duplicate_of' not in s)
+
+
+def test_identical_levels_share_one_payload(tmp_path):
+    from PIL import Image
+
+    # A 512px source is no larger than the 2048, 1024 and 512 levels
+    src = tmp_path / 'small.png'
+    Image.new('RGB', (512, 512), color=(40, 80, 120)).save(src, format='PNG')
+
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(src))
+    enc.image_pyramid_enabled = True
+    out_file = tmp_path / 'dedupe.k2sh'
+    enc.encode(str(out_file))
+    assert [s.get('duplicate_of') for s in enc.stats['pyramid_levels']] == [None, 0, 0, None]
+
+    enc.pyramid_dedupe = False
+    plain_file = tmp_path / 'plain.k2sh'
+    enc.encode(str(plain_file))
+    assert out_file.stat().st_size < plain_file.stat().st_size
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out_file))
+    locations = dec.image_pyramid._locations
+    assert locations[0] == locations[1] == locations[2] != locations[3]
+    levels = list(dec.image_pyramid)
+    assert [(l['width'], l['height']) for l in levels] == [(512, 512)] * 3 + [(256, 256)]
+    assert levels[1]['data'] is levels[0]['data']
@@ -0,0 +1,62 @@
+import random
+
+from PIL import Image
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.format_spec import CompressionType
+from src.core.inspection import stat_k2sh
+
+
+def test_stat_reports_sections_without_decoding_images(tmp_path, monkeypatch):
+    out = tmp_path / 'stat.k2sh'
+    enc = K2SHBWIEncoder()
+    enc.set_image(Image.frombytes('RGB', (256, 192), random.Random(2).randbytes(256 * 192 * 3)))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_levels = [256, 128]
+    enc.add_metadata({'title': 'Stat', 'author': 'Tester'})
+    enc.add_hotspot((1, 2, 3, 4), {'title': 'Spot'})
+    enc.add_data_layer('notes', {'text': 'hello'})
+    enc.data_layers_indexed = True
+    enc.encode(str(out))
+
+    # Image payloads must not be decompressed
+    monkeypatch.setattr(CompressionType, 'get_decompressor', None)
+    info = stat_k2sh(out)
+    assert info['file_size'] == out.stat().st_size
+    assert set(info['sections']) == {'metadata', 'image', 'hotspots', 'data_layers'}
+    assert 'metadata' not in info
+    image = info['sections']['image']
+    assert image['container'] == 'pyramid'
+    assert [lvl['width'] for lvl in image['levels']] == [256, 128]
+    assert all(lvl['stored_bytes'] > 0 for lvl in image['levels'])
+    assert info['sections']['data_layers']['layer_count'] == 1
+    monkeypatch.undo()
+
+    info = stat_k2sh(out, include_metadata=True)
+    assert info['metadata']['title'] == 'Stat'
+    assert 'count' not in info['sections']['hotspots']
+    assert stat_k2sh(out, count_hotspots=True)['sections']['hotspots']['count'] == 1
+
+
+def test_stat_counts_binary_hotspots_cheaply(tmp_path, monkeypatch):
+    out = tmp_path / 'binary.k2sh'
+    enc = K2SHBWIEncoder()
+    enc.hotspots_format = 'binary'
+    for i in range(5000):
+        enc.add_hotspot((i, i, 10, 10), {'title': f'Spot {i}'})
+    enc.encode(str(out))
+
+    # The count comes from the column header: nothing is parsed as JSON
+    monkeypatch.setattr('src.core.inspection.json.loads', None)
+    assert stat_k2sh(out)['sections']['hotspots']['count'] == 5000
+
+
+def test_stat_single_image_blob(tmp_path):
+    out = tmp_path / 'blob.k2sh'
+    enc = K2SHBWIEncoder()
+    enc.set_image(Image.new('RGB', (600, 600)))
+    enc.encode(str(out))
+
+    image = stat_k2sh(out)['sections']['image']
+    assert image['container'] == 'image'
+    assert (image['format'], image['width'], image['height']) == ('PNG', 600, 600)
@@ -0,0 +1,103 @@
+import random
+
+from PIL import Image
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder
+from src.core.stream_decoder import K2SHBWIStreamDecoder
+
+HOTSPOTS = [((i * 10, i * 5, 20, 20), {'title': f'Spot {i}'}) for i in range(30)]
+
+
+def _encode(out, layout):
+    enc = K2SHBWIEncoder()
+    enc.set_image(Image.frombytes('RGB', (256, 192), random.Random(0).randbytes(256 * 192 * 3)))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_levels = [256, 128, 64]
+    enc.add_metadata({'title': 'Progressive', 'author': 'Tester'})
+    for coords, data in HOTSPOTS:
+        enc.add_hotspot(coords, data)
+    enc.add_data_layer('notes', {'text': 'layer ' * 100})
+    enc.layout = layout
+    enc.encode(str(out))
+
+
+def test_progressive_layout_orders_thumbnail_first(tmp_path):
+    standard, progressive = tmp_path / 'standard.k2sh', tmp_path / 'progressive.k2sh'
+    _encode(standard, 'standard')
+    _encode(progressive, 'progressive')
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(progressive))
+    header = dec.header
+    assert header.metadata_offset < header.hotspot_map_offset < header.image_pyramid_offset < header.data_layers_offset
+    locations = dec.image_pyramid._locations
+    widths = [entry['width'] for entry in dec.image_pyramid._entries]
+    assert widths == [256, 128, 64]
+    # Payloads are stored smallest level first
+    assert locations[2][1] < locations[1][1] < locations[0][1]
+
+    ref = K2SHBWIDecoder()
+    ref.decode(str(standard))
+    assert dec.get_metadata()['title'] == ref.get_metadata()['title']
+    assert dec.get_hotspots() == ref.get_hotspots()
+    assert dec.data_layers == ref.data_layers
+    assert [lvl['width'] for lvl in dec.image_pyramid] == [lvl['width'] for lvl in ref.image_pyramid]
+    assert dec.get_image().tobytes() == ref.get_image().tobytes()
+
+
+def test_stream_decoder_yields_levels_as_bytes_arrive(tmp_path):
+    out = tmp_path / 'progressive.k2sh'
+    _encode(out, 'progressive')
+    data = out.read_bytes()
+
+    stream = K2SHBWIStreamDecoder()
+    events = []
+    for i in range(0, len(data), 997):
+        events.extend((i + 997, kind, value) for kind, value in stream.feed(data[i:i + 997]))
+    stream.close()
+
+    kinds = [kind for _, kind, _ in events]
+    assert kinds == ['header', 'metadata', 'hotspots', 'pyramid', 'level', 'level', 'level', 'data_layers', 'done']
+    levels = [value for _, kind, value in events if kind == 'level']
+    assert [lvl['width'] for lvl in levels] == [64, 128, 256]
+    assert levels[0]['image'].size == (levels[0]['width'], levels[0]['height'])
+    # The thumbnail is usable long before the full file has arrived
+    thumb_at = next(received for received, kind, _ in events if kind == 'level')
+    assert thumb_at < len(data) // 2
+
+
+def test_stream_decoder_handles_standard_layout(tmp_path):
+    out = tmp_path / 'standard.k2sh'
+    _encode(out, 'standard')
+    data = out.read_bytes()
+
+    stream = K2SHBWIStreamDecoder()
+    events = []
+    for i in range(0, len(data), 4096):
+        events.extend(stream.feed(data[i:i + 4096]))
+    events = dict((kind, value) for kind, value in events if kind != 'level')
+    assert events['metadata']['title'] == 'Progressive'
+    assert len(events['hotspots']) == len(HOTSPOTS)
+    assert 'done' in events
+
+
+def test_editor_compaction_keeps_progressive_order(tmp_path):
+    from src.core.editor import K2SHBWIEditor
+    out = tmp_path / 'progressive.k2sh'
+    _encode(out, 'progressive')
+
+    with K2SHBWIEditor(out) as editor:
+        editor.update_hotspot(0, data={'title': 'Appended'})
+        assert editor.save()['mode'] == 'append'
+    with K2SHBWIEditor(out) as editor:
+        editor.update_hotspot(1, data={'title': 'Compacted'})
+        assert editor.save(compact=True)['mode'] == 'compact'
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out))
+    header = dec.header
+    assert header.metadata_offset < header.hotspot_map_offset < header.image_pyramid_offset < header.data_layers_offset
+    assert [h['data']['title'] for h in dec.get_hotspots()[:3]] == ['Appended', 'Compacted', 'Spot 2']
+    locations = dec.level_locations()
+    assert locations[2].offset < locations[1].offset < locations[0].offset
@@ -65,3 +65,65 @@ def test_ssim_helper_presence():
     score = enc._compute_ssim(img1, img2)
     assert score is not None
     assert score > 0.999
+
+
+def test_parallel_pyramid_is_byte_identical(tmp_path):
+    random.seed(1234)
+    img_path = _save_temp_image(tmp_path, _make_noise_image((600, 600)))
+
+    outputs = []
+    for workers in (None, 4):
+        enc = K2SHBWIEncoder(max_workers=workers)
+        enc.set_image(img_path)
+        enc.image_pyramid_enabled = True
+        enc.pyramid_levels = [600, 300, 150, 75]
+        out = tmp_path / f'out_{workers}.k2sh'
+        enc.encode(str(out))
+        outputs.append(out.read_bytes())
+
+    assert outputs[0] == outputs[1]
+
+
+def _gradient_image(size=(1024, 768)):
+    img = Image.new('RGB', size)
+    img.putdata([(x % 256, y % 256, (x * y) % 256) for y in range(size[1]) for x in range(size[0])])
+    return img
+
+
+def _encode_cascade(tmp_path, name, **options):
+    img_path = _save_temp_image(tmp_path, _gradient_image())
+    enc = K2SHBWIEncoder()
+    enc.set_image(img_path)
+    enc.image_pyramid_enabled = True
+    enc.pyramid_levels = [1024, 512, 256, 100]
+    enc.pyramid_level_formats = [0, 0, 0, 0]
+    enc.pyramid_use_ssim = False
+    for key, value in options.items():
+        setattr(enc, key, value)
+    out = tmp_path / name
+    enc.encode(str(out))
+    return enc, out
+
+
+def test_cascaded_pyramid_matches_direct_dimensions(tmp_path):
+    _, direct_out = _encode_cascade(tmp_path, 'direct.k2sh')
+    enc, cascade_out = _encode_cascade(tmp_path, 'cascade.k2sh', pyramid_cascade=True,
+                                       pyramid_cascade_min_ssim=0.5)
+
+    direct = K2SHBWIDecoder()
+    direct.decode(str(direct_out))
+    cascade = K2SHBWIDecoder()
+    cascade.decode(str(cascade_out))
+    assert [(l['width'], l['height']) for l in cascade.image_pyramid] == \
+        [(l['width'], l['height']) for l in direct.image_pyramid]
+    assert enc.stats['cascade']['levels'] == 3
+    assert enc.stats['cascade']['fallbacks'] == 0
+
+
+def test_cascade_quality_guard_falls_back_to_direct_resize(tmp_path):
+    _, direct_out = _encode_cascade(tmp_path, 'direct.k2sh')
+    # An unreachable SSIM threshold forces every cascaded level back to the direct resize
+    enc, guarded_out = _encode_cascade(tmp_path, 'guarded.k2sh', pyramid_cascade=True,
+                                       pyramid_cascade_min_ssim=1.01)
+    assert enc.stats['cascade']['fallbacks'] == 3
+    assert guarded_out.read_bytes() == direct_out.read_bytes()
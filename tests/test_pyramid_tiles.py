@@ -0,0 +1,57 @@
+from PIL import Image
+
+from src.core.encoder import K2SHBWIEncoder
+from src.core.decoder import K2SHBWIDecoder
+
+
+def _gradient_image(size=(800, 600)):
+    img = Image.new('RGB', size)
+    img.putdata([(x % 256, y % 256, (x + y) % 256) for y in range(size[1]) for x in range(size[0])])
+    return img
+
+
+def _encode_tiled(tmp_path, tile_size=128):
+    src = tmp_path / 'src.png'
+    _gradient_image().save(src, format='PNG')
+    enc = K2SHBWIEncoder()
+    enc.set_image(str(src))
+    enc.image_pyramid_enabled = True
+    enc.pyramid_levels = [800, 400]
+    enc.pyramid_level_formats = [0, 0]
+    enc.pyramid_use_ssim = False
+    enc.pyramid_tile_size = tile_size
+    out = tmp_path / 'tiled.k2sh'
+    enc.encode(str(out))
+    return out
+
+
+def test_tiled_level_roundtrip(tmp_path):
+    out = _encode_tiled(tmp_path)
+
+    dec = K2SHBWIDecoder()
+    dec.decode(str(out))
+    assert [l['tiled'] for l in dec.image_pyramid] == [True, True]
+    full = dec.get_image().convert('RGB')
+    assert full.size == (800, 600)
+    assert full.tobytes() == _gradient_image().tobytes()
+
+
+def test_read_region_decodes_only_needed_tiles(tmp_path):
+    out = _encode_tiled(tmp_path)
+    expected = _gradient_image()
+
+    dec = K2SHBWIDecoder(lazy=True)
+    dec.decode(str(out))
+    decoded = []
+    orig_decode_tile = dec._decode_tile
+    dec._decode_tile = lambda grid, row, col: decoded.append((row, col)) or orig_decode_tile(grid, row, col)
+
+    region = dec.read_region(0, 10, 10, 100, 100)
+    assert decoded == [(0, 0)]
+    assert region.convert('RGB').tobytes() == expected.crop((10, 10, 110, 110)).tobytes()
+
+    decoded.clear()
+    region = dec.read_region(0, 700, 500, 200, 200)  # clipped to the level bounds
+    assert region.size == (100, 100)
+    assert decoded == [(3, 5), (3, 6), (4, 5), (4, 6)]
+    assert region.convert('RGB').tobytes() == expected.crop((700, 500, 800, 600)).tobytes()
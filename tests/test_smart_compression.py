@@ -137,3 +137,95 @@ def test_adaptive_compress_roundtrip_binary():
                 error_msg=str(e)
             )
         raise
+
+
+def test_is_incompressible_detects_encoded_images_and_random_data():
+    """Entropy-coded payloads are skipped, compressible data is not"""
+    import io
+    import os
+    from PIL import Image
+    from src.algorithms.smart_compression import is_incompressible
+
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 32), color=(1, 2, 3)).save(buf, format='PNG')
+    assert is_incompressible(buf.getvalue())
+    assert is_incompressible(b'\xff\xd8\xff\xe0' + os.urandom(100))
+    assert is_incompressible(os.urandom(200_000))
+    assert not is_incompressible(b'compressible text ' * 10_000)
+
+
+def test_classify_data_samples_large_inputs():
+    """Classifier features are computed on a bounded sample"""
+    import os
+    from src.algorithms.smart_compression import classify_data, CLASSIFY_SAMPLE_SIZE
+
+    text = classify_data(b'The quick brown fox. ' * 50_000)
+    assert text['sample_size'] == CLASSIFY_SAMPLE_SIZE
+    assert text['printable_ratio'] == 1.0
+    assert text['repetitiveness'] > 0.9
+
+    noise = classify_data(os.urandom(200_000))
+    assert noise['entropy'] > 7.5
+    assert noise['repetitiveness'] < 0.05
+    assert classify_data(b'')['sample_size'] == 0
+
+
+def test_rules_mode_uses_classifier_features(monkeypatch):
+    """Rules use entropy and repetitiveness, computing the latter only when it matters"""
+    import os
+    from src.algorithms import smart_compression
+
+    subset = smart_compression.classify_data(b'abc\x00' * 100, features=('printable_ratio',))
+    assert set(subset) == {'size', 'sample_size', 'printable_ratio'}
+    assert subset['printable_ratio'] == 0.75
+
+    requested = []
+    real = smart_compression.classify_data
+
+    def recording(data, *args, **kwargs):
+        requested.append(tuple(kwargs.get('features', smart_compression.CLASSIFY_FEATURES)))
+        return real(data, *args, **kwargs)
+
+    monkeypatch.setattr(smart_compression, 'classify_data', recording)
+
+    # High entropy: stored as-is, repetitiveness never computed
+    noise = os.urandom(100_000)
+    stats = {}
+    compressed, chosen = smart_compression.adaptive_compress(noise, stats=stats)
+    assert chosen == CompressionType.NONE and compressed == noise
+    assert requested == [('printable_ratio', 'entropy')]
+
+    # Highly repetitive data gets a stronger level than the backend default
+    stats = {}
+    _, chosen = smart_compression.adaptive_compress(b'repeat this record; ' * 1000, stats=stats)
+    assert ('repetitiveness',) in requested
+    if chosen in smart_compression._REPETITIVE_LEVELS:
+        assert stats['level'] == smart_compression._REPETITIVE_LEVELS[chosen]
+
+    # Varied data keeps the default level
+    varied = b''.join(f'{i}:{i * i % 997};'.encode() for i in range(3000))
+    stats = {}
+    smart_compression.adaptive_compress(varied, stats=stats)
+    assert stats['level'] is None
+
+
+def test_select_codec_objectives():
+    """Trial selection honours the size and speed objectives"""
+    from src.algorithms.smart_compression import select_codec
+
+    data = b'{"id": 1, "name": "feature", "tags": ["a", "b"]}' * 2000
+    by_size = select_codec(data, objective='size')
+    assert by_size['comp_type'] != CompressionType.NONE
+    assert by_size['trials'][0]['sample_bytes'] <= 64 * 1024
+    smallest = min(t['compressed_bytes'] for t in by_size['trials'])
+    assert any(t['compressed_bytes'] == smallest and t['level'] == by_size['level']
+               for t in by_size['trials'])
+
+    by_speed = select_codec(data, objective='speed')
+    assert by_speed['objective'] == 'speed'
+
+    compressed, comp_type = adaptive_compress(data, data_type='json', mode='trial')
+    assert adaptive_decompress(compressed, comp_type) == data
+
+    with pytest.raises(ValueError):
+        select_codec(data, objective='ratio')
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from src.core.encoder import K2SHBWIEncoder
+
+ROOT = Path(__file__).resolve().parent.parent
+CLI = ROOT / 'tools' / 'cli_click.py'
+HEAVY = ('numpy', 'PIL', 'pptx', 'bs4', 'reportlab', 'zstandard', 'brotli')
+
+
+def _loaded_heavy_modules(code):
+    probe = f"{code}\nimport sys\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(',') if m]
+
+
+def test_core_imports_are_lazy():
+    assert _loaded_heavy_modules(
+        'import src.core.encoder, src.core.decoder, src.core.inspection, src.algorithms.registry') == []
+    assert _loaded_heavy_modules('import sys; sys.path.insert(0, "tools"); import cli_click') == []
+
+
+def _import_ms(args):
+    """Time spent importing modules (``-X importtime``) while running ``args``."""
+    err = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stderr
+    total_us = 0
+    for line in err.splitlines():
+        if line.startswith('import time:'):
+            self_us = line[len('import time:'):].split('|')[0].strip()
+            if self_us.isdigit():
+                total_us += int(self_us)
+    return total_us / 1000
+
+
+def test_cli_startup_time(tmp_path):
+    enc = K2SHBWIEncoder()
+    enc.add_metadata({'title': 'Startup', 'author': 'Tester'})
+    enc.encode(str(tmp_path / 'meta.k2sh'))
+
+    def overhead_ms(args, runs=3):
+        return min(_import_ms(args) for _ in range(runs)) - min(_import_ms(['-c', 'pass']) for _ in range(runs))
+
+    # Startup budget of the CLI: imports beyond a bare interpreter. Eager
+    # imports of PIL/NumPy/converters cost several hundred ms on their own
+    assert overhead_ms([str(CLI), '--help']) < 100
+    assert overhead_ms([str(CLI), 'info', str(tmp_path / 'meta.k2sh')]) < 100
@@ -20,20 +20,12 @@ import io
 import time
 
 import click
-from PIL import Image
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-import click
-from src.core.encoder import K2SHBWIEncoder
-from src.core.decoder import K2SHBWIDecoder
-from src.converters.html_converter import HTMLConverter
-from src.converters.pdf_converter import PDFConverter
-from src.converters.pptx_converter import PPTXConverter
-from src.viewers.web_viewer import WebViewer
-from src.viewers.desktop_viewer import DesktopViewer
-from src.utils.test_logger import TestLogger
+# Encoder, decoder, converters, viewers and PIL are imported inside the
+# commands that use them, so that --help and info start quickly.
 
 
 # ============================================================================
@@ -41,7 +33,7 @@ from src.utils.test_logger import TestLogger
 # ============================================================================
 
 # Global logger instance
-_logger: Optional[TestLogger] = None
+_logger: Optional['TestLogger'] = None
 _enable_logging = False
 
 
@@ -53,6 +45,7 @@ def cli(log):
     global _logger, _enable_logging
     _enable_logging = log
     if _enable_logging:
+        from src.utils.test_logger import TestLogger
         _logger = TestLogger(logger_name="cli_commands", log_type="cli")
 
 
@@ -94,6 +87,7 @@ def create(input, output, title, description, metadata, verbose):
         if verbose:
             print_info(f"Creating K2SHBWI from: {input}")
         
+        from src.core.encoder import K2SHBWIEncoder
         encoder = K2SHBWIEncoder()
         
         # Parse metadata
@@ -160,37 +154,61 @@ def create(input, output, title, description, metadata, verbose):
 @cli.command()
 @click.argument('file', type=click.Path(exists=True))
 @click.option('-v', '--verbose', is_flag=True, help='Verbose output')
-def info(file, verbose):
+@click.option('--hotspots', 'show_hotspots', is_flag=True, help='Also decode and list hotspots')
+def info(file, verbose, show_hotspots):
     """Display information about a K2SHBWI file."""
     try:
         if verbose:
             print_info(f"Reading file: {file}")
         
-        decoder = K2SHBWIDecoder()
-        decoder.decode(file)
-        
-        # Get metadata and hotspots
-        metadata = decoder.get_metadata()
-        hotspots = decoder.get_hotspots()
+        # Header, section prefixes and metadata only; image payloads are not read
+        from src.core.inspection import stat_k2sh
+        stat = stat_k2sh(file, include_metadata=True)
         
         # Display header info
         click.echo(f"\nFile Information:")
         click.echo(f"  Filename: {os.path.basename(file)}")
-        click.echo(f"  File Size: {os.path.getsize(file)} bytes")
+        click.echo(f"  File Size: {stat['file_size']} bytes")
+        click.echo(f"  Version: {stat['version']}")
+        click.echo(f"  Features: {', '.join(stat['features']) or 'none'}")
+        
+        # Display sections
+        click.echo(f"\nSections:")
+        for name, section in stat['sections'].items():
+            click.echo(f"  {name}: {section['size']} bytes ({section['compression']})")
+            for level in section.get('levels', []):
+                click.echo(f"     level {level['level_id']}: {level['width']}x{level['height']} "
+                           f"{level['format']}, {level['stored_bytes']} bytes ({level['compression']})")
+            if section.get('container') == 'image' and section.get('format'):
+                click.echo(f"     {section['format']} {section['width']}x{section['height']}")
         
         # Display metadata
+        metadata = stat.get('metadata')
         if metadata:
             click.echo(f"\nMetadata:")
             for key, value in metadata.items():
                 click.echo(f"  {key}: {value}")
         
-        # Display hotspots
-        if hotspots:
-            click.echo(f"\nHotspots ({len(hotspots)}):")
-            for i, hotspot in enumerate(hotspots, 1):
-                click.echo(f"  {i}. {hotspot.get('title', 'Untitled')}")
-                if 'description' in hotspot:
-                    click.echo(f"     {hotspot['description']}")
+        # Display hotspots: the count when the section stores it (binary
+        # format), otherwise the stored size; the list with --hotspots
+        hotspot_section = stat['sections'].get('hotspots')
+        if hotspot_section and not show_hotspots:
+            if 'count' in hotspot_section:
+                summary = f"{hotspot_section['count']}"
+            else:
+                summary = f"{hotspot_section['size']} bytes stored"
+            click.echo(f"\nHotspots: {summary} (use --hotspots to list them)")
+        if show_hotspots:
+            from src.core.decoder import K2SHBWIDecoder
+            decoder = K2SHBWIDecoder(lazy=True)
+            decoder.decode(file)
+            hotspots = decoder.get_hotspots()
+            if hotspots:
+                click.echo(f"\nHotspots ({len(hotspots)}):")
+                for i, hotspot in enumerate(hotspots, 1):
+                    click.echo(f"  {i}. {hotspot.get('title', 'Untitled')}")
+                    if 'description' in hotspot:
+                        click.echo(f"     {hotspot['description']}")
         
         print_ok("File read successfully")
     except Exception as e:
@@ -211,6 +229,7 @@ def validate(file, verbose):
         if verbose:
             print_info(f"Validating: {file}")
         
+        from src.core.decoder import K2SHBWIDecoder
         decoder = K2SHBWIDecoder()
         decoder.decode(file)
         
@@ -261,6 +280,7 @@ def batch(input_dir, output_dir, verbose):
         
         for image_file in image_files:
             try:
+                from src.core.encoder import K2SHBWIEncoder
                 encoder = K2SHBWIEncoder()
                 output_file = os.path.join(output_dir, 
                                           os.path.splitext(os.path.basename(image_file))[0] + '.k2sh')
@@ -302,6 +322,7 @@ def encode(input, output, verbose):
         if verbose:
             print_info(f"Encoding: {input}")
         
+        from src.core.encoder import K2SHBWIEncoder
         encoder = K2SHBWIEncoder()
         encoder.set_image(input)
         encoder.encode(output)
@@ -361,6 +382,7 @@ def decode(file, output, verbose):
         if verbose:
             print_info(f"Decoding: {file}")
         
+        from src.core.decoder import K2SHBWIDecoder
         decoder = K2SHBWIDecoder()
         decoder.decode(file)
         
@@ -371,6 +393,7 @@ def decode(file, output, verbose):
             sys.exit(1)
         
         # Save image
+        from PIL import Image
         image = Image.open(io.BytesIO(image_data))
         image.save(output)
         
@@ -436,10 +459,13 @@ def convert(file, format, output, verbose):
         
         # Select converter
         if format == 'html':
+            from src.converters.html_converter import HTMLConverter
             converter = HTMLConverter()
         elif format == 'pdf':
+            from src.converters.pdf_converter import PDFConverter
             converter = PDFConverter()
         elif format == 'pptx':
+            from src.converters.pptx_converter import PPTXConverter
             converter = PPTXConverter()
         else:
             print_error(f"Unknown format: {format}")
@@ -504,8 +530,10 @@ def view(file, type, verbose):
             print_info(f"Opening in {type} viewer: {file}")
         
         if type == 'web':
+            from src.viewers.web_viewer import WebViewer
             viewer = WebViewer()
         else:  # desktop
+            from src.viewers.desktop_viewer import DesktopViewer
             viewer = DesktopViewer()
         
         result = viewer.view(file)